@@ -3,6 +3,7 @@ import datetime
 from PIL import Image
 from modules.com import ComunicationGUI
 from modules.csv_loader import CsvLoaderGUI
+from modules.multi_monitor import MultiMonitorGUI
 
 # Seleccion del tema
 ctk.set_appearance_mode("dark")
@@ -55,6 +56,7 @@ class MainWindow():
         self.menu_info = [
             (self.icon_home, "Inicio", self.load_home_page),
             (self.icon_graph, "ECG en tiempo real", self.load_ecg_page),
+            (self.icon_play, "Multi-monitor", self.load_multi_monitor_page),
             (self.icon_upload, "Cargar señal", self.csv_loader)
         ]
         
@@ -161,6 +163,13 @@ class MainWindow():
         self.com_gui = ComunicationGUI(self.content_area)
         self.com_gui.pack(padx=10, pady=10)
         
+    def load_multi_monitor_page(self):
+        self.clear_content_area()
+        self.title_gui = ctk.CTkLabel(self.content_area, text="Monitoreo de varios dispositivos", font=self.title_font)
+        self.title_gui.pack(padx=10, pady=10, anchor="w")
+        self.multi_gui = MultiMonitorGUI(self.content_area)
+        self.multi_gui.pack(padx=10, pady=10)
+        
     #def load_csv_page(self):
     #    self.clear_content_area()
     #    self.title_gui = ctk.CTkLabel(self.content_area, text="Anotaciones de señal", font=self.title_font)
@@ -0,0 +1,195 @@
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+from modules.instrument import profiler
+from modules.protocol import AsciiDecoder, BinaryFrameDecoder
+
+# Bloque de muestras entregado al consumidor
+Chunk = namedtuple("Chunk", ["samples", "timestamps", "sequence", "overruns"])
+
+
+class RingBuffer:
+    """Buffer circular de un productor y un consumidor sin candados.
+
+    El hilo lector solo modifica ``write_count`` y la GUI solo modifica
+    ``read_count``; ambos contadores crecen de forma monótona, por lo que
+    la posición real se obtiene con el módulo de la capacidad.
+    """
+
+    def __init__(self, capacity=1 << 16, dtype=np.float64):
+        self.capacity = int(capacity)
+        self.samples = np.zeros(self.capacity, dtype=dtype)
+        self.timestamps = np.zeros(self.capacity, dtype=np.float64)
+        self.sequence = np.zeros(self.capacity, dtype=np.int64)
+        self.write_count = 0
+        self.read_count = 0
+        self.overruns = 0  # Muestras perdidas por desbordamiento (lado consumidor)
+        self.truncated = 0  # Muestras descartadas por bloques mayores a la capacidad
+
+    def write(self, values, timestamp, sequence):
+        """Escribe un bloque completo (lado productor).
+
+        ``timestamp`` y ``sequence`` pueden ser escalares (uno por bloque) o
+        arreglos con un valor por muestra.
+        """
+        values = np.asarray(values, dtype=self.samples.dtype)
+        n = len(values)
+        if n == 0:
+            return
+        timestamp = np.broadcast_to(timestamp, n)
+        sequence = np.broadcast_to(sequence, n)
+        if n > self.capacity:
+            self.truncated += n - self.capacity
+            values, timestamp, sequence = values[-self.capacity:], timestamp[-self.capacity:], sequence[-self.capacity:]
+            n = self.capacity
+        start = self.write_count % self.capacity
+        first = min(n, self.capacity - start)
+        self.samples[start:start + first] = values[:first]
+        self.timestamps[start:start + first] = timestamp[:first]
+        self.sequence[start:start + first] = sequence[:first]
+        if first < n:
+            self.samples[:n - first] = values[first:]
+            self.timestamps[:n - first] = timestamp[first:]
+            self.sequence[:n - first] = sequence[first:]
+        # Publicar al final para que el consumidor nunca vea datos a medias
+        self.write_count += n
+
+    def available(self):
+        """Número de muestras pendientes de leer"""
+        return self.write_count - self.read_count
+
+    def drain(self, max_samples=None):
+        """Devuelve todo lo que llegó desde la última lectura (lado consumidor)"""
+        end = self.write_count
+        start = self.read_count
+        dropped = 0
+        if end - start > self.capacity:
+            dropped = end - start - self.capacity
+            start = end - self.capacity
+        if max_samples is not None and end - start > max_samples:
+            end = start + max_samples
+        idx = np.arange(start, end) % self.capacity
+        samples = self.samples[idx]
+        timestamps = self.timestamps[idx]
+        sequence = self.sequence[idx]
+
+        # Si el productor alcanzó la zona copiada, descartar lo sobrescrito
+        overwritten = self.write_count - self.capacity - start
+        if overwritten > 0:
+            overwritten = min(overwritten, end - start)
+            dropped += overwritten
+            samples = samples[overwritten:]
+            timestamps = timestamps[overwritten:]
+            sequence = sequence[overwritten:]
+
+        self.read_count = end
+        self.overruns += dropped
+        return Chunk(samples, timestamps, sequence, dropped)
+
+    def clear(self):
+        """Descarta las muestras pendientes (lado consumidor)"""
+        self.read_count = self.write_count
+
+
+class AcquisitionSource(threading.Thread):
+    """Base de las fuentes de adquisición (puerto serie, simulador, archivo).
+
+    Cada fuente corre en su propio hilo y publica bloques en un
+    ``RingBuffer``; la GUI solo conoce ``start``, ``stop`` y el buffer.
+    """
+
+    def __init__(self, ring):
+        super().__init__(daemon=True)
+        self.ring = ring
+        self.chunk_sequence = 0
+        self.samples_published = 0
+        self.error = None
+        self._stop_event = threading.Event()
+
+    def publish(self, values, timestamp=None):
+        """Publica un bloque de muestras en el buffer circular.
+
+        Cada muestra lleva la hora de llegada del bloque y su número de
+        muestra de la fuente, con el que el consumidor detecta desbordes.
+        """
+        n = len(values)
+        sequence = np.arange(self.samples_published, self.samples_published + n)
+        self.ring.write(values, time.time() if timestamp is None else timestamp, sequence)
+        self.chunk_sequence += 1
+        self.samples_published += n
+
+    def stats(self):
+        """Contadores del enlace (tramas perdidas y corruptas si aplica)"""
+        return {"samples": self.samples_published}
+
+    def stop(self, timeout=1.0):
+        """Detiene el hilo y espera a que termine"""
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+
+class SerialReader(AcquisitionSource):
+    """Hilo de adquisición que lee el puerto serial en bloques.
+
+    En modo ``"stream"`` el dispositivo transmite texto de forma continua y
+    en modo ``"binary"`` transmite tramas binarias (ver ``modules.protocol``),
+    ambos tras recibir su comando de inicio. En modo ``"poll"`` se conserva el
+    protocolo de solicitud/respuesta del firmware anterior, pero fuera del hilo
+    de la GUI.
+    """
+
+    start_commands = {"stream": b"stream\n", "binary": b"binary\n"}
+
+    def __init__(self, port, ring, mode="stream", decoder=None, channel=0, start_command=None,
+                 stop_command=b"stop\n", poll_command=b"raw", read_size=4096):
+        super().__init__(ring)
+        self.port = port
+        self.mode = mode
+        if decoder is None:
+            decoder = BinaryFrameDecoder() if mode == "binary" else AsciiDecoder()
+        self.decoder = decoder
+        self.channel = channel
+        if start_command is None:
+            start_command = self.start_commands.get(mode)
+        self.start_command = start_command
+        self.stop_command = stop_command
+        self.poll_command = poll_command
+        self.read_size = read_size
+        self.bytes_read = 0
+
+    def run(self):
+        try:
+            if self.mode != "poll" and self.start_command:
+                self.port.reset_input_buffer()
+                self.port.write(self.start_command)
+            while not self._stop_event.is_set():
+                if self.mode == "poll":
+                    self.port.write(self.poll_command)
+                    data = self.port.readline()
+                else:
+                    # Bloquea hasta recibir al menos un byte (o el timeout del puerto)
+                    data = self.port.read(max(1, min(self.port.in_waiting, self.read_size)))
+                if data:
+                    self.feed(data)
+        except Exception as e:
+            self.error = e
+            print(f"⚠️ Error en el hilo de adquisición: {e}")
+        finally:
+            if self.mode != "poll" and self.stop_command:
+                try:
+                    self.port.write(self.stop_command)
+                except Exception:
+                    pass
+
+    def stats(self):
+        return self.decoder.stats()
+
+    def feed(self, data):
+        """Decodifica un bloque de bytes y lo publica en el buffer circular"""
+        self.bytes_read += len(data)
+        with profiler.stage("serial_decode"):
+            values = self.decoder.feed(data)
+        if len(values):
+            self.publish(values[:, min(self.channel, values.shape[1] - 1)])
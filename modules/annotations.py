@@ -0,0 +1,357 @@
+"""Anotaciones de una grabación: bitácora de solo agregado con índice de intervalos.
+
+Cada grabación tiene su archivo ``<grabación>.annotations.csv``. Es una
+bitácora: cada anotación nueva o eliminada agrega una línea y se vuelca a
+disco, de modo que guardar cuesta lo mismo con 10 anotaciones que con
+100 000. Cuando las líneas muertas (anotaciones eliminadas y sus bajas)
+superan a las vigentes, la bitácora se compacta reescribiéndola en un
+archivo temporal que reemplaza al original de forma atómica.
+
+En memoria, ``IntervalIndex`` responde qué anotaciones se solapan con una
+ventana de tiempo sin recorrer todas: bloques ordenados por inicio, cada uno
+con un árbol de segmentos del fin máximo, que se fusionan como un contador
+binario al crecer.
+"""
+import csv
+import datetime
+import io
+import os
+from collections import namedtuple
+import numpy as np
+
+ANNOTATION_SUFFIX = ".annotations.csv"
+JOURNAL_COLUMNS = ["op", "id", "start_s", "end_s", "label", "origin", "time"]
+
+Annotation = namedtuple("Annotation", ["id", "start", "end", "label", "origin"])
+
+# Líneas muertas mínimas antes de considerar una compactación
+COMPACT_MIN_DEAD = 1024
+# Intervalos por hoja del árbol de cada bloque, y tamaño hasta el que un bloque se recorre sin árbol
+LEAF_SIZE = 32
+LINEAR_BLOCK = 2048
+
+
+def annotation_path(recording):
+    """Bitácora de anotaciones de una grabación"""
+    return recording + ANNOTATION_SUFFIX
+
+
+class _Block:
+    """Intervalos ordenados por inicio con un árbol de segmentos del fin máximo.
+
+    Las hojas del árbol son grupos de ``LEAF_SIZE`` intervalos consecutivos,
+    que se filtran de una vez con NumPy; los bloques pequeños se recorren
+    directamente.
+    """
+
+    def __init__(self, ids, starts, ends):
+        order = np.argsort(starts, kind="stable")
+        self.ids = ids[order]
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.tree = None
+        if len(self.ids) > LINEAR_BLOCK:
+            groups = -(-len(self.ids) // LEAF_SIZE)
+            self.size = 1 << int(np.ceil(np.log2(groups)))
+            tree = np.full(2 * self.size, -np.inf)
+            tree[self.size:self.size + groups] = np.maximum.reduceat(self.ends, np.arange(0, len(self.ends), LEAF_SIZE))
+            level = self.size
+            while level > 1:
+                parents = np.arange(level // 2, level)
+                tree[parents] = np.maximum(tree[2 * parents], tree[2 * parents + 1])
+                level //= 2
+            # Lista de Python: el descenso lee nodos sueltos, más rápido que indexar NumPy
+            self.tree = tree.tolist()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def query(self, start, end):
+        """Posiciones de los intervalos con inicio < ``end`` y fin > ``start``"""
+        hi = int(np.searchsorted(self.starts, end, side="left"))
+        if hi == 0:
+            return np.zeros(0, dtype=np.int64)
+        if self.tree is None:
+            return np.flatnonzero(self.ends[:hi] > start)
+        # Solo se desciende por los nodos con algún fin posterior a ``start`` y antes de ``hi``
+        last_group = (hi - 1) // LEAF_SIZE
+        tree, groups = self.tree, []
+        stack = [(1, 0, self.size)]
+        while stack:
+            node, first, width = stack.pop()
+            if tree[node] <= start or first > last_group:
+                continue
+            if width == 1:
+                groups.append(first)
+                continue
+            half = width >> 1
+            stack.append((2 * node + 1, first + half, half))
+            stack.append((2 * node, first, half))
+        positions = (np.asarray(groups, dtype=np.int64)[:, None] * LEAF_SIZE + np.arange(LEAF_SIZE)).ravel()
+        positions = positions[positions < hi]
+        return positions[self.ends[positions] > start]
+
+    def find(self, item_id, start):
+        """Posición de un intervalo por su identificador e inicio (-1 si no está)"""
+        lo = np.searchsorted(self.starts, start, side="left")
+        hi = np.searchsorted(self.starts, start, side="right")
+        matches = np.flatnonzero(self.ids[lo:hi] == item_id)
+        return int(lo + matches[0]) if len(matches) else -1
+
+    def remove(self, position):
+        """Baja de un intervalo: su fin pasa a -inf y se actualizan sus ancestros en el árbol"""
+        self.ends[position] = -np.inf
+        if self.tree is None:
+            return
+        group = position // LEAF_SIZE
+        node = self.size + group
+        self.tree[node] = float(self.ends[group * LEAF_SIZE:(group + 1) * LEAF_SIZE].max())
+        while node > 1:
+            node //= 2
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+
+class IntervalIndex:
+    """Índice de intervalos [inicio, fin) con consultas de solapamiento.
+
+    Las altas recientes quedan en un búfer pequeño; al llenarse forman un
+    bloque, y los bloques de tamaño parecido se fusionan (método logarítmico),
+    por lo que agregar cuesta O(log n) amortizado y cada consulta
+    O(log² n + k). Las bajas marcan el intervalo en su bloque y desaparecen
+    en la siguiente fusión.
+    """
+
+    def __init__(self, buffer_size=64):
+        self.buffer_size = buffer_size
+        self.blocks = []
+        self.pending = {}  # id -> (inicio, fin) aún fuera de los bloques
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, item_id, start, end):
+        self.pending[item_id] = (start, end)
+        self.count += 1
+        if len(self.pending) >= self.buffer_size:
+            self._flush_pending()
+
+    def remove(self, item_id, start):
+        """Quita un intervalo (su inicio permite ubicarlo por búsqueda binaria)"""
+        if self.pending.pop(item_id, None) is not None:
+            self.count -= 1
+            return
+        for block in self.blocks:
+            position = block.find(item_id, start)
+            if position >= 0:
+                block.remove(position)
+                self.count -= 1
+                return
+
+    def _flush_pending(self):
+        ids = np.fromiter(self.pending, dtype=np.int64, count=len(self.pending))
+        bounds = np.array(list(self.pending.values()), dtype=np.float64).reshape(-1, 2)
+        self.pending = {}
+        block = _Block(ids, bounds[:, 0], bounds[:, 1])
+        # Contador binario: cada bloque es más del doble del siguiente
+        while self.blocks and len(self.blocks[-1]) <= 2 * len(block):
+            block = self._merge(self.blocks.pop(), block)
+        self.blocks.append(block)
+
+    @staticmethod
+    def _merge(a, b):
+        ids = np.concatenate((a.ids, b.ids))
+        starts = np.concatenate((a.starts, b.starts))
+        ends = np.concatenate((a.ends, b.ends))
+        alive = ends > -np.inf
+        return _Block(ids[alive], starts[alive], ends[alive])
+
+    def query(self, start, end):
+        """Identificadores de los intervalos que se solapan con [start, end), ordenados por inicio"""
+        ids, starts = [], []
+        for block in self.blocks:
+            positions = block.query(start, end)
+            ids.append(block.ids[positions])
+            starts.append(block.starts[positions])
+        recent = [(i, s) for i, (s, e) in self.pending.items() if s < end and e > start]
+        if recent:
+            ids.append(np.array([i for i, _ in recent], dtype=np.int64))
+            starts.append(np.array([s for _, s in recent], dtype=np.float64))
+        if not ids:
+            return np.zeros(0, dtype=np.int64)
+        ids, starts = np.concatenate(ids), np.concatenate(starts)
+        return ids[np.argsort(starts, kind="stable")]
+
+
+def _journal_line(op, annotation, now):
+    buffer = io.StringIO()
+    if op == "add":
+        row = [op, annotation.id, f"{annotation.start:.6f}", f"{annotation.end:.6f}", annotation.label,
+               annotation.origin, now]
+    else:
+        row = [op, annotation.id, "", "", "", "", now]
+    csv.writer(buffer, lineterminator="\n").writerow(row)
+    return buffer.getvalue()
+
+
+def _read_journal(path, repair=False):
+    """Operaciones (op, anotación o id) de una bitácora; una última línea a medias se descarta.
+
+    Con ``repair`` esa línea incompleta (fallo al escribir) además se trunca del archivo.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, "r+b" if repair else "rb") as f:
+        data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if repair and complete < len(data):
+            f.truncate(complete)
+    operations = []
+    for row in csv.DictReader(io.StringIO(data[:complete].decode("utf-8"))):
+        try:
+            item_id = int(row["id"])
+            if row["op"] == "add":
+                operations.append(("add", Annotation(item_id, float(row["start_s"]), float(row["end_s"]),
+                                                     row["label"], row["origin"])))
+            else:
+                operations.append((row["op"], item_id))
+        except (KeyError, TypeError, ValueError):
+            operations.append(("invalid", None))
+    return operations
+
+
+def read_annotations(recording):
+    """Anotaciones vigentes de una grabación ordenadas por inicio, sin abrir la bitácora para escribir"""
+    annotations = {}
+    for op, item in _read_journal(annotation_path(recording)):
+        if op == "add":
+            annotations[item.id] = item
+        elif op == "del":
+            annotations.pop(item, None)
+    return sorted(annotations.values(), key=lambda a: (a.start, a.id))
+
+
+class AnnotationStore:
+    """Anotaciones de una grabación, persistidas en su bitácora e indexadas por tiempo"""
+
+    def __init__(self, path):
+        self.path = path
+        self.annotations = {}
+        self.index = IntervalIndex()
+        self.next_id = 1
+        self.dead_lines = 0
+        self._load()
+        self._file = open(self.path, "a", newline="", encoding="utf-8")
+        if self._file.tell() == 0:
+            self._file.write(",".join(JOURNAL_COLUMNS) + "\n")
+            self._file.flush()
+
+    @classmethod
+    def for_recording(cls, recording):
+        return cls(annotation_path(recording))
+
+    def _load(self):
+        for op, item in _read_journal(self.path, repair=True):
+            if op == "add":
+                self._apply_add(item)
+            elif op == "del" and item in self.annotations:
+                self._apply_remove(item)
+            else:
+                self.dead_lines += 1
+
+    def _apply_add(self, annotation):
+        self.annotations[annotation.id] = annotation
+        self.index.add(annotation.id, annotation.start, annotation.end)
+        self.next_id = max(self.next_id, annotation.id + 1)
+
+    def _apply_remove(self, item_id):
+        annotation = self.annotations.pop(item_id)
+        self.index.remove(item_id, annotation.start)
+        # La línea de alta y la de baja quedan muertas
+        self.dead_lines += 2
+
+    def __len__(self):
+        return len(self.annotations)
+
+    def __iter__(self):
+        return iter(sorted(self.annotations.values(), key=lambda a: (a.start, a.id)))
+
+    def add(self, start, end, label, origin="manual"):
+        """Agrega una anotación; cuesta una línea en la bitácora sin importar cuántas haya"""
+        return self.add_many([(start, end, label)], origin)[0]
+
+    def add_many(self, spans, origin="manual"):
+        """Agrega varias anotaciones (inicio, fin, etiqueta) con una sola escritura"""
+        now = datetime.datetime.now().isoformat(timespec="seconds")
+        added, lines = [], []
+        for start, end, label in spans:
+            start, end = sorted((float(start), float(end)))
+            annotation = Annotation(self.next_id, start, end, label, origin)
+            self._apply_add(annotation)
+            added.append(annotation)
+            lines.append(_journal_line("add", annotation, now))
+        self._append(lines)
+        return added
+
+    def remove(self, item_ids):
+        """Elimina anotaciones por identificador (se registra su baja en la bitácora)"""
+        now = datetime.datetime.now().isoformat(timespec="seconds")
+        lines = []
+        for item_id in item_ids:
+            if item_id in self.annotations:
+                lines.append(_journal_line("del", self.annotations[item_id], now))
+                self._apply_remove(item_id)
+        self._append(lines)
+        if self.dead_lines >= COMPACT_MIN_DEAD and self.dead_lines > len(self.annotations):
+            self.compact()
+        return len(lines)
+
+    def _append(self, lines):
+        if lines:
+            self._file.write("".join(lines))
+            self._file.flush()
+
+    def query(self, start, end):
+        """Anotaciones que se solapan con [start, end), ordenadas por inicio"""
+        return [self.annotations[i] for i in self.index.query(start, end).tolist()]
+
+    def compact(self):
+        """Reescribe la bitácora solo con las anotaciones vigentes (reemplazo atómico)"""
+        now = datetime.datetime.now().isoformat(timespec="seconds")
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", newline="", encoding="utf-8") as f:
+            f.write(",".join(JOURNAL_COLUMNS) + "\n")
+            f.write("".join(_journal_line("add", annotation, now) for annotation in self))
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(temporary, self.path)
+        self._file = open(self.path, "a", newline="", encoding="utf-8")
+        self.dead_lines = 0
+
+    def close(self):
+        if self.dead_lines > len(self.annotations):
+            self.compact()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+
+def assign_lanes(starts, ends, max_lanes=4):
+    """Carril de cada intervalo (ordenados por inicio) para dibujar los solapados sin encimarlos"""
+    lane_ends = []
+    lanes = np.zeros(len(starts), dtype=np.int64)
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        for lane, lane_end in enumerate(lane_ends):
+            if lane_end <= start:
+                break
+        else:
+            lane = len(lane_ends)
+            if lane < max_lanes:
+                lane_ends.append(end)
+            else:
+                # Sin carriles libres: se comparte el que se desocupa primero
+                lane = int(np.argmin(lane_ends))
+        lane_ends[lane] = max(lane_ends[lane], end)
+        lanes[i] = lane
+    return lanes
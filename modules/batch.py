@@ -0,0 +1,137 @@
+"""Análisis por lotes de grabaciones ECG sin interfaz gráfica.
+
+Aplica a cada archivo de un directorio el mismo filtrado, detección de picos
+R, BPM, delimitación, clasificación de ritmo y estadísticas que el visor de CSV, en paralelo con procesos, y
+escribe una tabla resumen con los tiempos de cada etapa. Si la tabla ya
+existe, los archivos analizados correctamente se omiten (ejecución reanudable).
+
+Uso: python -m modules.batch grabaciones/ --output resumen.csv --workers 8
+"""
+import argparse
+import csv
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from modules.dsp import (bpm_from_peaks, classify, delineate, detect_r_peaks, filter_offline, interval_summary,
+                         rhythm_summary, segment_stats)
+from modules.annotations import ANNOTATION_SUFFIX
+from modules.loader import load_signal
+from modules.recorder import GAP_INDEX_SUFFIX
+
+SUMMARY_COLUMNS = ["file", "size", "mtime", "status", "column", "fs", "samples", "duration_s",
+                   "gap_samples", "beats", "bpm", "pr_s", "qrs_s", "qt_s", "rhythm", "af_burden", "afl_burden",
+                   "apb", "pvc", "min", "max", "mean", "std",
+                   "load_s", "filter_s", "detect_s", "delineate_s", "classify_s", "total_s", "error"]
+
+
+def analyze_file(path, prefer_filtered=False, default_fs=250, start_s=None, end_s=None):
+    """Analiza una grabación completa; se ejecuta en un proceso de trabajo"""
+    stat = os.stat(path)
+    row = {"file": path, "size": stat.st_size, "mtime": stat.st_mtime}
+    t0 = time.perf_counter()
+    try:
+        signal, fs, column = load_signal(path, prefer_filtered=prefer_filtered, default_fs=default_fs)
+        t1 = time.perf_counter()
+        filtered = filter_offline(signal, fs)
+        t2 = time.perf_counter()
+        peaks, _ = detect_r_peaks(filtered, fs)
+        t3 = time.perf_counter()
+        beats = delineate(filtered, fs, peaks)
+        intervals = interval_summary(beats)
+        t4 = time.perf_counter()
+        labels, _ = classify(beats, fs)
+        t5 = time.perf_counter()
+
+        start = int(start_s * fs) if start_s is not None else 0
+        end = int(end_s * fs) if end_s is not None else len(filtered)
+        segment = filtered[start:end]
+        row.update({"status": "ok", "column": column, "fs": fs, "samples": len(signal),
+                    "duration_s": len(signal) / fs, "gap_samples": int(np.isnan(signal).sum()),
+                    "beats": len(peaks), "bpm": bpm_from_peaks(peaks, fs, filtered),
+                    "pr_s": intervals["pr"], "qrs_s": intervals["qrs"], "qt_s": intervals["qt"],
+                    **rhythm_summary(beats, labels),
+                    "load_s": t1 - t0, "filter_s": t2 - t1, "detect_s": t3 - t2, "delineate_s": t4 - t3,
+                    "classify_s": t5 - t4})
+        if len(segment):
+            row.update(segment_stats(segment))
+    except Exception as e:
+        row.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+    row["total_s"] = time.perf_counter() - t0
+    return row
+
+
+def find_recordings(directory, patterns=("*.csv", "*.ecgb"), recursive=False):
+    files = []
+    for pattern in patterns:
+        if recursive:
+            pattern = os.path.join("**", pattern)
+        files.extend(glob.glob(os.path.join(directory, pattern), recursive=recursive))
+    # Los índices de huecos y las anotaciones acompañan a las grabaciones pero no son grabaciones
+    return sorted(path for path in files if not path.endswith((GAP_INDEX_SUFFIX, ANNOTATION_SUFFIX)))
+
+
+def completed_files(summary_path):
+    """Archivos ya analizados con éxito y sin cambios desde entonces"""
+    done = set()
+    if not os.path.exists(summary_path):
+        return done
+    with open(summary_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get("status") == "ok":
+                done.add((row["file"], int(row["size"]), float(row["mtime"])))
+    return done
+
+
+def run_batch(directory, summary_path, workers=None, recursive=False, **options):
+    """Analiza los archivos pendientes y agrega una fila al resumen por cada uno.
+
+    Cada fila se escribe y se vuelca a disco en cuanto termina su archivo,
+    por lo que una ejecución interrumpida se reanuda donde se quedó.
+    """
+    done = completed_files(summary_path)
+    pending = []
+    for path in find_recordings(directory, recursive=recursive):
+        stat = os.stat(path)
+        if (path, stat.st_size, stat.st_mtime) not in done and os.path.abspath(path) != os.path.abspath(summary_path):
+            pending.append(path)
+    print(f"{len(pending)} archivos por analizar ({len(done)} ya en el resumen)")
+
+    write_header = not os.path.exists(summary_path) or os.path.getsize(summary_path) == 0
+    counts = {"ok": 0, "error": 0}
+    started = time.perf_counter()
+    with open(summary_path, "a", newline="", encoding="utf-8") as f, ProcessPoolExecutor(max_workers=workers) as pool:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS)
+        if write_header:
+            writer.writeheader()
+        futures = {pool.submit(analyze_file, path, **options): path for path in pending}
+        for future in as_completed(futures):
+            row = future.result()
+            writer.writerow(row)
+            f.flush()
+            counts[row["status"]] += 1
+            print(f"[{sum(counts.values())}/{len(pending)}] {row['status']:5s} {row['total_s']:.2f} s  {row['file']}")
+    elapsed = time.perf_counter() - started
+    print(f"Terminado en {elapsed:.1f} s: {counts['ok']} correctos, {counts['error']} con error")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Análisis por lotes de grabaciones ECG")
+    parser.add_argument("directory", help="Directorio con grabaciones .csv o .ecgb")
+    parser.add_argument("--output", default="resumen_ecg.csv", help="Tabla resumen (se reanuda si existe)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos de trabajo (por defecto, uno por núcleo)")
+    parser.add_argument("--recursive", action="store_true", help="Incluir subdirectorios")
+    parser.add_argument("--fs", type=float, default=250, help="Frecuencia de muestreo si el archivo no la indica")
+    parser.add_argument("--filtered", action="store_true", help="Analizar la columna filtrada en lugar de la cruda")
+    parser.add_argument("--start", type=float, default=None, help="Inicio del segmento para las estadísticas (s)")
+    parser.add_argument("--end", type=float, default=None, help="Fin del segmento para las estadísticas (s)")
+    args = parser.parse_args()
+
+    run_batch(args.directory, args.output, workers=args.workers, recursive=args.recursive,
+              prefer_filtered=args.filtered, default_fs=args.fs, start_s=args.start, end_s=args.end)
+
+
+if __name__ == "__main__":
+    main()
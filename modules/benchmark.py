@@ -0,0 +1,333 @@
+"""Benchmarks de las rutas críticas: adquisición, filtrado, detección y graficado.
+
+Todas las etapas procesan el mismo ECG sintético en bloques del tamaño que
+usa el monitor, y reportan rendimiento (muestras/s y su equivalente en
+latidos/s para el ritmo simulado), latencia por muestra
+(percentiles) y memoria pico. Los resultados se guardan en JSON para
+comparar ejecuciones y detectar regresiones. El graficado usa el backend
+Agg, por lo que todo corre sin pantalla.
+
+Uso: python -m modules.benchmark --output bench.json --compare bench_anterior.json
+"""
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import scipy
+from modules.acquisition import RingBuffer
+from modules.dsp import (BeatDelineator, FilterPipeline, RhythmClassifier, StreamingQRSDetector, classify, delineate,
+                        detect_r_peaks, filter_blocks, filter_offline, synthetic_ecg)
+from modules.protocol import DEFAULT_SCALE, BinaryFrameDecoder, encode_frame
+from modules.render import MinMaxPyramid, SweepBuffer
+
+BENCHMARKS = {}
+PERCENTILES = (50, 90, 99)
+
+
+def benchmark(name):
+    """Registra una etapa: ``setup(ecg, options)`` devuelve (función por bloque, bloques)"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def chunks_of(signal, size):
+    return [signal[i:i + size] for i in range(0, len(signal), size)]
+
+
+@benchmark("acquisition.decode")
+def bench_decode(ecg, options):
+    """Decodificación de tramas binarias como llegan por el puerto serie"""
+    counts = np.clip(np.rint(ecg.signal / DEFAULT_SCALE), -32768, 32767)
+    frames = b"".join(encode_frame(block, seq) for seq, block in enumerate(chunks_of(counts, 32)))
+    decoder = BinaryFrameDecoder()
+    reads = [frames[i:i + options.read_size] for i in range(0, len(frames), options.read_size)]
+    per_read = len(ecg.signal) / len(reads)
+    return (lambda data: decoder.feed(data)), reads, lambda data: per_read
+
+
+@benchmark("acquisition.ring")
+def bench_ring(ecg, options):
+    """Escritura y lectura del buffer circular entre hilo lector y GUI"""
+    ring = RingBuffer()
+    state = {"sequence": 0}
+
+    def step(chunk):
+        sequence = np.arange(state["sequence"], state["sequence"] + len(chunk))
+        state["sequence"] += len(chunk)
+        ring.write(chunk, time.time(), sequence)
+        ring.drain()
+    return step, chunks_of(ecg.signal, options.chunk), len
+
+
+@benchmark("filter.live")
+def bench_filter_live(ecg, options):
+    """ComunicationGUI.apply_filters: cadena SOS con estado por bloque"""
+    pipeline = FilterPipeline(ecg.fs)
+    return pipeline.process, chunks_of(ecg.signal, options.chunk), len
+
+
+@benchmark("filter.offline")
+def bench_filter_offline(ecg, options):
+    """Análisis por lotes: filtrado de fase cero del registro completo"""
+    return (lambda x: filter_offline(x, ecg.fs)), [ecg.signal] * options.repeat, len
+
+
+@benchmark("filter.blocks")
+def bench_filter_blocks(ecg, options):
+    """CsvLoaderGUI.apply_filters: filtrado de fase cero por bloques en procesos de trabajo"""
+    return (lambda x: filter_blocks(x, ecg.fs, workers=options.workers)), [ecg.signal] * options.repeat, len
+
+
+@benchmark("detect.live")
+def bench_detect_live(ecg, options):
+    """ComunicationGUI.calculate_bpm: detector QRS incremental"""
+    detector = StreamingQRSDetector(ecg.fs)
+    return detector.process, chunks_of(ecg.signal, options.chunk), len
+
+
+@benchmark("detect.offline")
+def bench_detect_offline(ecg, options):
+    """CsvLoaderGUI.normalize_and_detect_r: normalización y picos R del registro"""
+    return (lambda x: detect_r_peaks(x, ecg.fs)), [ecg.signal] * options.repeat, len
+
+
+@benchmark("delineate.live")
+def bench_delineate_live(ecg, options):
+    """ComunicationGUI.calculate_bpm: delimitación P/QRS/T de los latidos nuevos"""
+    pipeline, detector, delineator = FilterPipeline(ecg.fs), StreamingQRSDetector(ecg.fs), BeatDelineator(ecg.fs)
+    blocks = []
+    for chunk in chunks_of(ecg.signal, options.chunk):
+        filtered = pipeline.process(chunk)
+        blocks.append((filtered, detector.process(filtered)))
+    return (lambda block: delineator.process(*block)), blocks, lambda block: len(block[0])
+
+
+@benchmark("delineate.offline")
+def bench_delineate_offline(ecg, options):
+    """CsvLoaderGUI.normalize_and_detect_r: delimitación vectorizada del registro"""
+    filtered = filter_offline(ecg.signal, ecg.fs)
+    peaks, _ = detect_r_peaks(filtered, ecg.fs)
+    return (lambda x: delineate(x, ecg.fs, peaks)), [filtered] * options.repeat, len
+
+
+@benchmark("classify.live")
+def bench_classify_live(ecg, options):
+    """ComunicationGUI.calculate_bpm: clasificación de ritmo latido a latido"""
+    pipeline, detector, delineator = FilterPipeline(ecg.fs), StreamingQRSDetector(ecg.fs), BeatDelineator(ecg.fs)
+    classifier = RhythmClassifier()
+    blocks = []
+    for chunk in chunks_of(ecg.signal, options.chunk):
+        filtered = pipeline.process(chunk)
+        blocks.append((len(chunk), delineator.process(filtered, detector.process(filtered))))
+    return (lambda block: classifier.process(block[1])), blocks, lambda block: block[0]
+
+
+@benchmark("classify.offline")
+def bench_classify_offline(ecg, options):
+    """CsvLoaderGUI.normalize_and_detect_r: características, reglas y episodios del registro"""
+    filtered = filter_offline(ecg.signal, ecg.fs)
+    peaks, _ = detect_r_peaks(filtered, ecg.fs)
+    beats = delineate(filtered, ecg.fs, peaks)
+    return (lambda b: classify(b, ecg.fs)), [beats] * options.repeat, lambda b: len(ecg.signal)
+
+
+@benchmark("render.sweep")
+def bench_sweep(ecg, options):
+    """ComunicationGUI.update_display_buffer: escritura en el buffer de barrido"""
+    sweep = SweepBuffer(size=int(ecg.fs * 4))
+    return sweep.write, chunks_of(ecg.signal, options.chunk), len
+
+
+def _agg_figure():
+    # Figure + FigureCanvasAgg directamente: sin pyplot ni backend de Tk
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(8, 4), dpi=100)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    return canvas, ax
+
+
+def _frames(ecg, options):
+    """Bloques que recibe cada cuadro a ``options.fps``"""
+    per_frame = max(1, int(ecg.fs / options.fps))
+    frames = chunks_of(ecg.signal, per_frame)
+    return frames[:options.max_frames]
+
+
+@benchmark("render.agg_draw")
+def bench_agg_draw(ecg, options):
+    """Cuadro del monitor con redibujado completo del lienzo"""
+    canvas, ax = _agg_figure()
+    sweep = SweepBuffer(size=int(ecg.fs * 4))
+    line, = ax.plot(sweep.x, sweep.data, lw=1)
+    ax.set_ylim(ecg.signal.min(), ecg.signal.max())
+
+    def step(chunk):
+        sweep.write(chunk)
+        line.set_ydata(sweep.data)
+        canvas.draw()
+    return step, _frames(ecg, options), len
+
+
+@benchmark("render.agg_blit")
+def bench_agg_blit(ecg, options):
+    """Cuadro del monitor redibujando solo la línea sobre el fondo guardado"""
+    canvas, ax = _agg_figure()
+    sweep = SweepBuffer(size=int(ecg.fs * 4))
+    line, = ax.plot(sweep.x, sweep.data, lw=1, animated=True)
+    ax.set_ylim(ecg.signal.min(), ecg.signal.max())
+    canvas.draw()
+    background = canvas.copy_from_bbox(ax.bbox)
+
+    def step(chunk):
+        sweep.write(chunk)
+        line.set_ydata(sweep.data)
+        canvas.restore_region(background)
+        ax.draw_artist(line)
+        canvas.blit(ax.bbox)
+    return step, _frames(ecg, options), len
+
+
+@benchmark("render.lod_query")
+def bench_lod_query(ecg, options):
+    """Consulta de la pirámide min/max para ventanas de zoom aleatorias"""
+    pyramid = MinMaxPyramid(ecg.signal)
+    rng = np.random.default_rng(0)
+    n = len(ecg.signal)
+    windows = []
+    for _ in range(200):
+        width = int(rng.integers(ecg.fs, n))
+        start = int(rng.integers(0, n - width + 1))
+        windows.append((start, start + width))
+    return (lambda w: pyramid.query(w[0], w[1], 2000)), windows, lambda w: w[1] - w[0]
+
+
+def measure(name, ecg, options):
+    """Ejecuta una etapa: primero con cronómetro y luego con tracemalloc para la memoria"""
+    step, items, size_of = BENCHMARKS[name](ecg, options)
+    for item in items[:options.warmup]:
+        step(item)
+
+    step, items, size_of = BENCHMARKS[name](ecg, options)
+    sizes = np.array([size_of(item) for item in items], dtype=np.float64)
+    durations = np.empty(len(items))
+    clock = time.perf_counter
+    started = clock()
+    for i, item in enumerate(items):
+        t0 = clock()
+        step(item)
+        durations[i] = clock() - t0
+    total = clock() - started
+
+    step, items, _ = BENCHMARKS[name](ecg, options)
+    tracemalloc.start()
+    try:
+        for item in items:
+            step(item)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    per_sample_us = durations / np.maximum(sizes, 1) * 1e6
+    result = {
+        "calls": len(items),
+        "samples": int(sizes.sum()),
+        "seconds": total,
+        "samples_per_second": sizes.sum() / total if total > 0 else float("inf"),
+        "beats_per_second": sizes.sum() / total * len(ecg.beats) / len(ecg.signal) if total > 0 else float("inf"),
+        "realtime_factor": sizes.sum() / total / ecg.fs if total > 0 else float("inf"),
+        "peak_memory_bytes": peak,
+    }
+    for p in PERCENTILES:
+        result[f"call_ms_p{p}"] = float(np.percentile(durations, p) * 1e3)
+        result[f"sample_us_p{p}"] = float(np.percentile(per_sample_us, p))
+    result["call_ms_max"] = float(durations.max() * 1e3)
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Etapas cuyo rendimiento cayó más de ``tolerance`` respecto a la referencia"""
+    regressions = {}
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        ratio = result["samples_per_second"] / previous["samples_per_second"]
+        print(f"  {name:20s} {ratio:6.2f}× vs referencia")
+        if ratio < 1 - tolerance:
+            regressions[name] = ratio
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de las rutas críticas del monitor ECG")
+    parser.add_argument("--fs", type=float, default=250)
+    parser.add_argument("--duration", type=float, default=600, help="Duración del ECG sintético (s)")
+    parser.add_argument("--noise", type=float, default=0.02)
+    parser.add_argument("--rhythm", default="NSR", choices=["NSR", "AF", "AFL"])
+    parser.add_argument("--pvc-rate", type=float, default=0.02)
+    parser.add_argument("--apb-rate", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk", type=int, default=32, help="Muestras por bloque en las etapas en vivo")
+    parser.add_argument("--read-size", type=int, default=4096, help="Bytes por lectura del puerto serie")
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--max-frames", type=int, default=300, help="Cuadros en los benchmarks de graficado")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones de las etapas fuera de línea")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos del filtrado por bloques (por defecto, uno por núcleo)")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--only", nargs="*", default=None, help="Etapas a ejecutar (prefijos)")
+    parser.add_argument("--output", default=None, help="Archivo JSON con los resultados")
+    parser.add_argument("--compare", default=None, help="JSON de una ejecución anterior")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Caída tolerada antes de marcar regresión")
+    options = parser.parse_args()
+
+    ecg = synthetic_ecg(fs=options.fs, duration=options.duration, noise=options.noise, rhythm=options.rhythm,
+                        pvc_rate=options.pvc_rate, apb_rate=options.apb_rate, seed=options.seed)
+    names = [name for name in BENCHMARKS if not options.only or any(name.startswith(p) for p in options.only)]
+    results = {}
+    print(f"{'etapa':20s} {'muestras/s':>14s} {'latidos/s':>12s} {'×tiempo real':>13s} {'µs/muestra p50':>15s} "
+          f"{'p99':>9s} {'memoria pico':>13s}")
+    for name in names:
+        result = measure(name, ecg, options)
+        results[name] = result
+        print(f"{name:20s} {result['samples_per_second']:14,.0f} {result['beats_per_second']:12,.0f} "
+              f"{result['realtime_factor']:13,.1f} "
+              f"{result['sample_us_p50']:15.3f} {result['sample_us_p99']:9.3f} "
+              f"{result['peak_memory_bytes'] / 1024:10,.0f} KiB")
+
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "scipy": scipy.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "options": vars(options),
+        },
+        "results": results,
+    }
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados guardados en {options.output}")
+
+    if options.compare:
+        with open(options.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Comparación con {options.compare}:")
+        regressions = compare(results, baseline, options.tolerance)
+        if regressions:
+            print("Regresiones: " + ", ".join(f"{name} ({ratio:.2f}×)" for name, ratio in regressions.items()))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Caché persistente de resultados de análisis (señal leída, filtrada y picos R).
+
+Cada resultado se identifica con una clave derivada del contenido del
+archivo (BLAKE2b de sus bytes) y de todo lo que influye en el cálculo:
+columna, fs, coeficientes del filtro y versiones de los algoritmos. Así,
+un archivo movido o renombrado sigue encontrando sus resultados y uno
+modificado nunca reutiliza los anteriores.
+
+Hay dos niveles:
+
+- Memoria: LRU acotado por bytes, para alternar entre vistas sin recalcular.
+- Disco: un ``.npy`` por resultado en ``directory``; cada acierto actualiza
+  la fecha de modificación del archivo y, al superar ``max_bytes``, se
+  borran los de uso más antiguo.
+
+El resumen de cada archivo se recuerda por (ruta, tamaño, fecha de
+modificación) en ``digests.json``, para no volver a leerlo completo al
+reabrirlo.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+DEFAULT_DIRECTORY = os.environ.get("ECG_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "ecg-app"))
+DIGEST_INDEX = "digests.json"
+ENTRY_SUFFIX = ".npy"
+# Bytes leídos por bloque al calcular el resumen de un archivo
+DIGEST_BLOCK = 1 << 22
+
+
+def file_digest(path):
+    """Resumen BLAKE2b del contenido de un archivo, leído por bloques"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(DIGEST_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return hashlib.blake2b(np.ascontiguousarray(value).tobytes(), digest_size=16).hexdigest()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Parámetro no serializable en la clave: {type(value).__name__}")
+
+
+class AnalysisCache:
+    """Resultados de análisis en memoria y en disco, con desalojo LRU por tamaño"""
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=2 << 30, memory_bytes=512 << 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.memory = OrderedDict()
+        self.memory_used = 0
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._digests = self._read_digests()
+
+    # ---------- Claves ----------
+
+    def _read_digests(self):
+        try:
+            with open(os.path.join(self.directory, DIGEST_INDEX), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def known_digest(self, path):
+        """Resumen ya calculado de ``path`` si el archivo no cambió desde entonces; None si hay que leerlo"""
+        stat = os.stat(path)
+        known = self._digests.get(os.path.abspath(path))
+        if known is not None and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return known[2]
+        return None
+
+    def digest(self, path):
+        """Resumen del contenido de ``path``; se recalcula solo si cambió su tamaño o fecha.
+
+        Leer un archivo grande completo tarda: fuera de la caché, conviene
+        llamarlo desde un hilo de trabajo.
+        """
+        known = self.known_digest(path)
+        if known is not None:
+            return known
+        stat = os.stat(path)
+        path = os.path.abspath(path)
+        digest = file_digest(path)
+        with self._lock:
+            self._digests[path] = [stat.st_size, stat.st_mtime_ns, digest]
+            self._write_json(DIGEST_INDEX, self._digests)
+        return digest
+
+    @staticmethod
+    def key(*parts, **params):
+        """Clave de un resultado: partes en orden más parámetros con nombre (arreglos por su contenido)"""
+        text = json.dumps([parts, params], sort_keys=True, default=_json_default)
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=20).hexdigest()
+
+    # ---------- Lectura y escritura ----------
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        """Resultado guardado con ``key`` o None (una clave None nunca está en caché)"""
+        if key is None:
+            return None
+        with self._lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits["memory"] += 1
+                return self.memory[key]
+        path = self._entry_path(key)
+        try:
+            value = np.load(path, allow_pickle=False)
+            os.utime(path)  # Marca de uso para el desalojo LRU
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits["disk"] += 1
+        self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        """Guarda un arreglo en memoria y en disco (escritura atómica); con clave None solo lo devuelve"""
+        value = np.asarray(value)
+        if key is None:
+            return value
+        self._remember(key, value)
+        temporary = f"{self._entry_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as f:
+            np.save(f, value, allow_pickle=False)
+        os.replace(temporary, self._entry_path(key))
+        self.evict()
+        return value
+
+    def cached(self, key, compute):
+        """Devuelve el resultado guardado o lo calcula con ``compute()`` y lo guarda"""
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, compute())
+        return value
+
+    def _remember(self, key, value):
+        if value.nbytes > self.memory_bytes:
+            return
+        with self._lock:
+            if key in self.memory:
+                self.memory_used -= self.memory.pop(key).nbytes
+            self.memory[key] = value
+            self.memory_used += value.nbytes
+            while self.memory_used > self.memory_bytes:
+                _, old = self.memory.popitem(last=False)
+                self.memory_used -= old.nbytes
+
+    # ---------- Mantenimiento ----------
+
+    def entries(self):
+        """(ruta, bytes, último uso) de cada resultado en disco"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(ENTRY_SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def disk_usage(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Borra los resultados de uso más antiguo hasta quedar dentro de ``max_bytes``"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, _ in sorted(entries, key=lambda e: e[2]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self.memory.clear()
+            self.memory_used = 0
+        for path, _, _ in self.entries():
+            os.remove(path)
+
+    def _write_json(self, name, data):
+        path = os.path.join(self.directory, name)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temporary, path)
+
+    def stats(self):
+        return {"memory_hits": self.hits["memory"], "disk_hits": self.hits["disk"], "misses": self.misses,
+                "memory_bytes": self.memory_used, "disk_bytes": self.disk_usage()}
@@ -1,4 +1,5 @@
 import customtkinter as ctk
+from tkinter import filedialog
 from CTkMessagebox import CTkMessagebox
 import time
 import itertools
@@ -9,14 +10,19 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.animation as animation
 from matplotlib.animation import FuncAnimation
-from scipy.signal import butter, filtfilt, iirnotch, sosfilt, sosfiltfilt, lfilter, tf2sos
 from PIL import Image
 import datetime
-import csv
-from scipy.signal import find_peaks
-import socket
-import struct
+import os
 from CTkToolTip import *
+from modules.acquisition import RingBuffer, SerialReader
+from modules.dsp import BeatDelineator, FilterPipeline, GapTracker, RhythmClassifier, StreamingQRSDetector
+from modules.render import FrameRateMeter, SweepBuffer
+from modules.network import EcgStreamClient
+from modules.recorder import StreamingRecorder, gap_index_path, recover_incomplete_recordings
+from modules.ecgbin import BinaryStreamingRecorder
+from modules.loader import load_signal
+from modules.sources import FakeSerialDevice, PacedSource, SignalCursor, SyntheticStream
+from modules.instrument import profiler
 
 plt.style.use('dark_background')
 plt.rcParams['font.family'] = 'sans-serif'
@@ -40,11 +46,9 @@ class ComunicationGUI(ctk.CTkFrame):
         
         self.host = host
         self.port = int(port)
-        self.client_socket = None
         self.device_id = 1
         self.fs = 300  # Sampling frequency in Hz
-        self.sending_ecg = False
-        self.ecg_socket = None
+        self.stream_client = None  # Cliente persistente para enviar la señal al servidor
 
         # ---------- Configuración de puerto COM y Baud rate ----------
         top_frame = ctk.CTkFrame(self.main_layout, fg_color="transparent")
@@ -63,6 +67,16 @@ class ComunicationGUI(ctk.CTkFrame):
         self.refresh_button = ctk.CTkButton(com_frame, text="Actualizar", command=self.refresh_com_ports, width=80, height=30, font=self.text_font, image=self.icon_refresh)
         self.refresh_button.pack(side="left", padx=(5, 10))
 
+        # Modo de adquisición: texto continuo, tramas binarias o solicitud/respuesta (firmware anterior)
+        self.acquisition_modes = {"Continuo": "stream", "Binario": "binary", "Por solicitud": "poll"}
+        self.mode_combobox = ctk.CTkComboBox(com_frame, values=list(self.acquisition_modes.keys()), width=150, height=30, font=self.text_font)
+        self.mode_combobox.set("Continuo")
+
+        # Dispositivos simulados para pruebas sin hardware (se agregan a la lista de puertos)
+        self.simulated_devices = {"Simulador (ECG sintético)": "synthetic", "Puerto virtual (simulado)": "pty",
+                                  "Reproducir archivo (1×)...": 1.0, "Reproducir archivo (10×)...": 10.0}
+        self.mode_combobox.pack(side="left", padx=(5, 10))
+
         baud_frame = ctk.CTkFrame(top_frame, fg_color="transparent")
         baud_frame.pack(side="left", padx=5)
 
@@ -93,6 +107,13 @@ class ComunicationGUI(ctk.CTkFrame):
         self.graph_frame.pack(pady=10, padx=10, fill="x", expand=False)
 
         self.arduino = None
+        self.source_factory = None  # Crea la fuente simulada en lugar de SerialReader
+        self.fake_device = None  # Puerto virtual simulado
+        self.reader = None  # Hilo de adquisición
+        self.ring_buffer = RingBuffer(capacity=1 << 16)  # Muestras pendientes de graficar
+        self.gap_tracker = GapTracker()  # Huecos y duplicados en la numeración de muestras
+        self.frame_meter = FrameRateMeter(target_fps=30)  # Cuadros por segundo independientes de fs
+        self.max_samples_per_frame = self.fs  # Límite de trabajo por cuadro (1 s de señal)
         self.streaming = False
         self.ani = None
         # self.saving_data = False
@@ -100,20 +121,19 @@ class ComunicationGUI(ctk.CTkFrame):
         
         # Variables para el guardado continuo de datos
         self.continuos_recording = False
-        self.recording_data = []
-        self.recording_data_filtered = []
+        self.recorder = None  # Escritor a disco en segundo plano
         self.recording_start_time = None
 
-        # Variables para buffer circular
+        # Completar grabaciones que quedaron a medias por un cierre inesperado
+        for filename, samples in recover_incomplete_recordings().items():
+            print(f"Grabación recuperada: {filename} ({samples} muestras)")
+
+        # Muestras visibles en el eje X fijo
         self.buffer_size =  1000
-        self.current_index = 0
-        self.buffer_full = False
         
         # Variables para visualizar en tiempo real
         self.display_buffer_size = 1000 # Tamaño del buffer de visualización
-        self.display_index = 0 # Indice actual en el display
-        self.clearing_window = 15
-        self.y_display_data = [0] * self.display_buffer_size
+        self.sweep = SweepBuffer(self.display_buffer_size, gap=15)  # Buffer de barrido con ventana de limpieza
         
         # Crear un frame contenedor para la gráfica y el BPM
         self.plot_container = ctk.CTkFrame(self.graph_frame, fg_color="transparent")
@@ -130,21 +150,25 @@ class ComunicationGUI(ctk.CTkFrame):
         
         self.fig, self.ax = plt.subplots(figsize=(11, 7))
         
-        # Inicializar arrays con el tamaño del buffer
-        self.x_data = list(range(self.buffer_size))  # Eje X fijo de 0 a 199
-        self.x_display = list(range(self.display_buffer_size)) # Para visualización
-        self.y_data_raw = [0] * self.buffer_size  # Buffer circular para datos crudos
-        self.y_data_filtered = [0] * self.buffer_size  # Buffer circular para datos filtrados
-        self.y_display_data = [0] * self.display_buffer_size # Buffer para visualización
-        
-        # Buffer temporal para aplicar filtros (mantiene historial completo)
-        self.temp_raw_buffer = []
+        # Cadena de filtros con estado persistente entre bloques
+        self.filter_pipeline = FilterPipeline(self.fs)
+        # Detector de QRS incremental para el cálculo de BPM
+        self.qrs_detector = StreamingQRSDetector(self.fs)
+        # Delimitación P/QRS/T de cada latido nuevo
+        self.beat_delineator = BeatDelineator(self.fs)
+        # Ritmo y latidos ectópicos, clasificados latido a latido
+        self.rhythm_classifier = RhythmClassifier()
 
         # Línea principal del ECG
-        self.line_filtered, = self.ax.plot(self.x_data, self.y_data_filtered, label="Señal ECG", color='limegreen', linewidth=2)
+        self.line_filtered, = self.ax.plot(np.arange(self.display_buffer_size), self.sweep.data, label="Señal ECG", color='limegreen', linewidth=2)
         
         # Línea de limpieza
         self.clearing_line, = self.ax.plot([], [], color='#040b14', linewidth=4, alpha=0.1)
+
+        # Superposición de rendimiento (solo se dibuja si está activada)
+        self.perf_overlay = self.ax.text(0.01, 0.99, "", transform=self.ax.transAxes, va="top", ha="left",
+                                         family="monospace", fontsize=8, color="white", visible=False)
+        self.last_frame_time = None
         
         # Línea del cursor/indicador de posición actual
         # self.cursor_line, = self.ax.plot([], [], color='red', linewidth=2, alpha=0.8) # Remover cursor
@@ -200,6 +224,20 @@ class ComunicationGUI(ctk.CTkFrame):
         self.stop_button.pack(side="left", padx=10)
         
         self.stop_tooltip = CTkToolTip(self.stop_button, delay=0.5, message="Detén la lectura de datos.", font=self.text_font)
+
+        self.fps_combobox = ctk.CTkComboBox(self.buttons_frame, values=["30 FPS", "45 FPS", "60 FPS"], width=110, font=self.text_font, command=self.on_fps_change)
+        self.fps_combobox.set("30 FPS")
+        self.fps_combobox.pack(side="left", padx=10)
+
+        self.render_stats_label = ctk.CTkLabel(self.buttons_frame, text="FPS: --  |  Retraso: 0 muestras", font=self.text_font)
+        self.render_stats_label.pack(side="left", padx=10)
+
+        self.perf_var = ctk.StringVar(value="off")
+        self.perf_toggle = ctk.CTkCheckBox(self.buttons_frame, text="Rendimiento", variable=self.perf_var, onvalue="on", offvalue="off", font=self.text_font, command=self.on_perf_toggle)
+        self.perf_toggle.pack(side="left", padx=10)
+
+        self.perf_export_button = ctk.CTkButton(self.buttons_frame, text="Exportar métricas", command=self.export_metrics, font=self.text_font, width=80)
+        self.perf_export_button.pack(side="left", padx=10)
         
          # ---------- Filtros ----------
         self.frame_filter = ctk.CTkFrame(self.main_layout, fg_color="transparent")
@@ -211,15 +249,15 @@ class ComunicationGUI(ctk.CTkFrame):
 
         # Activar filtros por defecto
         self.low_pass_var = ctk.StringVar(value="on")  # Cambiado de "off" a "on"
-        self.low_pass_toggle = ctk.CTkCheckBox(self.filters_inner_frame, text="Pasa-bajas (20Hz)", variable=self.low_pass_var, onvalue="on", offvalue="off", font=self.text_font)
+        self.low_pass_toggle = ctk.CTkCheckBox(self.filters_inner_frame, text="Pasa-bajas (20Hz)", variable=self.low_pass_var, onvalue="on", offvalue="off", font=self.text_font, command=self.on_filter_toggle)
         self.low_pass_toggle.pack(side="left", padx=10)
 
         self.high_pass_var = ctk.StringVar(value="on")  # Cambiado de "off" a "on"
-        self.high_pass_toggle = ctk.CTkCheckBox(self.filters_inner_frame, text="Pasa-altas (0.5Hz)", variable=self.high_pass_var, onvalue="on", offvalue="off", font=self.text_font)
+        self.high_pass_toggle = ctk.CTkCheckBox(self.filters_inner_frame, text="Pasa-altas (0.5Hz)", variable=self.high_pass_var, onvalue="on", offvalue="off", font=self.text_font, command=self.on_filter_toggle)
         self.high_pass_toggle.pack(side="left", padx=10)
 
         self.notch_var = ctk.StringVar(value="on")  # Cambiado de "off" a "on"
-        self.notch_toggle = ctk.CTkCheckBox(self.filters_inner_frame, text="Notch (60Hz)", variable=self.notch_var, onvalue="on", offvalue="off", font=self.text_font)
+        self.notch_toggle = ctk.CTkCheckBox(self.filters_inner_frame, text="Notch (60Hz)", variable=self.notch_var, onvalue="on", offvalue="off", font=self.text_font, command=self.on_filter_toggle)
         self.notch_toggle.pack(side="left", padx=10)
 
         # Botón para verificar estado de filtros
@@ -229,11 +267,18 @@ class ComunicationGUI(ctk.CTkFrame):
         # Agregar BPM label en el frame derecho
         self.bpm_label = ctk.CTkLabel(self.bpm_frame, text="BPM: --", font=self.bpm_font, text_color="white")
         self.bpm_label.pack(anchor="center", pady=5)
+        self.intervals_label = ctk.CTkLabel(self.bpm_frame, text="PR --  QRS --  QT --", font=self.text_font)
+        self.intervals_label.pack(anchor="center")
+        self.rhythm_label = ctk.CTkLabel(self.bpm_frame, text="Ritmo: --", font=self.text_font)
+        self.rhythm_label.pack(anchor="center")
         
         self.connection_status_label = ctk.CTkLabel(self.bpm_frame, text="📲 Estado:", font=self.subtitle_font)
         self.connection_status_label.pack(padx=(5, 10))
         self.connected_label = ctk.CTkLabel(self.bpm_frame, text="Desconectado", font=self.subtitle_font, text_color="crimson")
         self.connected_label.pack(padx=(5, 10))
+        self.link_stats_label = ctk.CTkLabel(self.bpm_frame, text="", font=self.text_font)
+        self.link_stats_label.pack(padx=(5, 10))
+        self.last_link_stats = None
         
         #self.voltage_label = ctk.CTkLabel(self.graph_frame, text="Voltaje: -- V", font=self.text_font)
         #self.voltage_label.pack(side="right", padx=20)
@@ -250,6 +295,11 @@ class ComunicationGUI(ctk.CTkFrame):
         self.icon_save = ctk.CTkImage(Image.open("assets/icons/save.png"), size=self.icon_size)
         self.start_recording_button = ctk.CTkButton(self.bpm_frame, text="Exportar en CSV", command=self.start_continuos_recording, font=self.text_font, image=self.icon_save)
         self.start_recording_button.pack(padx=10, pady=10)
+
+        # Formato del guardado: CSV o binario (.ecgb, lectura rápida con memmap)
+        self.recording_format_combobox = ctk.CTkComboBox(self.bpm_frame, values=["CSV", "Binario (.ecgb)"], width=200, font=self.text_font)
+        self.recording_format_combobox.set("CSV")
+        self.recording_format_combobox.pack(padx=10, pady=(0, 10))
         
         self.icon_stop = ctk.CTkImage(Image.open("assets/icons/stop.png"), size=self.icon_size)
         self.stop_recording_button = ctk.CTkButton(self.bpm_frame, text="Detener guardado", command=self.stop_continuos_recording, font=self.text_font, image=self.icon_stop)
@@ -261,6 +311,8 @@ class ComunicationGUI(ctk.CTkFrame):
         # --------------- Enviar información a dispositivo remoto -----------------
         self.label_remote = ctk.CTkLabel(self.bpm_frame, text="📡 Enviar datos:", font=self.subtitle_font)
         self.label_remote.pack(padx=10, pady=10)
+        self.network_status_label = ctk.CTkLabel(self.bpm_frame, text="", font=self.text_font)
+        self.network_status_label.pack(padx=10)
         
         self.patient_icon = ctk.CTkImage(Image.open("assets/icons/patient.png"), size=self.icon_size)
         self.save_patient_button = ctk.CTkButton(self.bpm_frame, text="Guardar Paciente", command=self.save_patient_data, font=self.text_font, image=self.patient_icon)
@@ -305,19 +357,14 @@ class ComunicationGUI(ctk.CTkFrame):
         CTkMessagebox(title="Éxito", message="Los datos del paciente se han guardado correctamente", icon="check")
         
     def send_patient_data(self):
-        """Envía datos del paciente al servidor"""
+        """Envía datos del paciente al servidor por la conexión persistente"""
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.connect((self.host, self.port))
-                s.sendall(b'PAT ')
-                
-                patient_str = (f"{self.patient_data['id']}|{self.patient_data['nombre1']}|"
-                             f"{self.patient_data['nombre2']}|{self.patient_data['apellido_paterno']}|"
-                             f"{self.patient_data['apellido_materno']}|{self.patient_data['curp']}|"
-                             f"{self.patient_data['fecha']}")
-                
-                s.sendall(patient_str.encode('utf-8'))
-                print(f"Datos paciente {self.patient_data['id']} enviados")
+            patient_str = (f"{self.patient_data['id']}|{self.patient_data['nombre1']}|"
+                         f"{self.patient_data['nombre2']}|{self.patient_data['apellido_paterno']}|"
+                         f"{self.patient_data['apellido_materno']}|{self.patient_data['curp']}|"
+                         f"{self.patient_data['fecha']}")
+            self.ensure_stream_client().send_patient(patient_str)
+            print(f"Datos paciente {self.patient_data['id']} encolados para envío")
         except Exception as e:
             print(f"Error enviando datos paciente: {e}")
             CTkMessagebox(title="Error", message="No se pudo enviar los datos del paciente al servidor", icon="cancel")
@@ -331,33 +378,58 @@ class ComunicationGUI(ctk.CTkFrame):
             print("Error: El ID del dispositivo ECG debe ser 1 o 2")
             
     def send_ecg_stream(self):
+        """Inicia el envío de la señal (el cliente se reconecta solo si se pierde la conexión)"""
         try:
-            self.ecg_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.ecg_socket.connect((self.host, self.port))
-            self.ecg_socket.sendall(b'ECG ')
-            header = struct.pack('<I4sII', self.device_id, b'ECG', self.fs, 1)
-            self.ecg_socket.sendall(header)
-            self.sending_ecg = True
-            print("✅ Conectado al servidor como cliente ECG")
+            self.ensure_stream_client()
         except Exception as e:
-            print(f"❌ Error al conectar con servidor ECG: {e}")
-            self.sending_ecg = False
+            print(f"❌ Error al iniciar el cliente ECG: {e}")
+
+    def ensure_stream_client(self):
+        """Crea el cliente de envío en segundo plano si aún no existe"""
+        if self.stream_client is None or not self.stream_client.is_alive():
+            self.stream_client = EcgStreamClient(self.host, self.port, self.device_id, self.fs)
+            self.stream_client.start()
+        return self.stream_client
+
+    def stop_stream_client(self):
+        if self.stream_client is not None:
+            self.stream_client.stop()
+            self.stream_client = None
             
     def refresh_com_ports(self):
         """Actualiza la lista de puertos COM disponibles"""
         ports = serial.tools.list_ports.comports()
-        port_list = [port.device for port in ports]
+        port_list = [port.device for port in ports] + list(self.simulated_devices)
         self.com_port_combobox.configure(values=port_list)
         if port_list:
             self.com_port_combobox.set(port_list[0])
 
     def disconnect_com_port(self):
         """Desconecta el dispositivo de comunicación"""
-        if self.arduino and self.arduino.is_open:
-            self.arduino.close()
+        if (self.arduino and self.arduino.is_open) or self.source_factory is not None:
+            self.stop_reader()
+            if self.arduino is not None:
+                self.arduino.close()
             self.arduino = None
+            self.source_factory = None
+            self.stop_fake_device()
+            self.connected_label.configure(text="Desconectado", text_color="crimson")
             CTkMessagebox(title="Desconectado", message="Puerto COM cerrado correctamente", icon="check")
 
+    def stop_fake_device(self):
+        if self.fake_device is not None:
+            self.fake_device.stop()
+            self.fake_device = None
+
+    def destroy(self):
+        """Detiene los hilos de adquisición y envío al cerrar la página"""
+        if self.continuos_recording:
+            self.stop_continuos_recording()
+        self.stop_reader()
+        self.stop_stream_client()
+        self.stop_fake_device()
+        super().destroy()
+
     #def show_baud_info(self):
     #    """Muestra información sobre el baud rate seleccionado"""
     #    CTkMessagebox(title="Información", message="Selecciona el baud rate que coincida con tu dispositivo.", icon="info")
@@ -385,18 +457,21 @@ class ComunicationGUI(ctk.CTkFrame):
         
     def init_plot(self):
         """Inicializa el gráfico antes de la animación"""
-        self.line_filtered.set_data(self.x_display, self.y_display_data)
+        self.line_filtered.set_data(self.sweep.x, self.sweep.data)
         self.clearing_line.set_data([], [])
         # self.cursor_line.set_data([], []) # Remove cursor
-        return self.line_filtered, self.clearing_line #, self.cursor_line
+        return self.plot_artists()
     
     def begin_device(self):
         """Inicia el dispositivo de comunicación"""
-        if self.arduino is None:
+        if self.arduino is None and self.source_factory is None:
+            self.port_device = self.com_port_combobox.get()
+            if self.port_device in self.simulated_devices:
+                self.begin_simulated_device(self.simulated_devices[self.port_device])
+                return
             try:
-                self.port_device = self.com_port_combobox.get()
                 self.baud = int(115200)
-                self.arduino = serial.Serial(port=self.port_device, baudrate=self.baud, timeout=1)
+                self.arduino = serial.Serial(port=self.port_device, baudrate=self.baud, timeout=0.1)
                 self.connected_label.configure(text="Conectado", text_color="limegreen")
                 CTkMessagebox(title="Dispositivo", message="El dispositivo se ha conectado con éxito", icon="check")
             except serial.SerialException:
@@ -407,12 +482,54 @@ class ComunicationGUI(ctk.CTkFrame):
                 CTkMessagebox(title="Error", message="Error al conectar con el dispositivo", icon="cancel")
                 return
             
+    def begin_simulated_device(self, kind):
+        """Conecta una fuente simulada: sintética, archivo reproducido o puerto virtual"""
+        try:
+            if kind == "synthetic":
+                stream = SyntheticStream(self.fs, pvc_rate=0.02)
+                self.source_factory = lambda ring: PacedSource(ring, stream, self.fs)
+            elif kind == "pty":
+                # Pasa por SerialReader y el decodificador igual que un dispositivo real
+                self.fake_device = FakeSerialDevice(SyntheticStream(self.fs, pvc_rate=0.02), fs=self.fs)
+                self.fake_device.start()
+                self.arduino = serial.Serial(port=self.fake_device.port_name, baudrate=115200, timeout=0.1)
+            else:
+                path = filedialog.askopenfilename(filetypes=[("Grabaciones ECG", "*.csv *.ecgb")])
+                if not path:
+                    return
+                signal, fs, _ = load_signal(path, prefer_filtered=False, default_fs=self.fs)
+                self.set_sampling_rate(fs)
+                # El cursor se conserva entre pausas para reanudar donde se quedó
+                stream = SignalCursor(signal, loop=True)
+                self.source_factory = lambda ring: PacedSource(ring, stream, fs, speed=kind)
+        except ImportError:
+            CTkMessagebox(title="Error", message="El puerto virtual solo está disponible en Linux/macOS", icon="cancel")
+            return
+        except Exception as e:
+            self.stop_fake_device()
+            CTkMessagebox(title="Error", message=f"No se pudo iniciar la simulación: {e}", icon="cancel")
+            return
+        self.connected_label.configure(text="Simulado", text_color="orange")
+
+    def set_sampling_rate(self, fs):
+        """Cambia la frecuencia de muestreo de la cadena de procesamiento"""
+        if fs == self.fs:
+            return
+        self.fs = fs
+        self.max_samples_per_frame = int(fs)
+        self.filter_pipeline.set_fs(fs)
+        self.qrs_detector = StreamingQRSDetector(fs)
+        self.beat_delineator = BeatDelineator(fs)
+        self.rhythm_classifier.reset()
+        self.stop_stream_client()  # Se reconecta con la nueva fs
+
     def start_animation(self):
         """Comienza la animación del gráfico"""
-        if self.arduino is None or not self.arduino.is_open:
+        if self.source_factory is None and (self.arduino is None or not self.arduino.is_open):
             CTkMessagebox(title="Error", message="Debe conectar el dispositivo primero.", icon="cancel")
             return
         else:
+            self.start_reader()
             if self.ani is None:
                 self.animacion()  # Inicializa la animación
             elif not self.animation_running:
@@ -422,29 +539,50 @@ class ComunicationGUI(ctk.CTkFrame):
 
     def pause_animation(self):
         "Pausa la animación del gráfico"
+        self.stop_reader()
         self.streaming = False
         self.animation_running = False
 
+    def start_reader(self):
+        """Inicia el hilo de adquisición si no está corriendo"""
+        if self.reader is not None and self.reader.is_alive():
+            return
+        self.ring_buffer.clear()
+        self.gap_tracker.reset()  # Cada lector numera sus muestras desde cero
+        if self.source_factory is not None:
+            self.reader = self.source_factory(self.ring_buffer)
+        else:
+            mode = self.acquisition_modes.get(self.mode_combobox.get(), "stream")
+            self.reader = SerialReader(self.arduino, self.ring_buffer, mode=mode)
+        self.reader.start()
+
+    def stop_reader(self):
+        """Detiene el hilo de adquisición"""
+        if self.reader is not None:
+            self.reader.stop()
+            self.reader = None
+
     def stop_animation(self):
         """Detiene la animación y resetea el gráfico"""
         # Detener guardado continuo si está activo
         if self.continuos_recording:
             self.stop_continuos_recording()
 
+        self.stop_reader()
+        self.ring_buffer.clear()
         self.streaming = False    
         if self.ani:
             self.ani.event_source.stop()
             self.animation_running = False
         
         # Resetear buffers
-        self.current_index = 0
-        self.display_index = 0
-        self.buffer_full = False
-        self.y_data_raw = [0] * self.buffer_size
-        self.y_data_filtered = [0] * self.buffer_size
-        self.temp_raw_buffer.clear()
-        
-        self.line_filtered.set_data(self.x_display, self.y_display_data)
+        self.sweep.reset()
+        self.filter_pipeline.reset()
+        self.qrs_detector.reset()
+        self.beat_delineator.reset()
+        self.rhythm_classifier.reset()
+        
+        self.line_filtered.set_data(self.sweep.x, self.sweep.data)
         self.clearing_line.set_data([], [])
         # self.cursor_line.set_data([], []) # Remove cursor
         self.canvas.draw()
@@ -453,190 +591,200 @@ class ComunicationGUI(ctk.CTkFrame):
         """Anima el gráfico en tiempo real"""
         if self.ani is None:
             self.ani = animation.FuncAnimation(self.fig, self.update_plot, frames=itertools.count(), 
-                                            init_func=self.init_plot, blit=True, interval=2)
+                                            init_func=self.init_plot, blit=True, interval=self.frame_meter.frame_interval_ms,
+                                            cache_frame_data=False)
         self.animation_running = True
+        self.frame_meter.reset()
         self.ani.event_source.start()
         
-    def reading(self, signal):
-        try:
-            self.arduino.write(signal.encode())
-            time.sleep(0.00001)
-            data = self.arduino.readline().decode().strip()
-
-            if not data:
-                # Si está vacío, retornar 0.0 sin error
-                return 0.0
-
-            val = float(data)
-            return val
-        except Exception as e:
-            print(f"⚠️ Error al leer dato del puerto: {e} - Dato recibido: {repr(data)}")
-            return 0.0
+    def on_fps_change(self, choice):
+        """Cambia el presupuesto de cuadros sin afectar la adquisición"""
+        self.frame_meter.target_fps = int(choice.split()[0])
+        if self.ani is not None:
+            self.ani.event_source.interval = self.frame_meter.frame_interval_ms
+
+    def update_render_stats(self, samples, backlog):
+        """Actualiza FPS logrados y retraso de adquisición (una vez por segundo)"""
+        if self.frame_meter.tick(samples, backlog):
+            backlog_ms = 1000 * self.frame_meter.max_backlog / self.fs
+            self.render_stats_label.configure(
+                text=f"FPS: {self.frame_meter.fps:.1f}  |  {self.frame_meter.samples_per_second:.0f} muestras/s  |  Retraso: {backlog_ms:.0f} ms")
+            self.frame_meter.max_backlog = 0
+            if profiler.enabled:
+                link = self.reader.stats() if self.reader is not None else {}
+                profiler.gauge("muestras/s", self.frame_meter.samples_per_second)
+                profiler.gauge("fps", self.frame_meter.fps)
+                profiler.gauge("retraso_ms", backlog_ms)
+                profiler.gauge("perdidas", self.gap_tracker.missing_samples + self.gap_tracker.overrun_samples)
+                self.perf_overlay.set_text(profiler.overlay_text())
+            if self.continuos_recording and self.recording_start_time:
+                current_duration = (datetime.datetime.now() - self.recording_start_time).total_seconds()
+                # Los bloques que el escritor no alcanzó a guardar quedan como hueco en el archivo
+                dropped = self.recorder.dropped_samples
+                lost = f"  ({dropped} muestras descartadas)" if dropped else ""
+                self.recording_status_label.configure(text=f"🔴 Guardando... {current_duration:.1f}s{lost}")
+                if profiler.enabled:
+                    profiler.gauge("descartadas_grabacion", dropped)
+            if self.stream_client is not None:
+                net = self.stream_client.stats()
+                state = "conectado" if net["connected"] else "reconectando"
+                self.network_status_label.configure(text=f"Envío {state}  |  Cola: {net['queue']}  |  Perdidas: {net['dropped']}")
+
+    def plot_artists(self):
+        """Artistas que redibuja el blit en cada cuadro"""
+        if self.perf_overlay.get_visible():
+            return self.line_filtered, self.clearing_line, self.perf_overlay
+        return self.line_filtered, self.clearing_line
+
+    def on_perf_toggle(self):
+        """Activa la medición de etapas y la superposición de rendimiento"""
+        enabled = self.perf_var.get() == "on"
+        profiler.enabled = enabled
+        if enabled:
+            profiler.reset()
+            self.last_frame_time = None
+        self.perf_overlay.set_text("Midiendo..." if enabled else "")
+        self.perf_overlay.set_visible(enabled)
+        self.canvas.draw_idle()
+
+    def export_metrics(self):
+        """Guarda histogramas y duraciones recientes de cada etapa en JSON"""
+        if not profiler.stages:
+            CTkMessagebox(title="Métricas", message="Active 'Rendimiento' y adquiera datos primero.", icon="warning")
+            return
+        filename = f"metricas_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        profiler.export(filename)
+        CTkMessagebox(title="Métricas", message=f"Métricas guardadas en {filename}", icon="check")
 
-    def apply_filters(self, signal_data):
-        """Aplicar filtros de ECG de manera optimizada"""
-        if len(signal_data) < 30:  # Necesitamos más datos para filtros estables
-            return signal_data[-1] if len(signal_data) > 0 else 0
-        
-        # Convertir a numpy array
-        filtered_signal = np.array(signal_data.copy(), dtype=np.float64)
-        
+    def apply_filters(self, samples):
+        """Filtra un bloque de muestras conservando el estado de cada etapa"""
         try:
-            # 1. Filtro Notch primero (eliminar interferencia de red 60Hz)
-            if self.notch_var.get() == "on":
-                b, a = iirnotch(60, Q=60, fs=self.fs)
-                sos = tf2sos(b, a)
-                filtered_signal = sosfiltfilt(sos, filtered_signal)
-            
-            # 2. Filtro pasa-altas (eliminar deriva de línea base)
-            if self.high_pass_var.get() == "on":
-                sos = butter(4, 0.5, btype='highpass', fs=self.fs, output='sos')
-                filtered_signal = sosfilt(sos, filtered_signal)
-            
-            # 3. Filtro pasa-bajas (anti-aliasing y suavizado)
-            if self.low_pass_var.get() == "on":
-                sos = butter(4, 20, btype='lowpass', fs=self.fs, output='sos')
-                filtered_signal = sosfilt(sos, filtered_signal)
-            
-            return filtered_signal[-1]
-            
+            return self.filter_pipeline.process(samples)
         except Exception as e:
             print(f"Error aplicando filtros: {e}")
-            return signal_data[-1] if len(signal_data) > 0 else 0
+            return np.asarray(samples, dtype=np.float64)
+
+    def on_filter_toggle(self):
+        """Sincroniza las casillas con la cadena de filtros (solo reinicia la etapa modificada)"""
+        self.filter_pipeline.set_enabled("notch", self.notch_var.get() == "on")
+        self.filter_pipeline.set_enabled("high_pass", self.high_pass_var.get() == "on")
+        self.filter_pipeline.set_enabled("low_pass", self.low_pass_var.get() == "on")
         
     def update_plot(self, frame):
         if not self.animation_running:
-            return self.line_filtered, self.clearing_line #, self.cursor_line # Remove cursor
+            return self.plot_artists()
+
+        # El intervalo entre cuadros incluye el dibujado con blit y el resto del ciclo de Tk
+        frame_start = time.perf_counter()
+        if self.last_frame_time is not None:
+            profiler.record("frame_interval", frame_start - self.last_frame_time)
+        self.last_frame_time = frame_start
+
+        # Tomar todo lo que llegó desde el cuadro anterior (con un límite de trabajo por cuadro)
+        with profiler.stage("drain"):
+            chunk = self.ring_buffer.drain(max_samples=self.max_samples_per_frame)
+        self.update_render_stats(len(chunk.samples), self.ring_buffer.available())
+        self.check_recorder()
+        if len(chunk.samples) == 0:
+            return self.plot_artists()
+
+        # Las muestras perdidas quedan como NaN en su lugar (nunca como ceros)
+        samples, timestamps = self.gap_tracker.check(chunk.samples, chunk.timestamps, chunk.sequence)
+        if len(samples) == 0:
+            return self.plot_artists()
+
+        # Filtrar todo el bloque en una sola llamada vectorizada
+        with profiler.stage("filter"):
+            filtered = self.apply_filters(samples)
+
+        # Actualizar buffer de visualización con todo el bloque
+        with profiler.stage("display_buffer"):
+            self.update_display_buffer(filtered)
+
+        # Guardar en guardado continuo si está habilitado (el escritor trabaja en su propio hilo)
+        if self.continuos_recording:
+            with profiler.stage("record"):
+                self.recorder.write(samples, filtered, timestamps)
 
-        # Leer dato crudo
-        raw_value = self.reading("raw") 
-        
-        # Agregar al buffer temporal para filtros
-        self.temp_raw_buffer.append(raw_value)
-        
-        # Actualizar buffer circular con el nuevo dato raw (para guardado)
-        self.y_data_raw[self.current_index] = raw_value
-        
-        # Calcular voltaje actual del dato crudo
-        current_voltage = raw_value 
-        #self.voltage_label.configure(text=f"Voltaje: {current_voltage:.3f} V")
+        # Enviar el bloque al servidor (el cliente lo agrupa en tramas en su propio hilo)
+        if self.stream_client is not None:
+            with profiler.stage("send"):
+                self.stream_client.push(filtered, timestamps[0])
 
-        # APLICAR FILTROS MEJORADOS
-        filtered_value = self.apply_filters(self.temp_raw_buffer)
-        
-        # Actualizar buffer circular con el dato filtrado
-        self.y_data_filtered[self.current_index] = filtered_value
-        
-        # Actualizar buffer de visualización
-        self.update_display_buffer(filtered_value)
-        
-        if self.sending_ecg and self.ecg_socket:
-            try:
-                if isinstance(filtered_value, (int, float)) and not np.isnan(filtered_value):
-                    int_val = int(filtered_value * 1000)
-                    packed = struct.pack('<h', int_val)
-                    self.ecg_socket.sendall(packed)
-                else:
-                    raise TypeError(f"Valor inválido para enviar: {filtered_value}")
-            except Exception as e:
-                print(f"❌ Error enviando datos ECG: {e}")
-                self.sending_ecg = False
-        
-        # Guardar en guardado continuo si está habilitado
-        if self.continuos_recording:
-            self.recording_data_raw.append(raw_value)
-            self.recording_data_filtered.append(filtered_value)
-            
-            if self.recording_start_time:
-                current_duration = (datetime.datetime.now() - self.recording_start_time).total_seconds()
-                self.recording_status_label.configure(text=f"🔴 Guardando... {current_duration:.1f}s")
+        if self.reader is not None:
+            self.update_link_stats({**self.reader.stats(), **self.gap_tracker.stats()})
 
         # Detectar picos R y calcular BPM solo en la señal filtrada
-        if self.buffer_full or self.current_index > 50:  # Solo calcular si hay suficientes datos
-            bpm = self.calculate_bpm(self.y_data_filtered)
+        with profiler.stage("bpm"):
+            bpm = self.calculate_bpm(filtered)
             self.update_bpm_label(bpm)
 
-        # Avanzar índice del buffer circular
-        self.current_index = (self.current_index + 1) % self.buffer_size
-        if self.current_index == 0:
-            self.buffer_full = True
+        # Actualizar solo la línea filtrada en el gráfico
+        with profiler.stage("plot_data"):
+            self.update_realtime_display()
+        profiler.record("update_plot", time.perf_counter() - frame_start)
 
-        # Limitar el buffer temporal para evitar que crezca indefinidamente
-        if len(self.temp_raw_buffer) > 1000:  # Mantener últimos 1000 puntos para filtros
-            self.temp_raw_buffer = self.temp_raw_buffer[-1000:]
+        return self.plot_artists()
 
-        # Actualizar solo la línea filtrada en el gráfico
-        #self.line_filtered.set_data(self.x_data, self.y_data_filtered)
-        self.update_realtime_display()
+    def check_recorder(self):
+        """Detiene el guardado si el hilo escritor falló o terminó (p. ej. disco lleno), en vez de seguir sin escribir"""
+        if not self.continuos_recording or self.recorder is None:
+            return
+        if self.recorder.error is None and self.recorder.is_alive():
+            return
+        error = self.recorder.error or "el hilo de escritura terminó"
+        self.stop_continuos_recording()
+        self.recording_status_label.configure(text=f"⚠️ Guardado detenido: {error}")
+
+    def update_link_stats(self, stats):
+        """Muestra tramas perdidas, corruptas y muestras faltantes solo cuando cambian"""
+        counters = (stats.get("dropped", 0), stats.get("corrupt", 0), stats.get("missing", 0) + stats.get("overrun", 0))
+        if counters == self.last_link_stats:
+            return
+        self.last_link_stats = counters
+        self.link_stats_label.configure(text=f"Perdidas: {counters[0]}  Corruptas: {counters[1]}  Huecos: {counters[2]} muestras")
 
-        return self.line_filtered, self.clearing_line #, self.cursor_line # Remove cursor
-    
     def update_realtime_display(self):
-        # Actualizar línea principal del ECG
-        self.line_filtered.set_data(self.x_display, self.y_display_data)
-        
-        # Obtener posiciones para efectos visuales
-        cursor_pos, clearing_positions = self.get_display_positions()
-        
-        # Actualizar cursor (línea roja vertical que indica posición actual)
-        # y_range = self.ax.get_ylim() # Remove cursor
-        # self.cursor_line.set_data([cursor_pos, cursor_pos], [y_range[0], y_range[1]]) # Remove cursor
-        
-        # Actualizar ventan de limpieza (línea negra que "borra")
-        if clearing_positions:
-            y_range = self.ax.get_ylim() # Moved y_range here as it's still needed for clearing_line
-            clearing_x = clearing_positions
-            clearing_y_bottom = [y_range[0]] * len(clearing_positions)
-            clearing_y_top = [y_range[1]] * len(clearing_positions) 
-            
-            # Mostrar solo la primera poisición de limpieza
-            first_clear_pos = clearing_positions[0]
-            self.clearing_line.set_data([first_clear_pos, first_clear_pos], [y_range[0], y_range[1]])
-    
-    def calculate_bpm(self, signal):
-        # Convertir signal a numpy array si no lo es
-        if not isinstance(signal, np.ndarray):
-            signal = np.array(signal)
-            
-        # Solo usar datos no-cero para evitar falsos picos
-        non_zero_signal = signal[signal != 0]
-        if len(non_zero_signal) < 20:  # Necesitamos suficientes datos
-            return 0
-            
-        # Parámetros mejorados para detección de picos R
-        # Altura mínima basada en el rango de la señal
-        signal_range = np.max(non_zero_signal) - np.min(non_zero_signal)
-        if signal_range == 0:
-            return 0
-            
-        min_height = np.mean(non_zero_signal) + 0.3 * signal_range
-        
-        # Distancia mínima entre picos (aproximadamente 0.4 segundos)
-        min_distance = int(0.4 * self.fs)  # Ajustado para la velocidad de muestreo (self.fs)
+        # Actualizar línea principal del ECG (el eje X es fijo: una sola llamada a set_ydata por cuadro)
+        self.line_filtered.set_ydata(self.sweep.data)
         
+        # Actualizar ventana de limpieza (línea negra que "borra") en la primera posición de limpieza
+        y_range = self.ax.get_ylim()
+        first_clear_pos = self.sweep.clear_position
+        self.clearing_line.set_data([first_clear_pos, first_clear_pos], y_range)
+    
+    def calculate_bpm(self, filtered):
+        """Alimenta el detector de QRS con el bloque nuevo y devuelve el BPM de la ventana de RR"""
         try:
-            # Detectar picos R
-            peaks, properties = find_peaks(non_zero_signal, height=min_height, distance=min_distance, prominence=0.1 * signal_range)
-
-            # Calcular BPM si hay suficientes picos
-            if len(peaks) >= 2:
-                # Calcular intervalos entre picos (en muestras)
-                intervals = np.diff(peaks)
-                
-                # Convertir a tiempo 
-                intervals_seconds = intervals / self.fs # fs = sampling frequency
-                
-                # Calcular BPM promedio
-                avg_interval = np.mean(intervals_seconds)
-                if avg_interval > 0:
-                    bpm = 60 / avg_interval
-                    # Limitar BPM a un rango razonable
-                    return max(30, min(200, bpm))
+            peaks = self.qrs_detector.process(filtered)
+            beats = self.beat_delineator.process(filtered, peaks)
+            _, labels = self.rhythm_classifier.process(beats)
         except Exception as e:
             print(f"Error calculando BPM: {e}")
-        
+            return 0
+        if len(beats):
+            self.update_intervals_label(beats[-1])
+        if len(labels):
+            self.update_rhythm_label()
+
+        bpm = self.qrs_detector.bpm()
+        if bpm > 0:
+            # Limitar BPM a un rango razonable
+            return max(30, min(200, bpm))
         return 0
 
+    def update_intervals_label(self, beat):
+        """Intervalos PR, QRS y QT del último latido delimitado (en ms)"""
+        def ms(value):
+            return "--" if np.isnan(value) else f"{1000 * value:.0f}"
+        self.intervals_label.configure(text=f"PR {ms(beat['pr'])}  QRS {ms(beat['qrs'])}  QT {ms(beat['qt'])} ms")
+
+    def update_rhythm_label(self):
+        """Ritmo de los últimos latidos y ectópicos acumulados en la sesión"""
+        counts = self.rhythm_classifier.counts
+        self.rhythm_label.configure(text=f"Ritmo: {self.rhythm_classifier.rhythm}  "
+                                         f"APB {counts['APB']}  PVC {counts['PVC']}")
+
     def update_bpm_label(self, bpm):
         # Mostrar BPM
         if bpm > 0:
@@ -652,32 +800,13 @@ class ComunicationGUI(ctk.CTkFrame):
         else:
             self.bpm_label.configure(text="BPM: --", text_color="white")
             
-    def update_display_buffer(self, new_value):
-        self.y_display_data[self.display_index] = new_value
-        # Limpiar las muestras que van por delante (efecto ventana)
-        #for i in range(1, self.clearing_window + 1): 
-        for j in range(1, self.clearing_window + 1):
-            clear_index = (self.display_index + j) % self.display_buffer_size
-            self.y_display_data[clear_index] = 0
-        
-        # Avanzar el índice de visualización
-        self.display_index = (self.display_index + 1) % self.display_buffer_size
-        
-    def get_display_positions(self):
-        # Posición del cursor (línea roja que indica dónde se está escribiendo)
-        cursor_pos = self.display_index
-        
-        # Posiciones de la ventana de limpieza
-        clearing_positions = []
-        for i in range(1, self.clearing_window + 1):
-            pos = (self.display_index + i) % self.display_buffer_size
-            clearing_positions.append(pos)
-        
-        return cursor_pos, clearing_positions
-    
+    def update_display_buffer(self, values):
+        """Escribe un bloque en el buffer de barrido y limpia el hueco por delante del cursor"""
+        self.sweep.write(values)
+        
     # Método para personalizar el tamaño de la ventana de limpieza
     def set_clearing_window_size(self, size):
-        self.clearing_window = max(5, min(30, size))
+        self.sweep.gap = max(5, min(30, size))
             
     def start_continuos_recording(self):
         patient_name = self.patient_name_entry.get().strip()
@@ -692,11 +821,18 @@ class ComunicationGUI(ctk.CTkFrame):
             CTkMessagebox(title="Error", message="Debe iniciar la adquisición de datos antes de guardarlos.", icon="cancel")
             return
         
-        # Inicializar guardado continuo de datos
-        self.continuos_recording = True
-        self.recording_data_raw = []
-        self.recording_data_filtered = []
+        # Inicializar guardado continuo de datos (el archivo se escribe mientras se graba)
         self.recording_start_time = datetime.datetime.now()
+        binary = self.recording_format_combobox.get().startswith("Binario")
+        filename = f"ECG_{patient_name}_{patient_id}_{self.recording_start_time.strftime('%Y%m%d_%H%M%S')}.{'ecgb' if binary else 'csv'}"
+        recorder_class = BinaryStreamingRecorder if binary else StreamingRecorder
+        try:
+            self.recorder = recorder_class(filename, patient_name, patient_id, self.fs, self.recording_start_time)
+        except OSError as e:
+            CTkMessagebox(title="Error", message=f"Error al crear archivo: {str(e)}", icon="cancel")
+            return
+        self.recorder.start()
+        self.continuos_recording = True
         
         # Actualizar botones y etiqueta de guardado en interfaz
         self.start_recording_button.configure(state="disabled")
@@ -718,45 +854,36 @@ class ComunicationGUI(ctk.CTkFrame):
         self.stop_recording_button.configure(state="disabled")
         self.recording_status_label.configure(text=" ")
         
-        # Comprobar si hay datos grabados para guardarlos
-        if len(self.recording_data_raw) > 0:
-            self.save_continuos_recording_data(recording_end_time)
-        else:
-            CTkMessagebox(title="Sin datos", message="No hay datos para guardar", icon="warning")
+        self.save_continuos_recording_data(recording_end_time)
             
     def save_continuos_recording_data(self, end_time):
-        patient_name = self.patient_name_entry.get().strip()
-        patient_id = self.patient_id_entry.get().strip().upper()
-        
+        """Termina de escribir el archivo y completa el encabezado"""
+        recorder = self.recorder
+        filename = recorder.filename
         duration_seconds = (end_time - self.recording_start_time).total_seconds()
-        sampling_rate = self.fs  
-        
-        # Crear nombre de archivo para el guardado de datos
-        filename = f"ECG_{patient_name}_{patient_id}_{self.recording_start_time.strftime('%Y%m%d_%H%M%S')}.csv"
         
         try:
-            with open(filename, mode="w", newline="") as file:
-                writer = csv.writer(file)
-                
-                # Encazabezados con información detallada
-                writer.writerow(["Guardado continuo de ECG"])
-                writer.writerow([f"Paciente: {patient_name}_({patient_id})"])
-                writer.writerow([f"Inicio: {self.recording_start_time.strftime('%Y-%m-%d %H:%M:%S')}"])
-                writer.writerow([f"Fin: {end_time.strftime('%Y-%m-%d %H:%M:%S')}"])
-                writer.writerow([f"Duracion: {duration_seconds:.2f} segundos ({len(self.recording_data_raw)} muestras)"])
-                writer.writerow([f"Frecuencia de muestreo: {sampling_rate} Hz"])
-                
-                # Encabezados de datos
-                writer.writerow(["Sample", "Time", "Raw signal", "Filtered signal"])
-                
-                # Escribir todos los datos grabados
-                for i, (raw_val, filtered_val) in enumerate(zip(self.recording_data_raw, self.recording_data_filtered)):
-                    time_seconds = i / sampling_rate  # Corrected calculation
-                    writer.writerow([i, f"{time_seconds:.3f}", raw_val, filtered_val])
-                    
-            CTkMessagebox(title="Datos guardados", 
-                          message=f"Datos guardados correctamente\nArchivo: {filename}\nDuración: {duration_seconds:.2f} segundos\nMuestras: {len(self.recording_data_raw)}", 
-                          icon="check")
-                
+            samples = recorder.finish(end_time)
         except Exception as e:
             CTkMessagebox(title="Error", message=f"Error al guardar archivo: {str(e)}", icon="cancel")
+            return
+        finally:
+            self.recorder = None
+
+        if recorder.error is not None:
+            CTkMessagebox(title="Error", 
+                          message=f"El guardado se detuvo por un error de escritura: {recorder.error}\nArchivo: {filename}\nMuestras guardadas: {samples}", 
+                          icon="cancel")
+            return
+
+        # Comprobar si hay datos grabados
+        if samples == 0:
+            os.remove(filename)
+            if os.path.exists(gap_index_path(filename)):
+                os.remove(gap_index_path(filename))
+            CTkMessagebox(title="Sin datos", message="No hay datos para guardar", icon="warning")
+            return
+
+        CTkMessagebox(title="Datos guardados", 
+                      message=f"Datos guardados correctamente\nArchivo: {filename}\nDuración: {duration_seconds:.2f} segundos\nMuestras: {samples}", 
+                      icon="check")
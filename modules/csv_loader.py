@@ -1,15 +1,20 @@
+import threading
 import customtkinter as ctk
 from tkinter import filedialog
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import pandas as pd
-import threading
-import time
 import numpy as np
-from scipy.signal import butter, filtfilt, find_peaks
-import csv
 from PIL import Image
 from CTkToolTip import *
+from modules.dsp import (DETECTOR_VERSION, LABELS, OFFLINE_FILTER_VERSION, bpm_from_peaks, classify, delineate,
+                        design_offline_filters, detect_r_peaks, fiducial, filter_blocks, interval_summary, normalize,
+                        rhythm_summary, segment_stats)
+from modules.annotations import AnnotationStore
+from modules.cache import AnalysisCache
+from modules.ecgbin import EcgBinReader
+from modules.loader import ChunkedCsvLoader
+from modules.playback import PlaybackEngine
+from modules.render import AnnotationLayer, MinMaxPyramid
 
 class CsvLoaderGUI(ctk.CTkFrame):
     def __init__(self, parent, sampling_rate=250, *args, **kwargs):
@@ -17,10 +22,17 @@ class CsvLoaderGUI(ctk.CTkFrame):
         
         self.sampling_rate = sampling_rate
         self.window_duration = 5
-        self.current_index = 0
         self.signal_data = []
         self.filtered_data = []
-        self.annotations = []
+        self.lod = None  # Pirámide min/max para graficar registros largos
+        self.beats = None  # Delimitación P/QRS/T del último análisis de picos R
+        self.annotation_store = None  # Bitácora de anotaciones de la grabación abierta
+        self.episodes = []  # Episodios propuestos por el clasificador de ritmo
+        self.cache = AnalysisCache()  # Señal, filtrado y picos R por contenido del archivo
+        self.recording_path = None
+        self.signal_key = None  # Clave en caché de signal_data
+        self.data_key = None  # Clave en caché de lo que contiene filtered_data (None: sin caché)
+        self.digest_job = None  # Resumen del archivo abierto en cálculo (hilo de trabajo)
         
         self.title_font = ctk.CTkFont(family="Poppins SemiBold", size=24)
         self.subtitle_font = ctk.CTkFont(family="Poppins Medium Italic", size=14)
@@ -34,6 +46,16 @@ class CsvLoaderGUI(ctk.CTkFrame):
         self.load_button.pack(pady=10)
         
         self.load_tooltip = CTkToolTip(self.load_button, delay=1, message="Elige un archivo CSV con los datos de la señal ECG.")
+
+        # Columna a cargar de las grabaciones de la app y progreso de lectura
+        self.column_option = ctk.CTkOptionMenu(self, values=["Señal filtrada", "Señal cruda"], command=self.on_column_change)
+        self.column_option.set("Señal filtrada")
+        self.column_option.pack(pady=(0, 5))
+
+        self.load_progress = ctk.CTkProgressBar(self, width=400)
+        self.load_progress.set(0)
+        self.loader = None
+        self.filter_job = None  # Filtrado por bloques en curso (hilo de trabajo)
         
         self.control_frame = ctk.CTkFrame(self)
         self.control_frame.pack(pady=10, fill="x")
@@ -42,6 +64,11 @@ class CsvLoaderGUI(ctk.CTkFrame):
         self.pause_button = ctk.CTkButton(self.control_frame, text="Pausar", command=self.toggle_animation, image=self.pause_button_image, font=self.text_font, compound="left")
         self.pause_button.pack(side="left", padx=5)
 
+        # Velocidad de reproducción respecto al tiempo real
+        self.speed_selector = ctk.CTkSegmentedButton(self.control_frame, values=["1×", "5×", "25×"], command=self.on_speed_change)
+        self.speed_selector.set("1×")
+        self.speed_selector.pack(side="left", padx=5)
+
         self.start_entry = ctk.CTkEntry(self.control_frame, placeholder_text="Inicio (s)", width=100)
         self.start_entry.pack(side="left", padx=5)
         self.end_entry = ctk.CTkEntry(self.control_frame, placeholder_text="Fin (s)", width=100)
@@ -81,11 +108,18 @@ class CsvLoaderGUI(ctk.CTkFrame):
         self.canvas.mpl_connect("button_press_event", self.on_press)
         self.canvas.mpl_connect("button_release_event", self.on_release)
 
+        # Anotaciones de la ventana visible, consultadas al índice de la grabación
+        self.annotation_layer = AnnotationLayer(self.canvas)
+
+        # Reproducción con blit programada con after desde el hilo principal
+        self.playback = PlaybackEngine(self, self.canvas, self.ax, window_duration=self.window_duration)
+        self.playback.on_finished = self.on_playback_finished
+
         # Anotación
         self.annotation_frame = ctk.CTkFrame(self)
         self.annotation_frame.pack(pady=10, fill="x")
 
-        self.label_option = ctk.CTkOptionMenu(self.annotation_frame, values=["NSR", "AF", "AFL", "APB", "PVC", "Otro", "??"])
+        self.label_option = ctk.CTkOptionMenu(self.annotation_frame, values=list(LABELS))
         self.label_option.set("NSR")
         self.label_option.pack(side="left", padx=5)
 
@@ -93,48 +127,177 @@ class CsvLoaderGUI(ctk.CTkFrame):
         self.save_annotation_button = ctk.CTkButton(self.annotation_frame, text="Anotar", command=self.save_annotation, font=self.text_font, compound="left")
         self.save_annotation_button.pack(side="left", padx=5)
         
-        self.save_annotation_tooltip = CTkToolTip(self.save_annotation_button, delay=1, message="Realiza anotaciones en la señal y guarda en un archivo CSV.")
+        self.save_annotation_tooltip = CTkToolTip(self.save_annotation_button, delay=1, message="Realiza anotaciones en la señal y las guarda junto a la grabación (<archivo>.annotations.csv).")
 
-        self.animating = False
+        self.remove_annotation_button = ctk.CTkButton(self.annotation_frame, text="Quitar", command=self.remove_annotations, font=self.text_font)
+        self.remove_annotation_button.pack(side="left", padx=5)
 
-    def load_csv(self):
-        file_path = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv")])
-        if not file_path:
-            return
+        self.remove_annotation_tooltip = CTkToolTip(self.remove_annotation_button, delay=1, message="Elimina las anotaciones que se solapan con el intervalo seleccionado.")
+
+        self.prefill_button = ctk.CTkButton(self.annotation_frame, text="Pre-anotar", command=self.prefill_annotations, font=self.text_font)
+        self.prefill_button.pack(side="left", padx=5)
+
+        self.prefill_tooltip = CTkToolTip(self.prefill_button, delay=1, message="Agrega a las anotaciones los episodios de ritmo y latidos ectópicos propuestos por el clasificador (requiere detectar picos R).")
 
+    def load_csv(self):
+        file_path = filedialog.askopenfilename(filetypes=[("Grabaciones ECG", "*.csv *.ecgb"), ("CSV Files", "*.csv"), ("ECG binario", "*.ecgb")])
+        if file_path:
+            self.open_recording(file_path)
+
+    def on_column_change(self, value):
+        # Alternar entre cruda y filtrada vuelve a abrir la grabación; tras la primera vez sale de la caché
+        if self.recording_path is not None:
+            self.open_recording(self.recording_path)
+
+    def open_recording(self, file_path):
+        self.playback.pause()
+        prefer_filtered = self.column_option.get() == "Señal filtrada"
+        # Una lectura de CSV en curso no debe reemplazar al terminar la grabación recién abierta
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader = None
+            self.load_progress.pack_forget()
         try:
-            df = pd.read_csv(file_path)
-            column = df.columns[0]
-            self.signal_data = df[column].values
-            self.filtered_data = self.signal_data.copy()
-            self.current_index = 0
-            self.animating = True
-
-            self.ax.set_xlim(0, self.window_duration)
-            self.ax.set_ylim(min(self.signal_data), max(self.signal_data))
-            threading.Thread(target=self.animate_plot, daemon=True).start()
+            self.recording_path = file_path
+            self.open_annotations(file_path)
+            # Solo se reutiliza un resumen ya calculado: leer el archivo completo para calcularlo
+            # se hace en un hilo de trabajo y mientras tanto los resultados no se guardan en caché
+            digest = self.cache.known_digest(file_path)
+            self.digest_job = None if digest is not None else self.start_digest(file_path)
+            if file_path.endswith(".ecgb"):
+                # Lectura por memmap: abre al instante sin cargar todo el archivo
+                self.recording = EcgBinReader(file_path)
+                self.sampling_rate = int(round(self.recording.fs))
+                column = "filtered" if prefer_filtered else "raw"
+                self.data_key = self.cache.key(digest, column) if digest is not None else None
+                self.show_signal(self.recording.signal(column))
+                if self.digest_job is not None:
+                    self.after(100, self.poll_digest, self.digest_job, column)
+                return
+
+            # Lectura por bloques en un hilo de trabajo; la GUI solo consulta el avance
+            self.loader = ChunkedCsvLoader(file_path, prefer_filtered=prefer_filtered)
+            if self.loader.fs:
+                self.sampling_rate = int(round(self.loader.fs))
+            self.data_key = self.cache.key(digest, self.loader.column) if digest is not None else None
+            signal = self.cache.get(self.data_key)
+            if signal is not None:
+                # Archivo ya leído antes (aunque se haya movido o renombrado): no hace falta parsear el CSV
+                self.loader = None
+                self.stats_label.configure(text=f"✅ {len(signal)} muestras en caché ({self.sampling_rate} Hz)")
+                self.show_signal(signal)
+                return
+            self.overview_shown = False
+            self.load_progress.set(0)
+            self.load_progress.pack(pady=(0, 5), after=self.column_option)
+            self.stats_label.configure(text=f"⏳ Cargando '{self.loader.column}' ({self.sampling_rate} Hz)...")
+            self.loader.start()
+            self.after(100, self.poll_loader, self.loader)
         except Exception as e:
             print("Error al cargar CSV:", e)
 
-    def animate_plot(self):
-        while self.animating and self.current_index + self.window_duration * self.sampling_rate < len(self.filtered_data):
-            start = self.current_index
-            end = start + self.window_duration * self.sampling_rate
-            x_data = [i / self.sampling_rate for i in range(start, end)]
-            y_data = self.filtered_data[start:end]
+    def start_digest(self, file_path):
+        """Calcula el resumen del archivo en un hilo de trabajo; la GUI consulta ``done``"""
+        job = {"path": file_path, "digest": None, "done": False}
+
+        def run():
+            try:
+                job["digest"] = self.cache.digest(file_path)
+            except OSError as e:
+                print("Error al calcular el resumen del archivo:", e)
+            finally:
+                job["done"] = True
+
+        threading.Thread(target=run, daemon=True).start()
+        return job
+
+    def poll_digest(self, job, column):
+        """Activa la caché de una grabación .ecgb cuando su resumen está listo"""
+        if job is not self.digest_job:
+            return  # Se abrió otra grabación o columna
+        if not job["done"]:
+            self.after(100, self.poll_digest, job, column)
+            return
+        self.digest_job = None
+        if job["digest"] is None:
+            return
+        self.signal_key = self.cache.key(job["digest"], column)
+        # Si ya se filtró, el filtrado se hizo sin clave; solo la señal cargada queda identificada
+        if self.filtered_data is self.signal_data:
+            self.data_key = self.signal_key
+
+    def poll_loader(self, loader):
+        """Consulta el hilo de lectura desde el hilo principal de Tk"""
+        if loader is not self.loader:
+            return  # Lectura cancelada o reemplazada por otra grabación
+        self.load_progress.set(loader.progress)
+
+        if not self.overview_shown and loader.overview is not None and len(loader.overview[1]):
+            # Vista general aproximada mientras termina la lectura completa
+            rows, values = loader.overview
+            self.ax.clear()
+            self.ax.plot(rows / self.sampling_rate, values, lw=1)
+            self.ax.set_title("Vista previa (cargando...)")
+            self.ax.set_xlabel("Tiempo aproximado (s)")
+            self.ax.set_ylabel("Amplitud")
+            self.canvas.draw_idle()
+            self.overview_shown = True
 
-            self.line.set_data(x_data, y_data)
-            self.ax.set_xlim(x_data[0], x_data[-1])
-            self.ax.set_ylim(min(y_data), max(y_data))
-            self.canvas.draw()
-            self.current_index += 1
-            time.sleep(0.01)
+        job = self.digest_job
+        if not loader.done or (job is not None and not job["done"]):
+            self.after(100, self.poll_loader, loader)
+            return
+        if job is not None:
+            self.digest_job = None
+            self.data_key = self.cache.key(job["digest"], loader.column) if job["digest"] is not None else None
+
+        self.load_progress.pack_forget()
+        self.loader = None
+        if loader.error is not None:
+            self.stats_label.configure(text=f"Error al cargar CSV: {loader.error}")
+            return
+        if loader.result is None:
+            return
+        self.stats_label.configure(text=f"✅ {len(loader.result)} muestras cargadas ({self.sampling_rate} Hz)")
+        self.show_signal(self.cache.put(self.data_key, loader.result))
+
+    def show_signal(self, signal):
+        """Prepara la gráfica para la señal cargada e inicia la reproducción"""
+        self.signal_data = signal
+        self.signal_key = self.data_key
+        self.filtered_data = self.signal_data
+        self.lod = MinMaxPyramid(self.filtered_data)
+        self.start_playback()
+
+    def start_playback(self):
+        """Reinicia la gráfica y reproduce ``filtered_data`` desde el inicio"""
+        self.playback.pause()
+        self.ax.clear()
+        self.ax.set_title("Señal ECG")
+        self.ax.set_xlabel("Tiempo en la ventana (s)")
+        self.ax.set_ylabel("Amplitud")
+        self.annotation_layer.attach(self.ax)
+        self.playback.load(self.filtered_data, self.sampling_rate, y_limits=self.lod.extent())
+        self.line = self.playback.line
+        self.annotation_layer.set_hidden(True)
+        # Un registro más corto que la ventana se dibuja completo y queda en pausa
+        if self.playback.start():
+            self.pause_button.configure(text="⏸ Pausar")
 
     def toggle_animation(self):
-        self.animating = not self.animating
-        self.pause_button.configure(text="▶ Reanudar" if not self.animating else "⏸ Pausar")
-        if self.animating:
-            threading.Thread(target=self.animate_plot, daemon=True).start()
+        # Con la reproducción en pausa el eje x vuelve a tiempo absoluto y se muestran las anotaciones
+        self.annotation_layer.set_hidden(True)
+        running = self.playback.toggle()
+        self.annotation_layer.set_hidden(running)
+        self.pause_button.configure(text="⏸ Pausar" if running else "▶ Reanudar")
+
+    def on_speed_change(self, value):
+        self.playback.set_speed(float(value.rstrip("×")))
+
+    def on_playback_finished(self):
+        self.annotation_layer.set_hidden(False)
+        self.canvas.draw_idle()
+        self.pause_button.configure(text="▶ Reanudar")
 
     def analyze_segment(self):
         try:
@@ -148,61 +311,136 @@ class CsvLoaderGUI(ctk.CTkFrame):
                 self.stats_label.configure(text="⚠️ Rango vacío.")
                 return
 
+            values = segment_stats(segment)
             stats = {
-                "Mínimo": np.min(segment),
-                "Máximo": np.max(segment),
-                "Media": np.mean(segment),
-                "Desv. Estándar": np.std(segment)
+                "Mínimo": values["min"],
+                "Máximo": values["max"],
+                "Media": values["mean"],
+                "Desv. Estándar": values["std"]
             }
 
+            self.playback.pause()
+            self.pause_button.configure(text="▶ Reanudar")
             stats_text = "\n".join([f"{k}: {v:.2f}" for k, v in stats.items()])
             self.stats_label.configure(text=f"📊 Características del segmento:\n{stats_text}")
 
-            x_data = [i / self.sampling_rate for i in range(self.start_idx, self.end_idx)]
-            self.line.set_data(x_data, segment)
+            x_data, y_data = self.lod_points(self.start_idx, self.end_idx)
+            self.line.set_data(x_data, y_data)
             self.ax.set_xlim(x_data[0], x_data[-1])
-            self.ax.set_ylim(min(segment), max(segment))
+            self.ax.set_ylim(stats["Mínimo"], stats["Máximo"])
             self.canvas.draw()
 
         except Exception as e:
             self.stats_label.configure(text=f"Error al analizar: {e}")
 
     def apply_filters(self):
+        if self.lod is None or len(self.signal_data) == 0:
+            self.stats_label.configure(text="❌ Abre una grabación primero.")
+            return
         try:
-            nyq = 0.5 * self.sampling_rate
-            low = 0.5 / nyq
-            high = 40 / nyq
-            b, a = butter(2, [low, high], btype='band')
-            notch_freq = 60.0
-            q = 30.0
-            b_notch, a_notch = butter(2, [notch_freq - 1, notch_freq + 1], btype='bandstop', fs=self.sampling_rate)
-            temp = filtfilt(b, a, self.signal_data)
-            self.filtered_data = filtfilt(b_notch, a_notch, temp)
-            self.current_index = 0
-            self.animating = True
-            threading.Thread(target=self.animate_plot, daemon=True).start()
+            # La clave incluye los coeficientes: cambiar fs o el diseño del filtro no reutiliza resultados viejos
+            key = None
+            if self.signal_key is not None:
+                key = self.cache.key(self.signal_key, "filter", OFFLINE_FILTER_VERSION, self.sampling_rate,
+                                     sos=design_offline_filters(self.sampling_rate))
+            filtered = self.cache.get(key)
+            if filtered is not None:
+                self.show_filtered(key, filtered)
+                return
+            if self.filter_job is not None:
+                return
+
+            # Filtrado por bloques en procesos de trabajo; la GUI solo consulta el avance
+            job = {"key": key, "signal": self.signal_data, "progress": 0.0, "result": None, "error": None, "done": False}
+            signal, fs = self.signal_data, self.sampling_rate
+
+            def run():
+                try:
+                    job["result"] = filter_blocks(signal, fs, progress=lambda done, total: job.update(progress=done / total))
+                except Exception as e:
+                    job["error"] = e
+                finally:
+                    job["done"] = True
+
+            self.filter_job = job
+            self.load_progress.set(0)
+            self.load_progress.pack(pady=(0, 5), after=self.column_option)
+            self.stats_label.configure(text="⏳ Filtrando...")
+            threading.Thread(target=run, daemon=True).start()
+            self.after(100, self.poll_filter)
         except Exception as e:
             self.stats_label.configure(text=f"Error al filtrar: {e}")
 
+    def poll_filter(self):
+        """Consulta el filtrado por bloques desde el hilo principal de Tk"""
+        job = self.filter_job
+        self.load_progress.set(job["progress"])
+        if not job["done"]:
+            self.after(100, self.poll_filter)
+            return
+
+        self.load_progress.pack_forget()
+        self.filter_job = None
+        if job["error"] is not None:
+            self.stats_label.configure(text=f"Error al filtrar: {job['error']}")
+            return
+        self.cache.put(job["key"], job["result"])
+        # Si mientras tanto se abrió otra grabación, el resultado queda en caché sin mostrarse
+        if job["signal"] is self.signal_data:
+            self.stats_label.configure(text="✅ Señal filtrada")
+            self.show_filtered(job["key"], job["result"])
+
+    def show_filtered(self, key, filtered):
+        self.data_key = key
+        self.filtered_data = filtered
+        self.lod.rebuild(self.filtered_data)
+        self.start_playback()
+
     def normalize_and_detect_r(self):
         try:
-            # Normalización de la señal
-            norm = (self.filtered_data - np.min(self.filtered_data)) / (np.max(self.filtered_data) - np.min(self.filtered_data))
-
-            # Detección de picos R
-            peaks, _ = find_peaks(norm, distance=0.2*self.sampling_rate, height=0.5)
+            # Normalización de la señal y detección de picos R (los picos se guardan en caché)
+            key = None
+            if self.data_key is not None:
+                key = self.cache.key(self.data_key, "r_peaks", DETECTOR_VERSION, self.sampling_rate, height=0.5, refractory=0.2)
+            peaks = self.cache.cached(
+                key, lambda: detect_r_peaks(self.filtered_data, self.sampling_rate, height=0.5, refractory=0.2)[0])
+            norm = normalize(self.filtered_data)
+            min_value, max_value = self.lod.extent()
 
             # Calcular BPM
-            time_between_peaks = np.diff(peaks) / self.sampling_rate  # Intervalos entre picos R en segundos
-            bpm = 60 / np.mean(time_between_peaks) if len(time_between_peaks) > 0 else 0  # Promedio de los intervalos convertidos a BPM
+            bpm = bpm_from_peaks(peaks, self.sampling_rate, self.filtered_data)
+
+            # Delimitar P/QRS/T de todos los latidos a la vez
+            self.beats = delineate(self.filtered_data, self.sampling_rate, peaks)
+            intervals = interval_summary(self.beats)
 
-            # Mostrar BPM en la interfaz
-            self.stats_label.configure(text=f"🫀 BPM estimado: {bpm:.2f} BPM")
+            # Clasificar ritmo y latidos ectópicos; los episodios quedan listos para pre-anotar
+            labels, self.episodes = classify(self.beats, self.sampling_rate)
+            rhythm = rhythm_summary(self.beats, labels)
+
+            # Mostrar BPM, intervalos (medianas) y ritmo en la interfaz
+            text = "  ".join(f"{name.upper()}: {1000 * intervals[name]:.0f} ms" for name in ("pr", "qrs", "qt")
+                             if not np.isnan(intervals[name]))
+            self.stats_label.configure(text=f"🫀 BPM estimado: {bpm:.2f} BPM\n{text}\n"
+                                            f"Ritmo: {rhythm['rhythm']}  APB: {rhythm['apb']}  PVC: {rhythm['pvc']}  "
+                                            f"({len(self.episodes)} episodios propuestos)")
 
             # Graficar la señal normalizada y los picos R
+            self.playback.pause()
+            self.pause_button.configure(text="▶ Reanudar")
             self.ax.clear()
-            self.ax.plot(np.arange(len(norm)) / self.sampling_rate, norm, label="Normalizado")
+            self.annotation_layer.attach(self.ax)
+            self.annotation_layer.set_hidden(False)
+            x_data, y_data = self.lod_points(0, len(norm))
+            # Misma escala que ``normalize``: una señal plana queda en cero en lugar de dividir por cero
+            span = max_value - min_value
+            y_norm = (y_data - min_value) / span if span > 0 else np.zeros_like(y_data, dtype=np.float64)
+            self.ax.plot(x_data, y_norm, label="Normalizado")
             self.ax.plot(peaks / self.sampling_rate, norm[peaks], "rx", label="Picos R")
+            for name, marker, label in (("p_peak", "g^", "P"), ("t_peak", "mv", "T")):
+                points = fiducial(self.beats, name)
+                points = points[points >= 0]
+                self.ax.plot(points / self.sampling_rate, norm[points], marker, markersize=4, label=label)
             self.ax.set_title("Normalización + Picos R")
             self.ax.set_xlabel("Tiempo (s)")
             self.ax.set_ylabel("Amplitud")
@@ -212,39 +450,87 @@ class CsvLoaderGUI(ctk.CTkFrame):
         except Exception as e:
             self.stats_label.configure(text=f"Error en picos R: {e}")
 
+    def lod_points(self, start_idx, end_idx):
+        """Puntos a graficar en el rango: a lo sumo ~2× el ancho del eje en píxeles"""
+        width = int(self.ax.get_window_extent().width)
+        x, y = self.lod.query(start_idx, end_idx, 2 * max(width, 100))
+        return x / self.sampling_rate, y
+
+    def event_time(self, event):
+        """Tiempo absoluto del clic; en reproducción el eje x es relativo a la ventana"""
+        if self.playback.running:
+            return event.xdata + self.playback.window_start
+        return event.xdata
+
     def on_press(self, event):
         if event.inaxes != self.ax:
             return
-        self.start_selection = event.xdata
+        self.start_selection = self.event_time(event)
 
     def on_release(self, event):
-        if event.inaxes != self.ax:
+        if event.inaxes != self.ax or self.start_selection is None:
             return
-        self.end_selection = event.xdata
-        self.ax.axvspan(self.start_selection, self.end_selection, color='orange', alpha=0.3)
-        self.canvas.draw()
-
-    def save_annotation(self):
+        self.end_selection = self.event_time(event)
+        if self.playback.running:
+            # El fondo de la reproducción no debe guardar el intervalo desplazado
+            return
+        self.annotation_layer.set_selection(self.start_selection, self.end_selection)
+        self.canvas.draw_idle()
+
+    def open_annotations(self, recording):
+        """Abre la bitácora de anotaciones de la grabación (y cierra la anterior)"""
+        if self.annotation_store is not None:
+            self.annotation_store.close()
+        self.annotation_store = AnnotationStore.for_recording(recording)
+        self.annotation_layer.set_store(self.annotation_store)
+        self.start_selection = self.end_selection = None
+        self.annotation_layer.set_selection(None, None)
+
+    def selected_interval(self):
+        """Intervalo seleccionado (inicio, fin) o None, con aviso en la interfaz"""
+        if self.annotation_store is None:
+            self.stats_label.configure(text="❌ Abre una grabación primero.")
+            return None
         if self.start_selection is None or self.end_selection is None:
             self.stats_label.configure(text="❌ Selecciona un intervalo sobre la gráfica primero.")
-            return
+            return None
+        return min(self.start_selection, self.end_selection), max(self.start_selection, self.end_selection)
 
+    def save_annotation(self):
+        interval = self.selected_interval()
+        if interval is None:
+            return
+        start_time, end_time = interval
         etiqueta = self.label_option.get()
-        start_time = min(self.start_selection, self.end_selection)
-        end_time = max(self.start_selection, self.end_selection)
-
-        self.annotations.append({
-            "Inicio (s)": start_time,
-            "Fin (s)": end_time,
-            "Etiqueta": etiqueta
-        })
-
-        # Guardar en CSV
-        with open("anotaciones.csv", "w", newline="") as csvfile:
-            fieldnames = ["Inicio (s)", "Fin (s)", "Etiqueta"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(self.annotations)
+
+        # Una línea nueva en la bitácora, sin reescribir las anteriores
+        self.annotation_store.add(start_time, end_time, etiqueta)
+        self.annotation_layer.refresh()
+        self.canvas.draw_idle()
 
         self.stats_label.configure(text=f"✅ Anotación guardada: {etiqueta} [{start_time:.2f}s - {end_time:.2f}s]")
 
+    def remove_annotations(self):
+        interval = self.selected_interval()
+        if interval is None:
+            return
+        removed = self.annotation_store.remove([a.id for a in self.annotation_store.query(*interval)])
+        self.annotation_layer.refresh()
+        self.canvas.draw_idle()
+        self.stats_label.configure(text=f"🗑️ {removed} anotaciones eliminadas")
+
+    def prefill_annotations(self):
+        """Agrega los episodios propuestos que aún no están anotados, para revisarlos y corregirlos"""
+        if self.annotation_store is None or not self.episodes:
+            self.stats_label.configure(text="❌ Detecta los picos R primero para proponer episodios.")
+            return
+        def key(start, end, label):
+            # La bitácora guarda los tiempos con 6 decimales
+            return round(start, 6), round(end, 6), label
+        added = [episode for episode in self.episodes
+                 if not any(key(a.start, a.end, a.label) == key(*episode)
+                            for a in self.annotation_store.query(episode.start, episode.end))]
+        self.annotation_store.add_many([tuple(episode) for episode in added], origin="auto")
+        self.annotation_layer.refresh()
+        self.canvas.draw_idle()
+        self.stats_label.configure(text=f"✅ {len(added)} episodios propuestos agregados a las anotaciones")
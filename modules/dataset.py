@@ -0,0 +1,226 @@
+"""Exportación de conjuntos de entrenamiento a partir de grabaciones anotadas.
+
+Cada grabación se filtra, se detectan sus picos R y se cortan segmentos de
+longitud fija: centrados en cada latido (``beats``) o ventanas consecutivas
+(``windows``). La etiqueta de cada segmento es la de la anotación más corta
+que cubre su centro (un PVC anotado gana sobre el episodio de ritmo que lo
+contiene). Los segmentos con huecos o fuera de la señal se descartan.
+
+Los archivos se procesan en paralelo; cada proceso escribe sus segmentos en
+un fragmento temporal y el proceso principal los copia por bloques a los
+arreglos finales creados con ``np.lib.format.open_memmap``, de modo que la
+memoria no depende del número de grabaciones. El directorio de salida
+queda con:
+
+- ``segments.npy``: (n, muestras) float32, en voltios.
+- ``labels.npy``: código de etiqueta de cada segmento (índice en
+  ``label_names`` de ``metadata.npz``; -1 sin anotación).
+- ``provenance.npy``: grabación (índice en ``files``), muestra central en la
+  frecuencia original e identificador de la anotación de cada segmento.
+- ``metadata.npz``: archivos de origen, tamaño, fecha de modificación,
+  frecuencia original, segmentos por archivo y parámetros de la exportación.
+
+Uso: python -m modules.dataset grabaciones/ --output dataset/ --mode beats --fs 250 --workers 8
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+import numpy as np
+from scipy.signal import resample_poly
+from modules.annotations import read_annotations
+from modules.batch import find_recordings
+from modules.dsp import LABELS, detect_r_peaks, filter_offline
+from modules.loader import load_signal
+
+PROVENANCE_DTYPE = np.dtype([("record", "<i4"), ("sample", "<i8"), ("annotation", "<i8")])
+SEGMENT_DTYPE = np.dtype("<f4")
+UNLABELED = -1
+# Filas copiadas por bloque de los fragmentos a los arreglos finales
+COPY_ROWS = 1 << 14
+
+
+def resample(signal, fs, target_fs):
+    """Cambia la frecuencia de muestreo conservando los huecos (NaN) en su posición"""
+    if target_fs is None or target_fs == fs:
+        return signal, fs
+    ratio = Fraction(target_fs / fs).limit_denominator(1000)
+    resampled = resample_poly(np.nan_to_num(signal), ratio.numerator, ratio.denominator)
+    gaps = np.isnan(signal)
+    if gaps.any():
+        source = np.minimum((np.arange(len(resampled)) * fs / target_fs).astype(np.int64), len(signal) - 1)
+        resampled[gaps[source]] = np.nan
+    return resampled, target_fs
+
+
+def label_centers(centers_s, annotations):
+    """Código de etiqueta e identificador de la anotación más corta que cubre cada centro"""
+    codes = np.full(len(centers_s), UNLABELED, dtype=np.int8)
+    ids = np.full(len(centers_s), -1, dtype=np.int64)
+    if not annotations or not len(centers_s):
+        return codes, ids
+    starts = np.array([a.start for a in annotations])
+    ends = np.array([a.end for a in annotations])
+    # Las más largas primero: las más cortas (más específicas) sobrescriben
+    order = np.argsort(starts - ends, kind="stable")
+    lo = np.searchsorted(centers_s, starts[order], side="left")
+    hi = np.searchsorted(centers_s, ends[order], side="left")
+    other = LABELS.index("Otro")
+    for i, a, b in zip(order.tolist(), lo.tolist(), hi.tolist()):
+        if b > a:
+            label = annotations[i].label
+            codes[a:b] = LABELS.index(label) if label in LABELS else other
+            ids[a:b] = annotations[i].id
+    return codes, ids
+
+
+def cut_segments(path, shard_path, record, mode="beats", target_fs=None, before=0.25, after=0.45,
+                 window=10.0, stride=None, prefer_filtered=False, default_fs=250, unlabeled=False):
+    """Corta los segmentos de una grabación y los guarda en un fragmento; se ejecuta en un proceso de trabajo"""
+    stat = os.stat(path)
+    row = {"file": path, "size": stat.st_size, "mtime": stat.st_mtime, "segments": 0, "error": ""}
+    started = time.perf_counter()
+    try:
+        signal, source_fs, _ = load_signal(path, prefer_filtered=prefer_filtered, default_fs=default_fs)
+        row["source_fs"] = source_fs
+        filtered = filter_offline(signal, source_fs)
+        filtered, fs = resample(filtered, source_fs, target_fs)
+
+        if mode == "beats":
+            centers, _ = detect_r_peaks(filtered, fs)
+            starts = centers - int(round(before * fs))
+            length = int(round(before * fs)) + int(round(after * fs))
+        else:
+            length = int(round(window * fs))
+            step = int(round((stride or window) * fs))
+            starts = np.arange(0, max(len(filtered) - length + 1, 0), step)
+            centers = starts + length // 2
+        inside = (starts >= 0) & (starts + length <= len(filtered))
+        starts, centers = starts[inside], centers[inside]
+
+        codes, ids = label_centers(centers / fs, read_annotations(path))
+        keep = np.ones(len(starts), dtype=bool) if unlabeled else codes != UNLABELED
+        starts, centers, codes, ids = starts[keep], centers[keep], codes[keep], ids[keep]
+
+        # Los segmentos que tocan un hueco no sirven para entrenar
+        nan_count = np.concatenate(([0], np.cumsum(np.isnan(filtered))))
+        complete = nan_count[starts + length] == nan_count[starts]
+        starts, centers, codes, ids = starts[complete], centers[complete], codes[complete], ids[complete]
+
+        provenance = np.zeros(len(starts), dtype=PROVENANCE_DTYPE)
+        provenance["record"] = record
+        provenance["sample"] = np.rint(centers * source_fs / fs).astype(np.int64)
+        provenance["annotation"] = ids
+        np.savez(shard_path + ".npz", labels=codes, provenance=provenance)
+        row.update({"segments": len(starts), "length": length, "shard": shard_path})
+        if len(starts):
+            # Los segmentos se escriben por bloques para no duplicar la señal en memoria
+            segments = np.lib.format.open_memmap(shard_path + ".npy", mode="w+", dtype=SEGMENT_DTYPE,
+                                                 shape=(len(starts), length))
+            for first in range(0, len(starts), COPY_ROWS):
+                block = starts[first:first + COPY_ROWS]
+                segments[first:first + len(block)] = filtered[block[:, None] + np.arange(length)]
+            segments.flush()
+            del segments
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["seconds"] = time.perf_counter() - started
+    return row
+
+
+def export_dataset(directory, output, mode="beats", workers=None, recursive=False, target_fs=250, **options):
+    """Exporta todas las grabaciones de ``directory`` al directorio ``output``.
+
+    Todas se llevan a ``target_fs`` para que los segmentos de archivos
+    distintos tengan el mismo largo.
+    """
+    files = find_recordings(directory, recursive=recursive)
+    os.makedirs(output, exist_ok=True)
+    shards = os.path.join(output, ".shards")
+    os.makedirs(shards, exist_ok=True)
+    print(f"{len(files)} grabaciones, segmentos '{mode}' a {target_fs:g} Hz")
+
+    rows = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(cut_segments, path, os.path.join(shards, str(i)), i, mode=mode,
+                               target_fs=target_fs, **options) for i, path in enumerate(files)]
+        for i, future in enumerate(futures):
+            row = future.result()
+            rows.append(row)
+            status = row["error"] or f"{row['segments']} segmentos"
+            print(f"[{i + 1}/{len(files)}] {row['seconds']:.2f} s  {status}  {row['file']}")
+
+    lengths = {row["length"] for row in rows if row["segments"]}
+    if len(lengths) > 1:
+        raise ValueError(f"Largo de segmento inconsistente entre archivos: {sorted(lengths)}")
+    length = lengths.pop() if lengths else 0
+    total = sum(row["segments"] for row in rows)
+
+    segments = np.lib.format.open_memmap(os.path.join(output, "segments.npy"), mode="w+", dtype=SEGMENT_DTYPE,
+                                         shape=(total, length))
+    labels = np.lib.format.open_memmap(os.path.join(output, "labels.npy"), mode="w+", dtype=np.int8, shape=(total,))
+    provenance = np.lib.format.open_memmap(os.path.join(output, "provenance.npy"), mode="w+",
+                                           dtype=PROVENANCE_DTYPE, shape=(total,))
+    position = 0
+    for row in rows:
+        if not row["segments"]:
+            continue
+        count = row["segments"]
+        shard_segments = np.load(row["shard"] + ".npy", mmap_mode="r")
+        for first in range(0, count, COPY_ROWS):
+            block = shard_segments[first:first + COPY_ROWS]
+            segments[position + first:position + first + len(block)] = block
+        del shard_segments
+        with np.load(row["shard"] + ".npz") as shard:
+            labels[position:position + count] = shard["labels"]
+            provenance[position:position + count] = shard["provenance"]
+        position += count
+    for array in (segments, labels, provenance):
+        array.flush()
+    del segments, labels, provenance
+    shutil.rmtree(shards)
+
+    np.savez(os.path.join(output, "metadata.npz"),
+             files=np.array([row["file"] for row in rows]),
+             sizes=np.array([row["size"] for row in rows], dtype=np.int64),
+             mtimes=np.array([row["mtime"] for row in rows]),
+             source_fs=np.array([row.get("source_fs", np.nan) for row in rows]),
+             counts=np.array([row["segments"] for row in rows], dtype=np.int64),
+             errors=np.array([row["error"] for row in rows]),
+             label_names=np.array(LABELS),
+             options=json.dumps({"mode": mode, "fs": target_fs, **options}))
+    errors = sum(1 for row in rows if row["error"])
+    print(f"Terminado en {time.perf_counter() - started:.1f} s: {total} segmentos de {length} muestras, "
+          f"{errors} archivos con error")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta segmentos etiquetados de grabaciones ECG para entrenamiento")
+    parser.add_argument("directory", help="Directorio con grabaciones .csv o .ecgb y sus anotaciones")
+    parser.add_argument("--output", default="dataset", help="Directorio de salida")
+    parser.add_argument("--mode", default="beats", choices=["beats", "windows"],
+                        help="Segmentos centrados en cada latido o ventanas consecutivas")
+    parser.add_argument("--fs", type=float, default=250, help="Frecuencia común de los segmentos (se remuestrea si hace falta)")
+    parser.add_argument("--before", type=float, default=0.25, help="Segundos antes del R (modo beats)")
+    parser.add_argument("--after", type=float, default=0.45, help="Segundos después del R (modo beats)")
+    parser.add_argument("--window", type=float, default=10.0, help="Duración de cada ventana (modo windows)")
+    parser.add_argument("--stride", type=float, default=None, help="Avance entre ventanas (por defecto, sin solape)")
+    parser.add_argument("--unlabeled", action="store_true", help="Incluir segmentos sin anotación (etiqueta -1)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos de trabajo (por defecto, uno por núcleo)")
+    parser.add_argument("--recursive", action="store_true", help="Incluir subdirectorios")
+    parser.add_argument("--filtered", action="store_true", help="Partir de la columna filtrada en lugar de la cruda")
+    parser.add_argument("--default-fs", type=float, default=250, help="Frecuencia si el archivo no la indica")
+    args = parser.parse_args()
+
+    export_dataset(args.directory, args.output, mode=args.mode, workers=args.workers, recursive=args.recursive,
+                   target_fs=args.fs, before=args.before, after=args.after, window=args.window, stride=args.stride,
+                   prefer_filtered=args.filtered, default_fs=args.default_fs, unlabeled=args.unlabeled)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Núcleo de procesamiento de señal sin interfaz gráfica.
+
+Solo depende de NumPy y SciPy, de modo que los monitores, el análisis por
+lotes y los procesos de trabajo usan la misma implementación. Los
+submódulos se importan al primer uso: ``import modules.dsp`` no carga SciPy.
+"""
+import importlib
+
+_EXPORTS = {
+    "arrhythmia": ["LABELS", "RhythmClassifier", "beat_features", "classify", "rhythm_summary"],
+    "blocks": ["filter_blocks", "settling_samples"],
+    "delineation": ["BEAT_DTYPE", "BeatDelineator", "delineate", "fiducial", "interval_summary"],
+    "filters": ["OFFLINE_FILTER_VERSION", "FilterPipeline", "FilterStage", "design_highpass", "design_lowpass",
+                "design_notch", "design_offline_filters", "filter_offline"],
+    "gaps": ["Gap", "GapTracker", "interpolate_gaps", "nan_runs", "spans_gap", "valid_segments"],
+    "qrs": ["DETECTOR_VERSION", "RPeak", "StreamingQRSDetector", "bpm_from_peaks", "detect_r_peaks"],
+    "stats": ["normalize", "segment_stats"],
+    "synthetic": ["SyntheticEcg", "synthetic_ecg"],
+}
+_LOCATIONS = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_LOCATIONS)
+
+
+def __getattr__(name):
+    if name not in _LOCATIONS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{_LOCATIONS[name]}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
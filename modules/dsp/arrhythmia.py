@@ -0,0 +1,230 @@
+"""Clasificación de arritmias con las etiquetas del visor: NSR, AF, AFL, APB y PVC.
+
+Parte de la delimitación de latidos (``BEAT_DTYPE``). Las características
+de todos los latidos se calculan a la vez como arreglos, con ventanas
+móviles de ``WINDOW`` latidos centradas en cada uno:
+
+- Prematuridad y pausa: RR previo y siguiente respecto a la mediana local.
+- Irregularidad: mediana local de la diferencia relativa entre RR sucesivos
+  (descriptiva; el aleteo con bloqueo variable también es irregular).
+- Cuantización: distancia de cada RR a un múltiplo entero del RR mínimo
+  local (el aleteo conduce 2:1, 3:1, 4:1; la fibrilación no).
+- Ancho del QRS absoluto y respecto a la mediana local.
+- Fracción de latidos vecinos con onda P.
+
+Las reglas asignan a cada latido un ritmo de base (NSR, AF, AFL o ?? si no
+hay datos suficientes) y una etiqueta que además marca los latidos
+ectópicos (APB, PVC). Los ritmos se agrupan en episodios con su inicio y
+fin en segundos, listos para pre-llenar las anotaciones.
+"""
+from collections import namedtuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from modules.dsp.delineation import BEAT_DTYPE, MISSING, _masked_median
+
+LABELS = ("NSR", "AF", "AFL", "APB", "PVC", "Otro", "??")
+NSR, AF, AFL, APB, PVC, OTHER, UNKNOWN = range(len(LABELS))
+
+FEATURES = ("rr_prev", "rr_next", "rr_local", "prematurity", "compensation", "irregularity",
+            "quantization", "qrs", "qrs_ratio", "p_fraction")
+FEATURE_DTYPE = np.dtype([(name, "<f4") for name in FEATURES])
+
+Episode = namedtuple("Episode", ["start", "end", "label"])
+
+# Latidos en cada ventana móvil (impar, centrada en el latido)
+WINDOW = 9
+# Umbrales de las reglas
+PREMATURE = 0.85  # RR previo / mediana local
+WIDE_QRS = 0.12  # s
+WIDE_QRS_RATIO = 1.4  # QRS / mediana local
+QUANTIZED = 0.05  # Distancia mediana a un múltiplo entero del RR mínimo
+P_PRESENT = 0.5  # Fracción de latidos con P para considerar ritmo sinusal
+# Episodios de ritmo más cortos se funden con el anterior
+MIN_RHYTHM_BEATS = 6
+# Medio ancho del intervalo anotado alrededor de un latido ectópico (s)
+ECTOPIC_HALF_WIDTH = 0.2
+
+
+def _rolling(x, window):
+    """Ventanas (n, window) centradas en cada elemento, con NaN fuera de los bordes"""
+    half = window // 2
+    padded = np.concatenate((np.full(half, np.nan), np.asarray(x, dtype=np.float64), np.full(half, np.nan)))
+    return sliding_window_view(padded, window)
+
+
+def _rolling_median(x, window):
+    values = _rolling(x, window)
+    valid = ~np.isnan(values)
+    median = _masked_median(values, valid)
+    return np.where(valid.any(axis=1), median, np.nan)
+
+
+def _rolling_min(x, window):
+    values = _rolling(x, window)
+    values = np.where(np.isnan(values), np.inf, values).min(axis=1)
+    return np.where(np.isinf(values), np.nan, values)
+
+
+def beat_features(beats, window=WINDOW):
+    """Características de todos los latidos como arreglo estructurado ``FEATURE_DTYPE``"""
+    features = np.zeros(len(beats), dtype=FEATURE_DTYPE)
+    if len(beats) == 0:
+        return features
+    rr = beats["rr"].astype(np.float64)
+    rr_next = np.append(rr[1:], np.nan)
+    rr_local = _rolling_median(rr, window)
+    features["rr_prev"] = rr
+    features["rr_next"] = rr_next
+    features["rr_local"] = rr_local
+    features["prematurity"] = rr / rr_local
+    features["compensation"] = rr_next / rr_local
+
+    # Las diferencias entre RR sucesivos que cruzan un hueco quedan en NaN
+    successive = np.abs(np.diff(rr, prepend=np.nan)) / rr_local
+    features["irregularity"] = _rolling_median(successive, window)
+    base = _rolling_min(rr, window)
+    ratio = rr / base
+    features["quantization"] = _rolling_median(np.abs(ratio - np.rint(ratio)), window)
+
+    qrs = beats["qrs"].astype(np.float64)
+    features["qrs"] = qrs
+    # La mediana del QRS usa una ventana más amplia para no contar rachas de PVC como normales
+    features["qrs_ratio"] = qrs / _rolling_median(qrs, 4 * window + 1)
+
+    # Latidos sin delimitar (huecos, bordes) no cuentan para la fracción de P
+    has_p = np.where(np.isnan(qrs), np.nan, (beats["p_peak"] != MISSING).astype(np.float64))
+    p_values = _rolling(has_p, window)
+    p_valid = ~np.isnan(p_values)
+    counted = p_valid.sum(axis=1)
+    features["p_fraction"] = np.where(counted > 0, np.where(p_valid, p_values, 0).sum(axis=1) / np.maximum(counted, 1), np.nan)
+    return features
+
+
+def classify_beats(features):
+    """Ritmo de base y etiqueta de cada latido (códigos en ``LABELS``)"""
+    f = {name: features[name].astype(np.float64) for name in FEATURES}
+    quantized = f["quantization"] < QUANTIZED
+    no_p = f["p_fraction"] < P_PRESENT
+
+    rhythm = np.full(len(features), NSR, dtype=np.int8)
+    # Aleteo: RR múltiplos enteros del ciclo (bloqueo 2:1, 4:1 variable); la fibrilación no guarda proporción
+    rhythm[no_p & ~quantized] = AF
+    rhythm[no_p & quantized] = AFL
+    unknown = np.isnan(f["rr_local"]) | np.isnan(f["p_fraction"]) | np.isnan(f["quantization"])
+    rhythm[unknown] = UNKNOWN
+
+    labels = rhythm.copy()
+    wide = (f["qrs"] >= WIDE_QRS) & (f["qrs_ratio"] >= WIDE_QRS_RATIO)
+    premature = f["prematurity"] < PREMATURE
+    # En AF/AFL los RR cortos son parte del ritmo: solo el QRS ancho indica un latido ectópico
+    labels[premature & ~wide & (rhythm == NSR)] = APB
+    labels[wide] = PVC
+    labels[np.isnan(f["qrs"])] = UNKNOWN
+    return rhythm, labels
+
+
+def _runs(codes):
+    """Inicio, fin (exclusivo) y código de cada racha de códigos iguales"""
+    if len(codes) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), codes
+    starts = np.flatnonzero(np.diff(codes, prepend=codes[0] - 1))
+    ends = np.append(starts[1:], len(codes))
+    return starts, ends, codes[starts]
+
+
+def smooth_rhythm(rhythm, min_beats=MIN_RHYTHM_BEATS):
+    """Funde las rachas de ritmo de menos de ``min_beats`` latidos con la racha anterior"""
+    starts, ends, codes = _runs(rhythm)
+    keep = (ends - starts >= min_beats)
+    if len(keep):
+        keep[0] = True
+    # Cada racha corta toma el código de la última racha conservada
+    source = np.maximum.accumulate(np.where(keep, np.arange(len(keep)), 0))
+    return np.repeat(codes[source], ends - starts).astype(np.int8)
+
+
+def find_episodes(beats, rhythm, labels, fs, min_beats=MIN_RHYTHM_BEATS):
+    """Episodios (inicio y fin en s, etiqueta) de ritmo y de latidos ectópicos, ordenados por inicio.
+
+    Cada episodio de ritmo va del R de su primer latido al R del primer
+    latido del siguiente, de modo que cubren el registro sin huecos.
+    """
+    if len(beats) == 0:
+        return []
+    r = beats["r"] / fs
+    starts, ends, codes = _runs(smooth_rhythm(rhythm, min_beats))
+    stops = np.append(r[starts[1:]], r[-1])
+    episodes = [Episode(float(r[a]), float(b), LABELS[code]) for a, b, code in zip(starts, stops, codes)]
+    ectopic = np.flatnonzero((labels == APB) | (labels == PVC))
+    episodes.extend(Episode(float(max(0.0, r[i] - ECTOPIC_HALF_WIDTH)), float(r[i] + ECTOPIC_HALF_WIDTH),
+                            LABELS[labels[i]]) for i in ectopic)
+    episodes.sort(key=lambda episode: episode.start)
+    return episodes
+
+
+def classify(beats, fs, window=WINDOW, min_beats=MIN_RHYTHM_BEATS):
+    """Clasifica un registro delimitado completo; devuelve (etiquetas por latido, episodios)"""
+    rhythm, labels = classify_beats(beat_features(beats, window))
+    return labels, find_episodes(beats, rhythm, labels, fs, min_beats)
+
+
+def rhythm_summary(beats, labels):
+    """Ritmo dominante, carga de AF/AFL (fracción del tiempo) y número de APB y PVC"""
+    rr = np.nan_to_num(beats["rr"].astype(np.float64)) if len(beats) else np.zeros(0)
+    total = rr.sum()
+    # Los ectópicos cuentan dentro del ritmo sinusal para la carga de AF/AFL
+    time = {name: rr[labels == code].sum() for code, name in enumerate(LABELS)}
+    time["NSR"] += time["APB"] + time["PVC"]
+    rhythms = {name: time[name] for name in ("NSR", "AF", "AFL")}
+    dominant = max(rhythms, key=rhythms.get) if total > 0 else "??"
+    return {"rhythm": dominant,
+            "af_burden": time["AF"] / total if total > 0 else float("nan"),
+            "afl_burden": time["AFL"] / total if total > 0 else float("nan"),
+            "apb": int((labels == APB).sum()), "pvc": int((labels == PVC).sum())}
+
+
+class RhythmClassifier:
+    """Clasificación incremental, latido a latido, para el monitor en tiempo real.
+
+    Recibe los latidos de ``BeatDelineator`` y conserva los últimos; cada
+    latido se clasifica una sola vez, cuando ya llegaron los ``window // 2``
+    latidos siguientes que completan su ventana, con las mismas
+    características y reglas que el análisis por lotes.
+    """
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.lag = window // 2
+        # Contexto suficiente para la ventana del QRS, la más amplia
+        self.history = 4 * window + 1
+        self.reset()
+
+    def reset(self):
+        self.beats = np.zeros(0, dtype=BEAT_DTYPE)
+        self.classified = 0  # Latidos del historial ya clasificados
+        self.rhythm = None
+        self.last_label = None
+        self.counts = dict.fromkeys(LABELS, 0)
+
+    def process(self, beats):
+        """Agrega latidos delimitados; devuelve (latidos recién clasificados, sus etiquetas)"""
+        if len(beats):
+            self.beats = np.concatenate((self.beats, beats))
+        ready = len(self.beats) - self.lag
+        if ready <= self.classified:
+            return self.beats[:0], np.zeros(0, dtype=np.int8)
+
+        rhythm, labels = classify_beats(beat_features(self.beats, self.window))
+        new = slice(self.classified, ready)
+        new_beats, new_labels = self.beats[new], labels[new]
+        self.classified = ready
+        self.rhythm = LABELS[rhythm[ready - 1]]
+        self.last_label = LABELS[new_labels[-1]]
+        for code, count in zip(*np.unique(new_labels, return_counts=True)):
+            self.counts[LABELS[code]] += int(count)
+
+        if len(self.beats) > self.history:
+            trim = len(self.beats) - self.history
+            self.beats = self.beats[trim:]
+            self.classified -= trim
+        return new_beats, new_labels
@@ -0,0 +1,128 @@
+"""Filtrado de fase cero por bloques para registros largos.
+
+``sosfiltfilt`` sobre un Holter completo reserva varios temporales del
+tamaño de la señal. Aquí la señal se parte en bloques de ``block_seconds``
+y cada uno se filtra con un margen a cada lado de ``settling_samples``
+muestras: lo que el transitorio de arranque de cada pasada (ida y vuelta)
+alcanza a afectar. Del bloque filtrado solo se conserva la parte central,
+que coincide con el filtrado del registro completo dentro de ``tol``
+(relativo a la amplitud de la señal). En los bordes reales del registro, y
+de cada tramo entre huecos (NaN), se usa el mismo relleno impar que
+``sosfiltfilt``, así que el resultado es el de ``filter_offline``.
+
+Los bloques se reparten en un grupo de procesos con a lo sumo unos pocos
+bloques en vuelo, y se escriben en un arreglo ya reservado o en un
+``.npy`` mapeado en memoria: la memoria pico depende del tamaño de bloque,
+no de la duración del registro.
+"""
+import math
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.signal import sosfiltfilt
+from modules.dsp.filters import check_filter_length, design_offline_filters, offline_padlen
+from modules.dsp.gaps import nan_runs
+
+
+def settling_samples(sos, tol=1e-9):
+    """Muestras hasta que la respuesta al impulso del filtro cae por debajo de ``tol``"""
+    poles = np.concatenate([np.roots(section[3:]) for section in np.atleast_2d(sos)])
+    radius = float(np.max(np.abs(poles))) if len(poles) else 0.0
+    if radius <= 0.0:
+        return 0
+    # Los polos repetidos decaen como n·r^n: el factor 2 cubre ese término con holgura
+    return int(math.ceil(2 * math.log(tol) / math.log(radius)))
+
+
+def scan_segments(signal, step):
+    """Tramos (inicio, fin) sin NaN, buscando los huecos de ``step`` en ``step`` muestras"""
+    starts, ends = [], []
+    for lo in range(0, len(signal), step):
+        run_starts, run_ends = nan_runs(signal[lo:lo + step])
+        for a, b in zip((run_starts + lo).tolist(), (run_ends + lo).tolist()):
+            # Un hueco que cruza el borde entre dos pasos continúa el anterior
+            if ends and ends[-1] == a:
+                ends[-1] = b
+            else:
+                starts.append(a)
+                ends.append(b)
+    bounds = [0] + [edge for run in zip(starts, ends) for edge in run] + [len(signal)]
+    return [(a, b) for a, b in zip(bounds[::2], bounds[1::2]) if b > a]
+
+
+def plan_blocks(signal, block, pad, min_length=0):
+    """(inicio, fin) del bloque con márgenes y (inicio, fin) de su parte central, por tramo sin huecos"""
+    plan = []
+    for start, end in scan_segments(signal, block):
+        if end - start <= min_length:
+            continue
+        for core_start in range(start, end, block):
+            core_end = min(core_start + block, end)
+            plan.append((max(start, core_start - pad), min(end, core_end + pad), core_start, core_end))
+    return plan
+
+
+def _filter_block(sos, chunk, offset, length):
+    """Filtra un bloque con márgenes y devuelve su parte central; se ejecuta en un proceso de trabajo"""
+    return sosfiltfilt(sos, chunk)[offset:offset + length]
+
+
+def filter_blocks(signal, fs, block_seconds=300.0, workers=None, output=None, progress=None, tol=1e-9, **params):
+    """Filtrado de fase cero de un registro completo, por bloques y en paralelo.
+
+    ``output`` puede ser None (se reserva un arreglo), un arreglo ya
+    reservado del largo de la señal o la ruta de un ``.npy`` que se crea
+    mapeado en memoria. ``workers=1`` filtra en el proceso actual.
+    ``progress(hechos, total)`` se llama al terminar cada bloque. Como en
+    ``filter_offline``, un registro demasiado corto lanza ValueError.
+    """
+    signal = np.asarray(signal)
+    sos = design_offline_filters(fs, **params)
+    # sosfiltfilt necesita más muestras que su relleno; los tramos más cortos quedan como hueco
+    padlen = offline_padlen(sos)
+    check_filter_length(len(signal), padlen)
+    pad = max(settling_samples(sos, tol), padlen)
+    block = max(int(block_seconds * fs), pad)
+
+    if isinstance(output, str):
+        output = np.lib.format.open_memmap(output, mode="w+", dtype=np.float64, shape=(len(signal),))
+    elif output is None:
+        output = np.empty(len(signal), dtype=np.float64)
+    output[:] = np.nan
+
+    plan = plan_blocks(signal, block, pad, min_length=padlen)
+    total = len(plan)
+
+    def chunk(lo, hi):
+        return np.asarray(signal[lo:hi], dtype=np.float64)
+
+    if workers == 1 or total <= 1:
+        for done, (lo, hi, core_lo, core_hi) in enumerate(plan, 1):
+            output[core_lo:core_hi] = _filter_block(sos, chunk(lo, hi), core_lo - lo, core_hi - core_lo)
+            if progress is not None:
+                progress(done, total)
+        return output
+
+    workers = workers or os.cpu_count() or 1
+    pending = deque()
+    done = 0
+
+    def collect():
+        nonlocal done
+        core_lo, core_hi, future = pending.popleft()
+        output[core_lo:core_hi] = future.result()
+        done += 1
+        if progress is not None:
+            progress(done, total)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for lo, hi, core_lo, core_hi in plan:
+            # Pocos bloques en vuelo: la memoria no crece con la duración del registro
+            while len(pending) >= 2 * workers:
+                collect()
+            pending.append((core_lo, core_hi, pool.submit(_filter_block, sos, chunk(lo, hi), core_lo - lo,
+                                                          core_hi - core_lo)))
+        while pending:
+            collect()
+    return output
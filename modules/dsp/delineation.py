@@ -0,0 +1,258 @@
+"""Delimitación de latidos: ondas P, QRS y T e intervalos PR, QRS, QT y RR.
+
+Parte de los picos R ya detectados. Cada latido se analiza en una ventana
+fija alrededor de su R y todas las ventanas de un bloque de latidos se
+procesan a la vez como una matriz (latidos × muestras), sin ciclos por
+latido. Los límites de cada onda se buscan con máscaras por fila:
+
+- QRS: primer y último punto cuya pendiente supera una fracción de la
+  pendiente máxima del complejo.
+- Línea isoeléctrica: mediana de los 20 ms previos al inicio del QRS.
+- P y T: máximo de |x - línea isoeléctrica| en su ventana de búsqueda;
+  inicio y fin donde la onda cae por debajo del 20 % de su amplitud.
+
+El resultado es un arreglo estructurado ``BEAT_DTYPE`` con una fila por
+latido: el índice absoluto del R, los puntos fiduciales como
+desplazamientos int16 respecto al R (``MISSING`` si la onda no se
+encontró) y los intervalos en segundos (NaN si no aplican).
+"""
+import numpy as np
+from modules.dsp.gaps import spans_gap
+
+MISSING = np.iinfo(np.int16).min
+FIDUCIALS = ("p_on", "p_peak", "p_off", "qrs_on", "qrs_off", "t_peak", "t_off")
+INTERVALS = ("rr", "pr", "qrs", "qt", "qtc")
+BEAT_DTYPE = np.dtype([("r", "<i8")] + [(name, "<i2") for name in FIDUCIALS] + [(name, "<f4") for name in INTERVALS])
+
+# Ventana de análisis alrededor de R (s)
+PRE_R = 0.35
+POST_R = 0.60
+
+
+def fiducial(beats, name):
+    """Índices absolutos de un punto fiducial (-1 donde no se encontró)"""
+    offsets = beats[name].astype(np.int64)
+    return np.where(offsets == MISSING, -1, beats["r"] + offsets)
+
+
+def interval_summary(beats):
+    """Mediana de cada intervalo (s) sobre los latidos en que está definido"""
+    summary = {}
+    for name in INTERVALS:
+        values = beats[name][~np.isnan(beats[name])] if len(beats) else []
+        summary[name] = float(np.median(values)) if len(values) else float("nan")
+    return summary
+
+
+def _smoothed_slope(signal, fs):
+    """Derivada central suavizada con una media móvil de ~10 ms"""
+    slope = np.gradient(signal)
+    width = max(1, int(0.01 * fs))
+    if width > 1:
+        slope = np.convolve(slope, np.ones(width) / width, mode="same")
+    return slope
+
+
+def _first(mask, default):
+    """Primer índice verdadero de cada fila (``default`` si no hay ninguno)"""
+    return np.where(mask.any(axis=1), mask.argmax(axis=1), default)
+
+
+def _last(mask, default):
+    """Último índice verdadero de cada fila (``default`` si no hay ninguno)"""
+    width = mask.shape[1]
+    return np.where(mask.any(axis=1), width - 1 - mask[:, ::-1].argmax(axis=1), default)
+
+
+def _masked_argmax(values, mask):
+    return np.where(mask, values, -np.inf).argmax(axis=1)
+
+
+def _masked_median(values, mask):
+    """Mediana de cada fila sobre los elementos marcados (más rápido que ``nanmedian``)"""
+    ordered = np.sort(np.where(mask, values, np.inf), axis=1)
+    count = np.maximum(mask.sum(axis=1), 1)[:, None]
+    low = np.take_along_axis(ordered, (count - 1) // 2, axis=1)
+    high = np.take_along_axis(ordered, count // 2, axis=1)
+    return ((low + high) / 2)[:, 0]
+
+
+def _run_lengths(mask, run):
+    """Marca las posiciones que terminan (y las que empiezan) ``run`` elementos verdaderos seguidos"""
+    total = np.cumsum(mask, axis=1)
+    ending = total - np.pad(total, ((0, 0), (run, 0)))[:, :-run] >= run
+    starting = np.zeros_like(ending)
+    starting[:, :mask.shape[1] - run + 1] = ending[:, run - 1:]
+    return ending, starting
+
+
+def delineate(signal, fs, r_peaks, previous_r=None, offset=0, block_size=4096):
+    """Delimita todos los latidos de ``signal`` (filtrada) a partir de sus picos R.
+
+    ``r_peaks`` son índices dentro de ``signal``; en el resultado se les
+    suma ``offset`` (posición absoluta de ``signal[0]``). ``previous_r`` es
+    el índice absoluto del R anterior al primero, para su intervalo RR.
+    Los latidos se procesan en bloques de ``block_size`` para acotar la
+    memoria en registros largos.
+    """
+    signal = np.asarray(signal, dtype=np.float64)
+    r_peaks = np.asarray(r_peaks, dtype=np.int64)
+    beats = np.zeros(len(r_peaks), dtype=BEAT_DTYPE)
+    if len(r_peaks) == 0:
+        return beats
+    beats["r"] = r_peaks + offset
+
+    # RR: el primer latido usa el R anterior si sigue dentro de la señal
+    rr = np.full(len(r_peaks), np.nan)
+    rr[1:] = np.diff(r_peaks) / fs
+    previous = None if previous_r is None else previous_r - offset
+    if previous is not None and 0 <= previous < r_peaks[0]:
+        rr[0] = (r_peaks[0] - previous) / fs
+        pairs = np.concatenate(([previous], r_peaks))
+    else:
+        pairs = r_peaks
+    if len(pairs) > 1:
+        crossed = spans_gap(signal, pairs[:-1], pairs[1:])
+        rr[len(rr) - len(crossed):][crossed] = np.nan
+    beats["rr"] = rr
+
+    slope = _smoothed_slope(np.nan_to_num(signal), fs)
+    for start in range(0, len(r_peaks), block_size):
+        stop = start + block_size
+        _delineate_block(signal, slope, fs, r_peaks[start:stop], rr[start:stop], beats[start:stop])
+    return beats
+
+
+def _delineate_block(signal, slope, fs, r_peaks, rr, out):
+    """Delimitación vectorizada de un bloque de latidos (escribe en ``out``)"""
+    n = len(signal)
+    pre, post = int(PRE_R * fs), int(POST_R * fs)
+    columns = np.arange(-pre, post + 1)
+    idx = r_peaks[:, None] + columns
+    inside = (idx >= 0) & (idx < n)
+    idx = np.clip(idx, 0, n - 1)
+    window = signal[idx]
+    # Latidos con huecos o cortados por el borde: solo se conservan R y RR
+    valid = inside.all(axis=1) & ~np.isnan(window).any(axis=1)
+    window = np.where(np.isnan(window), 0.0, window)
+    steep = np.abs(slope[idx])
+    rows = np.arange(len(r_peaks))[:, None]
+    cols = np.arange(len(columns))[None, :]
+    r_col = pre
+    rr_samples = np.where(np.isnan(rr), np.nanmedian(rr) if (~np.isnan(rr)).any() else 1.0, rr) * fs
+
+    # ---------- QRS ----------
+    # Desde R hacia afuera, el complejo termina donde la pendiente se mantiene baja ~12 ms
+    q_pre, q_post = int(0.12 * fs), int(0.15 * fs)
+    complex_slope = steep[:, r_col - q_pre:r_col + q_post + 1]
+    flat = complex_slope < 0.1 * complex_slope.max(axis=1, keepdims=True)
+    flat_before, flat_after = _run_lengths(flat, max(1, int(0.012 * fs)))
+    local = np.arange(flat.shape[1])[None, :]
+    qrs_on = r_col - q_pre + _last(flat_before & (local < q_pre), 0)
+    qrs_off = r_col - q_pre + _first(flat_after & (local > q_pre), flat.shape[1] - 1)
+
+    iso_width = max(1, int(0.02 * fs))
+    iso_cols = np.clip(qrs_on[:, None] - np.arange(iso_width, 0, -1), 0, len(columns) - 1)
+    baseline = np.median(np.take_along_axis(window, iso_cols, axis=1), axis=1)
+    deviation = window - baseline[:, None]
+    magnitude = np.abs(deviation)
+    r_amplitude = np.abs(window[:, r_col] - baseline)
+
+    # ---------- T ----------
+    t_lo = qrs_off + int(0.06 * fs)
+    t_hi = np.minimum(r_col + np.minimum(post, (0.65 * rr_samples).astype(np.int64)), len(columns) - 1)
+    t_window = (cols >= t_lo[:, None]) & (cols <= t_hi[:, None])
+    t_peak = _masked_argmax(magnitude, t_window)
+    t_amplitude = magnitude[rows[:, 0], t_peak]
+    settled = t_window & (cols > t_peak[:, None]) & (magnitude < 0.2 * t_amplitude[:, None])
+    t_off = np.where(settled.any(axis=1), settled.argmax(axis=1), t_hi)
+    has_t = t_window.any(axis=1) & (t_amplitude > 0.03 * r_amplitude)
+
+    # ---------- P ----------
+    p_lo = r_col - np.minimum(pre, (0.6 * rr_samples).astype(np.int64))
+    p_hi = qrs_on - int(0.02 * fs)
+    p_window = (cols >= p_lo[:, None]) & (cols <= p_hi[:, None])
+    # Referencia de la P: nivel mediano de su ventana (el inicio del QRS puede sesgar la línea isoeléctrica)
+    p_level = _masked_median(window, p_window)
+    p_magnitude = np.abs(window - p_level[:, None])
+    p_peak = _masked_argmax(p_magnitude, p_window)
+    p_amplitude = p_magnitude[rows[:, 0], p_peak]
+    quiet = p_magnitude < 0.2 * p_amplitude[:, None]
+    before = p_window & (cols < p_peak[:, None])
+    after = p_window & (cols > p_peak[:, None])
+    # Si la onda no vuelve al 20 %, el límite es el punto más cercano al nivel de referencia
+    p_on = np.where((before & quiet).any(axis=1), _last(before & quiet, 0), _masked_argmax(-p_magnitude, before))
+    p_off = np.where((after & quiet).any(axis=1), _first(after & quiet, 0), _masked_argmax(-p_magnitude, after))
+    # Una P destaca sobre el resto de su ventana; en AF/AFL toda la ventana oscila
+    activity = _masked_median(p_magnitude, p_window)
+    # Un máximo en el borde de la ventana es la pendiente de otra onda, no una P
+    has_p = (p_hi > p_lo) & (p_peak > p_lo) & (p_peak < p_hi) & \
+            (p_amplitude > 0.05 * r_amplitude) & (p_amplitude > 4 * activity)
+
+    def relative(points, present):
+        return np.where(valid & present, points - r_col, MISSING).astype(np.int16)
+
+    out["qrs_on"] = relative(qrs_on, True)
+    out["qrs_off"] = relative(qrs_off, True)
+    out["t_peak"] = relative(t_peak, has_t)
+    out["t_off"] = relative(t_off, has_t)
+    out["p_on"] = relative(p_on, has_p)
+    out["p_peak"] = relative(p_peak, has_p)
+    out["p_off"] = relative(p_off, has_p)
+
+    out["qrs"] = np.where(valid, (qrs_off - qrs_on) / fs, np.nan)
+    out["pr"] = np.where(valid & has_p, (qrs_on - p_on) / fs, np.nan)
+    qt = np.where(valid & has_t, (t_off - qrs_on) / fs, np.nan)
+    out["qt"] = qt
+    # Corrección de Bazett
+    out["qtc"] = qt / np.sqrt(rr)
+
+
+class BeatDelineator:
+    """Delimitación incremental para el monitor en tiempo real.
+
+    Conserva los últimos ``history`` segundos de la señal filtrada y los
+    picos R pendientes; cada latido se delimita una sola vez, en cuanto
+    llegan las muestras que cubren su onda T.
+    """
+
+    def __init__(self, fs, history=4.0):
+        self.fs = fs
+        self.history = int(history * fs)
+        self.post = int(POST_R * fs) + 1
+        self.reset()
+
+    def reset(self):
+        self.buffer = np.empty(0)
+        self.offset = 0  # Índice absoluto de buffer[0]
+        self.pending = []
+        self.previous_r = None
+        self.last_beat = None
+
+    @property
+    def sample_count(self):
+        return self.offset + len(self.buffer)
+
+    def process(self, samples, peaks):
+        """Agrega un bloque filtrado y sus picos R (``RPeak`` o índices); devuelve los latidos listos"""
+        samples = np.asarray(samples, dtype=np.float64)
+        self.buffer = np.concatenate((self.buffer, samples))
+        self.pending.extend(getattr(peak, "index", peak) for peak in peaks)
+
+        end = self.sample_count
+        ready = [r for r in self.pending if r + self.post <= end]
+        beats = np.zeros(0, dtype=BEAT_DTYPE)
+        if ready:
+            self.pending = self.pending[len(ready):]
+            # Los R que ya salieron del historial no se pueden delimitar
+            ready = np.asarray([r for r in ready if r >= self.offset], dtype=np.int64)
+            if len(ready):
+                beats = delineate(self.buffer, self.fs, ready - self.offset, self.previous_r, self.offset)
+                self.previous_r = int(ready[-1])
+                self.last_beat = beats[-1]
+
+        if len(self.buffer) > self.history:
+            trim = len(self.buffer) - self.history
+            self.buffer = self.buffer[trim:]
+            self.offset += trim
+        return beats
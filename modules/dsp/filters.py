@@ -0,0 +1,154 @@
+import numpy as np
+from scipy.signal import butter, iirnotch, sosfilt, sosfilt_zi, sosfiltfilt, tf2sos
+from modules.dsp.gaps import valid_segments
+
+# Versión del algoritmo de filtrado fuera de línea; cambiarla invalida los resultados en caché
+OFFLINE_FILTER_VERSION = 1
+
+
+def design_notch(fs, freq=60.0, q=60.0):
+    """Filtro notch para eliminar la interferencia de la red eléctrica"""
+    b, a = iirnotch(freq, Q=q, fs=fs)
+    return tf2sos(b, a)
+
+
+def design_highpass(fs, cutoff=0.5, order=4):
+    """Filtro pasa-altas para eliminar la deriva de línea base"""
+    return butter(order, cutoff, btype='highpass', fs=fs, output='sos')
+
+
+def design_lowpass(fs, cutoff=20.0, order=4):
+    """Filtro pasa-bajas para suavizado y anti-aliasing"""
+    return butter(order, cutoff, btype='lowpass', fs=fs, output='sos')
+
+
+class FilterStage:
+    """Etapa IIR en secciones de segundo orden con estado persistente"""
+
+    def __init__(self, name, design, enabled=True, **params):
+        self.name = name
+        self.design = design
+        self.params = params
+        self.enabled = enabled
+        self.sos = None
+        self.zi = None
+
+    def redesign(self, fs):
+        """Calcula los coeficientes una sola vez para la frecuencia de muestreo dada"""
+        try:
+            self.sos = self.design(fs, **self.params)
+        except ValueError as e:
+            # Frecuencia de corte fuera de rango para este fs
+            print(f"No se pudo diseñar el filtro {self.name}: {e}")
+            self.sos = None
+        self.reset()
+
+    def reset(self):
+        self.zi = None
+
+    def process(self, x):
+        if not self.enabled or self.sos is None or len(x) == 0:
+            return x
+        if self.zi is None:
+            # Arrancar en estado estacionario con la primera muestra para evitar el transitorio
+            self.zi = sosfilt_zi(self.sos) * x[0]
+        y, self.zi = sosfilt(self.sos, x, zi=self.zi)
+        return y
+
+
+class FilterPipeline:
+    """Cadena de filtros del monitor en tiempo real.
+
+    Los coeficientes se diseñan solo cuando cambia ``fs`` y el estado ``zi``
+    de cada etapa se conserva entre bloques, de modo que cada bloque nuevo se
+    filtra con una sola llamada vectorizada por etapa. Las muestras perdidas
+    (NaN) salen como NaN y el estado se reinicia después de cada hueco.
+    """
+
+    def __init__(self, fs, stages=None):
+        if stages is None:
+            stages = [
+                FilterStage("notch", design_notch, freq=60.0, q=60.0),
+                FilterStage("high_pass", design_highpass, cutoff=0.5, order=4),
+                FilterStage("low_pass", design_lowpass, cutoff=20.0, order=4),
+            ]
+        self.stages = {stage.name: stage for stage in stages}
+        self.fs = None
+        self.set_fs(fs)
+
+    def set_fs(self, fs):
+        """Rediseña todas las etapas si cambia la frecuencia de muestreo"""
+        if fs == self.fs:
+            return
+        self.fs = fs
+        for stage in self.stages.values():
+            stage.redesign(fs)
+
+    def set_enabled(self, name, enabled):
+        """Activa o desactiva una etapa reiniciando solo su estado"""
+        stage = self.stages[name]
+        if stage.enabled != enabled:
+            stage.enabled = enabled
+            stage.reset()
+
+    def reset(self):
+        for stage in self.stages.values():
+            stage.reset()
+
+    def process(self, samples):
+        """Filtra un bloque de muestras y devuelve un arreglo del mismo tamaño"""
+        x = np.asarray(samples, dtype=np.float64)
+        if len(x) == 0 or not np.isnan(x).any():
+            return self._chain(x)
+        y = np.full(len(x), np.nan)
+        for start, end in valid_segments(x):
+            if start > 0:
+                self.reset()
+            y[start:end] = self._chain(x[start:end])
+        if np.isnan(x[-1]):
+            self.reset()
+        return y
+
+    def _chain(self, y):
+        for stage in self.stages.values():
+            y = stage.process(y)
+        return y
+
+
+def design_offline_filters(fs, band=(0.5, 40.0), notch=60.0, order=2):
+    """Pasa-banda y rechaza-banda del análisis de archivos, en SOS"""
+    bandpass = butter(order, band, btype='band', fs=fs, output='sos')
+    bandstop = butter(order, [notch - 1, notch + 1], btype='bandstop', fs=fs, output='sos')
+    return np.vstack((bandpass, bandstop))
+
+
+def offline_padlen(sos):
+    """Relleno de ``sosfiltfilt``: un tramo necesita más muestras que esto para filtrarse"""
+    return 3 * (2 * len(sos) + 1)
+
+
+def check_filter_length(length, padlen):
+    """Error claro, en lugar del de scipy, para un registro demasiado corto para el filtro de fase cero"""
+    if length <= padlen:
+        raise ValueError(f"Registro demasiado corto para filtrar: {length} muestras (se necesitan más de {padlen})")
+
+
+def filter_offline(signal, fs, **params):
+    """Filtrado de fase cero (ida y vuelta) de un registro completo.
+
+    Si la señal tiene huecos (NaN), cada tramo válido se filtra por separado
+    y los huecos se conservan como NaN. Un registro de ``offline_padlen``
+    muestras o menos lanza ValueError.
+    """
+    signal = np.asarray(signal, dtype=np.float64)
+    sos = design_offline_filters(fs, **params)
+    # sosfiltfilt necesita más muestras que su relleno; los tramos más cortos se marcan como hueco
+    padlen = offline_padlen(sos)
+    check_filter_length(len(signal), padlen)
+    if not np.isnan(signal).any():
+        return sosfiltfilt(sos, signal)
+    filtered = np.full(len(signal), np.nan)
+    for start, end in valid_segments(signal):
+        if end - start > padlen:
+            filtered[start:end] = sosfiltfilt(sos, signal[start:end])
+    return filtered
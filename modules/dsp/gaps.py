@@ -0,0 +1,137 @@
+"""Huecos en la señal: muestras perdidas marcadas con NaN.
+
+Las muestras que no llegaron (tramas perdidas, líneas corruptas o
+desbordes del buffer) se conservan en la línea de tiempo como NaN en
+lugar de rellenarse con ceros, para que los intervalos y el BPM no se
+distorsionen y el análisis pueda excluirlas o interpolarlas.
+"""
+from collections import deque, namedtuple
+import numpy as np
+
+# Hueco en la numeración de muestras: inicio, longitud, tipo y hora del host
+Gap = namedtuple("Gap", ["start", "length", "kind", "timestamp"])
+
+
+def nan_runs(x):
+    """Inicio y fin (exclusivo) de cada tramo consecutivo de NaN"""
+    mask = np.isnan(np.asarray(x, dtype=np.float64))
+    if not mask.any():
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    edges = np.diff(mask.astype(np.int8), prepend=0, append=0)
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def valid_segments(x):
+    """Tramos (inicio, fin) sin NaN"""
+    starts, ends = nan_runs(x)
+    bounds = np.concatenate(([0], np.column_stack((starts, ends)).ravel(), [len(x)]))
+    return [(int(a), int(b)) for a, b in bounds.reshape(-1, 2) if b > a]
+
+
+def interpolate_gaps(x, max_gap=None):
+    """Interpola linealmente los huecos de hasta ``max_gap`` muestras (los demás quedan en NaN)"""
+    y = np.array(x, dtype=np.float64)
+    starts, ends = nan_runs(y)
+    if len(starts) == 0:
+        return y
+    valid = ~np.isnan(y)
+    if not valid.any():
+        return y
+    filled = np.interp(np.arange(len(y)), np.flatnonzero(valid), y[valid])
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        inner = start > 0 and end < len(y)
+        if inner and (max_gap is None or end - start <= max_gap):
+            y[start:end] = filled[start:end]
+    return y
+
+
+def spans_gap(x, first, second):
+    """Para cada par (first[i], second[i]) indica si hay algún NaN entre ambos índices"""
+    nan_count = np.concatenate(([0], np.cumsum(np.isnan(np.asarray(x, dtype=np.float64)))))
+    second = np.clip(np.asarray(second) + 1, 0, len(nan_count) - 1)
+    first = np.clip(np.asarray(first), 0, len(nan_count) - 1)
+    return nan_count[second] - nan_count[first] > 0
+
+
+class GapTracker:
+    """Verifica la continuidad de los bloques que salen del buffer circular.
+
+    Cada muestra llega numerada por la fuente; un salto en la numeración
+    (desborde del buffer) se rellena con NaN y las muestras repetidas se
+    descartan. Los tramos NaN que ya trae el bloque (tramas perdidas o
+    líneas corruptas) se registran también como huecos.
+    """
+
+    def __init__(self, max_gaps=256):
+        self.gaps = deque(maxlen=max_gaps)  # Últimos huecos detectados
+        self.reset()
+
+    def reset(self):
+        self.gaps.clear()
+        self.next_sequence = None
+        self.missing_samples = 0  # Perdidas en el enlace (NaN de la fuente)
+        self.overrun_samples = 0  # Perdidas por desborde del buffer
+        self.duplicates = 0
+        self._open_gap = None  # Hueco NaN que puede continuar en el siguiente bloque
+
+    def stats(self):
+        return {"gaps": len(self.gaps), "missing": self.missing_samples,
+                "overrun": self.overrun_samples, "duplicates": self.duplicates}
+
+    def check(self, samples, timestamps, sequence):
+        """Devuelve (muestras, marcas de tiempo) con los huecos rellenados con NaN"""
+        samples = np.asarray(samples, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        sequence = np.asarray(sequence, dtype=np.int64)
+        if self.next_sequence is not None:
+            keep = sequence >= self.next_sequence
+            if not keep.all():
+                self.duplicates += int(len(keep) - np.count_nonzero(keep))
+                samples, timestamps, sequence = samples[keep], timestamps[keep], sequence[keep]
+        if len(samples) == 0:
+            return samples, timestamps
+
+        self._track_nan_runs(samples, timestamps, sequence)
+
+        # Saltos de numeración: insertar NaN en los lugares faltantes
+        expected = sequence[0] if self.next_sequence is None else self.next_sequence
+        steps = np.diff(sequence, prepend=expected) - 1
+        steps[0] = sequence[0] - expected
+        jumps = np.flatnonzero(steps > 0)
+        self.next_sequence = int(sequence[-1]) + 1
+        if len(jumps) == 0:
+            return samples, timestamps
+        for index in jumps.tolist():
+            length = int(steps[index])
+            self.gaps.append(Gap(int(sequence[index]) - length, length, "overrun", float(timestamps[index])))
+            self.overrun_samples += length
+        positions = np.repeat(jumps, steps[jumps])
+        return np.insert(samples, positions, np.nan), np.insert(timestamps, positions, timestamps[positions])
+
+    def mark_overrun(self, start, length, timestamp):
+        """Registra ``length`` muestras perdidas fuera del flujo numerado (p. ej. bloques descartados)"""
+        self.gaps.append(Gap(int(start), int(length), "overrun", float(timestamp)))
+        self.overrun_samples += int(length)
+        self.next_sequence = int(start + length)
+        self._open_gap = None
+
+    def _track_nan_runs(self, samples, timestamps, sequence):
+        starts, ends = nan_runs(samples)
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            first = int(sequence[start])
+            length = end - start
+            gap = self._open_gap
+            self._open_gap = None
+            if gap is not None and start == 0 and gap.start + gap.length == first:
+                # Continúa el hueco que terminaba el bloque anterior
+                if gap in self.gaps:
+                    self.gaps.remove(gap)
+                gap = gap._replace(length=gap.length + length)
+            else:
+                gap = Gap(first, length, "missing", float(timestamps[start]))
+            self.gaps.append(gap)
+            self.missing_samples += length
+            if end == len(samples):
+                self._open_gap = gap
+        if len(ends) == 0 or ends[-1] < len(samples):
+            self._open_gap = None
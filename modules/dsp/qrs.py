@@ -0,0 +1,243 @@
+from collections import deque, namedtuple
+import numpy as np
+from scipy.signal import butter, find_peaks, lfilter, sosfilt, sosfilt_zi
+from modules.dsp.gaps import spans_gap, valid_segments
+from modules.dsp.stats import normalize
+
+# Versión de ``detect_r_peaks``; cambiarla invalida los picos en caché
+DETECTOR_VERSION = 1
+
+# Evento emitido por cada pico R: índice absoluto de muestra e intervalo RR en segundos
+RPeak = namedtuple("RPeak", ["index", "rr"])
+
+
+class StreamingQRSDetector:
+    """Detector de QRS incremental al estilo Pan–Tompkins.
+
+    Cada bloque pasa por pasa-banda (5-15 Hz), derivada, cuadrado e
+    integración de ventana móvil con estado persistente, todo vectorizado.
+    Solo los máximos locales de la señal integrada (unos pocos por latido)
+    se recorren en Python para aplicar los umbrales adaptativos, el periodo
+    refractario y la búsqueda hacia atrás. Como en Pan–Tompkins, un candidato
+    cuya pendiente máxima no llega a la mitad de la del QRS típico se
+    descarta como onda T (si cae a menos de ``t_wave_window`` del QRS
+    anterior) o como onda de aleteo/ruido (en la búsqueda hacia atrás). Los
+    huecos (NaN) reinician los filtros y nunca se mide un intervalo RR a
+    través de ellos.
+    """
+
+    def __init__(self, fs, refractory=0.2, integration_window=0.15, learning_time=2.0, rr_window=8,
+                 t_wave_window=0.36, slope_ratio=0.5):
+        self.fs = fs
+        self.refractory = int(refractory * fs)
+        self.t_wave_window = int(t_wave_window * fs)
+        self.slope_ratio = slope_ratio
+        self.window = max(1, int(integration_window * fs))
+        self.learning_samples = int(learning_time * fs)
+        self.rr_window = rr_window
+
+        self.bp_sos = butter(1, [5, 15], btype='bandpass', fs=fs, output='sos')
+        self.deriv_b = np.array([2, 1, 0, -1, -2]) * (fs / 8.0)
+        self.mwi_b = np.ones(self.window) / self.window
+
+        # Historial de la señal de entrada para ubicar el pico R real
+        self.history_size = 1 << int(np.ceil(np.log2(max(2 * fs, 64))))
+        self.history = np.zeros(self.history_size)
+        # Derivada de la señal pasa-banda, para la pendiente de cada candidato
+        self.slope_history = np.zeros(self.history_size)
+        self.reset()
+
+    def reset(self):
+        self.sample_count = 0
+        self.bp_zi = None
+        self.deriv_zi = np.zeros(len(self.deriv_b) - 1)
+        self.mwi_zi = np.zeros(self.window - 1)
+        self.prev_mwi = np.zeros(2)  # Últimas dos muestras integradas del bloque anterior
+        self.learning = []
+        self.spki = 0.0
+        self.npki = 0.0
+        self.qrs_slope = None  # Pendiente máxima típica de los QRS detectados
+        self.last_qrs = None
+        self.last_r = None
+        self.searchback_candidate = None
+        self.rr_intervals = deque(maxlen=self.rr_window)
+
+    @property
+    def threshold(self):
+        return self.npki + 0.25 * (self.spki - self.npki)
+
+    def process(self, samples):
+        """Procesa un bloque de muestras filtradas y devuelve la lista de eventos ``RPeak``"""
+        x = np.asarray(samples, dtype=np.float64)
+        if len(x) == 0 or not np.isnan(x).any():
+            return self._process_block(x)
+        events = []
+        position = 0
+        for start, end in valid_segments(x):
+            if start > position:
+                self.skip(start - position)
+            events.extend(self._process_block(x[start:end]))
+            position = end
+        if position < len(x):
+            self.skip(len(x) - position)
+        return events
+
+    def skip(self, n):
+        """Avanza ``n`` muestras perdidas sin buscar picos en ellas"""
+        self._store_history(self.history, np.full(n, -np.inf), self.sample_count)
+        self._store_history(self.slope_history, np.zeros(n), self.sample_count)
+        self.sample_count += n
+        self.bp_zi = None
+        self.deriv_zi = np.zeros(len(self.deriv_b) - 1)
+        self.mwi_zi = np.zeros(self.window - 1)
+        self.prev_mwi = np.zeros(2)
+        self.last_qrs = None
+        self.last_r = None
+        self.searchback_candidate = None
+
+    def _process_block(self, x):
+        n = len(x)
+        if n == 0:
+            return []
+        start = self.sample_count
+        self._store_history(self.history, x, start)
+        self.sample_count += n
+
+        if self.bp_zi is None:
+            self.bp_zi = sosfilt_zi(self.bp_sos) * x[0]
+        bp, self.bp_zi = sosfilt(self.bp_sos, x, zi=self.bp_zi)
+        deriv, self.deriv_zi = lfilter(self.deriv_b, [1.0], bp, zi=self.deriv_zi)
+        mwi, self.mwi_zi = lfilter(self.mwi_b, [1.0], deriv * deriv, zi=self.mwi_zi)
+        self._store_history(self.slope_history, np.abs(deriv), start)
+
+        # Máximos locales (incluye el borde con el bloque anterior)
+        ext = np.concatenate((self.prev_mwi, mwi))
+        candidates = np.flatnonzero((ext[1:-1] > ext[:-2]) & (ext[1:-1] >= ext[2:]))
+        self.prev_mwi = ext[-2:]
+        # candidates[i] + 1 es el índice en ext; en índice absoluto se resta el borde de 2
+        peak_indices = start + candidates - 1
+        peak_values = ext[candidates + 1]
+
+        if self.learning is not None:
+            self.learning.append(mwi)
+            learned = sum(len(block) for block in self.learning)
+            if learned < self.learning_samples:
+                return []
+            # Fin de la fase de aprendizaje: inicializar umbrales
+            trained = np.concatenate(self.learning)
+            self.spki = 0.25 * np.max(trained)
+            self.npki = 0.5 * np.mean(trained)
+            self.learning = None
+            # La pendiente típica arranca con la mayor vista en el aprendizaje (la del QRS)
+            self.qrs_slope = 0.5 * np.max(self.slope_history[np.arange(max(0, self.sample_count - self.history_size),
+                                                                        self.sample_count) % self.history_size])
+
+        events = []
+        for index, value in zip(peak_indices.tolist(), peak_values.tolist()):
+            self._classify_peak(index, value, events)
+        return events
+
+    def _classify_peak(self, index, value, events):
+        """Aplica umbral adaptativo, periodo refractario y búsqueda hacia atrás"""
+        # Búsqueda hacia atrás si pasó demasiado tiempo sin detectar un QRS
+        if self.last_qrs is not None and self.searchback_candidate is not None and self.rr_intervals:
+            rr_avg = np.mean(self.rr_intervals) * self.fs
+            if index - self.last_qrs > 1.66 * rr_avg:
+                sb_index, sb_value, sb_slope = self.searchback_candidate
+                self.spki = 0.25 * sb_value + 0.75 * self.spki
+                events.append(self._emit(sb_index, sb_slope))
+
+        if self.last_qrs is not None and index - self.last_qrs < self.refractory:
+            return
+
+        slope = self._slope(index)
+        if value > self.threshold:
+            # Discriminación de onda T: poco después de un QRS, una pendiente baja no es otro QRS
+            if self.last_qrs is not None and index - self.last_qrs < self.t_wave_window and self._is_slow(slope):
+                self.npki = 0.125 * value + 0.875 * self.npki
+                return
+            self.spki = 0.125 * value + 0.875 * self.spki
+            events.append(self._emit(index, slope))
+            return
+
+        self.npki = 0.125 * value + 0.875 * self.npki
+        # Las ondas de aleteo o T superan a veces el umbral reducido; su pendiente las delata
+        if value > 0.5 * self.threshold and not self._is_slow(slope):
+            if self.searchback_candidate is None or value > self.searchback_candidate[1]:
+                self.searchback_candidate = (index, value, slope)
+
+    def _slope(self, mwi_index):
+        """Pendiente máxima de la señal pasa-banda en la ventana de integración que termina en ``mwi_index``"""
+        lo = max(mwi_index - self.window, self.sample_count - self.history_size, 0)
+        hi = min(mwi_index + 1, self.sample_count)
+        if hi <= lo:
+            return 0.0
+        return float(np.max(self.slope_history[np.arange(lo, hi) % self.history_size]))
+
+    def _is_slow(self, slope):
+        return self.qrs_slope is not None and slope < self.slope_ratio * self.qrs_slope
+
+    def _emit(self, mwi_index, slope):
+        """Ubica el pico R en la señal de entrada y registra el intervalo RR y la pendiente del QRS"""
+        r_index = self._locate_r(mwi_index)
+        if self.qrs_slope is not None:
+            self.qrs_slope = 0.125 * slope + 0.875 * self.qrs_slope
+        rr = None
+        if self.last_r is not None:
+            rr = (r_index - self.last_r) / self.fs
+            if rr > 0:
+                self.rr_intervals.append(rr)
+        self.last_qrs = mwi_index
+        self.last_r = r_index
+        self.searchback_candidate = None
+        return RPeak(r_index, rr)
+
+    def _locate_r(self, mwi_index):
+        lo = max(mwi_index - self.window - 2, self.sample_count - self.history_size, 0)
+        hi = min(mwi_index + 1, self.sample_count)
+        if hi <= lo:
+            return mwi_index
+        idx = np.arange(lo, hi)
+        return int(lo + np.argmax(self.history[idx % self.history_size]))
+
+    def _store_history(self, history, x, start):
+        if len(x) >= self.history_size:
+            start += len(x) - self.history_size
+            x = x[-self.history_size:]
+        pos = start % self.history_size
+        first = min(len(x), self.history_size - pos)
+        history[pos:pos + first] = x[:first]
+        history[:len(x) - first] = x[first:]
+
+    def bpm(self):
+        """BPM a partir de la ventana móvil de intervalos RR"""
+        if not self.rr_intervals:
+            return 0
+        return 60.0 / np.mean(self.rr_intervals)
+
+
+def detect_r_peaks(signal, fs, height=0.5, refractory=0.2):
+    """Detección de picos R en un registro completo.
+
+    Normaliza la señal a [0, 1] y busca máximos por encima de ``height``
+    separados al menos ``refractory`` segundos. Devuelve (picos, señal normalizada).
+    """
+    norm = normalize(signal)
+    # Los huecos (NaN) nunca son pico
+    peaks, _ = find_peaks(np.nan_to_num(norm, nan=0.0), distance=max(1, refractory * fs), height=height)
+    return peaks, norm
+
+
+def bpm_from_peaks(peaks, fs, signal=None):
+    """BPM promedio a partir de los intervalos entre picos R.
+
+    Si se da la señal, se excluyen los intervalos que cruzan un hueco (NaN).
+    """
+    if len(peaks) < 2:
+        return 0
+    rr = np.diff(peaks) / fs
+    if signal is not None:
+        rr = rr[~spans_gap(signal, peaks[:-1], peaks[1:])]
+        if len(rr) == 0:
+            return 0
+    return 60.0 / np.mean(rr)
@@ -0,0 +1,17 @@
+import numpy as np
+
+
+def normalize(signal):
+    """Escala la señal a [0, 1] (ignora NaN); una señal constante queda en cero"""
+    signal = np.asarray(signal, dtype=np.float64)
+    min_value = np.nanmin(signal)
+    span = np.nanmax(signal) - min_value
+    if not span > 0:
+        return np.zeros_like(signal)
+    return (signal - min_value) / span
+
+
+def segment_stats(segment):
+    """Mínimo, máximo, media y desviación estándar de un segmento"""
+    return {"min": float(np.nanmin(segment)), "max": float(np.nanmax(segment)),
+            "mean": float(np.nanmean(segment)), "std": float(np.nanstd(segment))}
@@ -0,0 +1,136 @@
+"""Servidor local de prueba para el envío de ECG.
+
+Acepta el protocolo original (b'PAT ' y flujo int16 tras b'ECG ' versión 1)
+y el protocolo por tramas de ``modules.network`` (versión 2).
+
+Uso: python -m modules.ecg_server --port 5000
+"""
+import argparse
+import socketserver
+import threading
+import time
+import numpy as np
+from modules.network import ECG_FRAME, FRAME_HEADER, HANDSHAKE, PATIENT_FRAME
+
+
+def recv_exact(sock, size):
+    """Lee exactamente ``size`` bytes; devuelve None si se cierra la conexión"""
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+class EcgServerStats:
+    """Contadores compartidos por todas las conexiones"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.frames = 0
+        self.samples = 0
+        self.sequence_gaps = 0
+        self.patients = []
+        self.last_values = np.empty(0, dtype=np.int16)
+
+    def snapshot(self):
+        with self.lock:
+            return {"connections": self.connections, "frames": self.frames, "samples": self.samples,
+                    "sequence_gaps": self.sequence_gaps, "patients": len(self.patients)}
+
+
+class EcgRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        stats = self.server.stats
+        with stats.lock:
+            stats.connections += 1
+        kind = recv_exact(self.request, 4)
+        if kind == b'PAT ':
+            data = self.request.recv(4096)
+            with stats.lock:
+                stats.patients.append(data.decode('utf-8', errors='replace'))
+            return
+        if kind != b'ECG ':
+            return
+        header = recv_exact(self.request, HANDSHAKE.size)
+        if header is None:
+            return
+        device_id, _, fs, version = HANDSHAKE.unpack(header)
+        if version < 2:
+            self.handle_raw_stream(stats)
+        else:
+            self.handle_frames(stats)
+
+    def handle_raw_stream(self, stats):
+        """Protocolo versión 1: flujo continuo de int16"""
+        while True:
+            data = self.request.recv(4096)
+            if not data:
+                return
+            with stats.lock:
+                stats.samples += len(data) // 2
+
+    def handle_frames(self, stats):
+        """Protocolo versión 2: tramas con secuencia y marca de tiempo"""
+        last_sequence = None
+        while True:
+            header = recv_exact(self.request, FRAME_HEADER.size)
+            if header is None:
+                return
+            kind, sequence, timestamp, count = FRAME_HEADER.unpack(header)
+            size = count * 2 if kind == ECG_FRAME else count
+            payload = recv_exact(self.request, size)
+            if payload is None:
+                return
+            with stats.lock:
+                stats.frames += 1
+                if kind == ECG_FRAME:
+                    # Los datos del paciente no consumen número de secuencia
+                    if last_sequence is not None and sequence != last_sequence + 1:
+                        stats.sequence_gaps += 1
+                    last_sequence = sequence
+                    values = np.frombuffer(payload, dtype='<i2')
+                    stats.samples += len(values)
+                    stats.last_values = values
+                elif kind == PATIENT_FRAME:
+                    stats.patients.append(payload.decode('utf-8', errors='replace'))
+
+
+class EcgTestServer(socketserver.ThreadingTCPServer):
+    """Servidor TCP multihilo que solo cuenta lo recibido"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=5000):
+        super().__init__((host, port), EcgRequestHandler)
+        self.stats = EcgServerStats()
+
+    def start_in_background(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local de prueba para el envío de ECG")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+
+    server = EcgTestServer(args.host, args.port)
+    server.start_in_background()
+    print(f"Servidor ECG escuchando en {args.host}:{args.port}")
+    try:
+        while True:
+            time.sleep(1)
+            print(server.stats.snapshot())
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
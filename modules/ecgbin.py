@@ -0,0 +1,227 @@
+"""Formato binario de grabaciones ECG (.ecgb).
+
+Estructura del archivo:
+
+- Encabezado fijo de ``HEADER_SIZE`` bytes (ver ``HEADER``): paciente, fs,
+  ganancia (V por cuenta), inicio, tipo de muestra, canales, número de
+  muestras y posición del índice de bloques.
+- Muestras contiguas ``(n, canales)`` en int16 (escaladas por la ganancia)
+  o float32, leídas directamente con ``np.memmap``.
+- Índice de bloques al final: muestra inicial, desplazamiento en bytes y
+  marca de tiempo de cada bloque escrito.
+
+Las muestras perdidas se guardan como NaN en float32 y como ``INT16_GAP``
+en int16; el índice de huecos va en el mismo archivo auxiliar que el CSV
+(``recorder.gap_index_path``).
+
+Los canales de las grabaciones de la app son (crudo, filtrado).
+"""
+import datetime
+import os
+import shutil
+import struct
+import numpy as np
+import pandas as pd
+from modules.recorder import (DATA_COLUMNS, StreamingRecorder, TIME_FORMAT, csv_line, end_field_lines,
+                              format_rows, gap_index_path, read_recording_header)
+
+MAGIC = b"ECGBIN\x00\x01"
+VERSION = 1
+HEADER_SIZE = 512
+# magic, versión, tamaño encabezado, fs, ganancia, inicio (epoch), tipo, canales,
+# muestras, desplazamiento del índice, bloques en el índice, nombre, CURP
+HEADER = struct.Struct("<8sHIdddBBQQQ128s32s")
+DTYPES = {0: np.dtype("<i2"), 1: np.dtype("<f4")}
+DTYPE_CODES = {"int16": 0, "float32": 1}
+BLOCK_INDEX_DTYPE = np.dtype([("sample", "<u8"), ("offset", "<u8"), ("timestamp", "<f8")])
+CHANNELS = ("raw", "filtered")
+
+# ADS1115 con GAIN_TWOTHIRDS
+DEFAULT_GAIN = 6.144 / 32768
+# Valor int16 reservado para muestras perdidas (las muestras válidas se recortan a ±32767)
+INT16_GAP = -32768
+
+
+def _pad(text, size):
+    return text.encode("utf-8")[:size].ljust(size, b"\x00")
+
+
+class EcgBinWriter:
+    """Escritor por bloques de archivos .ecgb"""
+
+    def __init__(self, path, fs, start_time, patient_name="", patient_id="", dtype="float32",
+                 gain=DEFAULT_GAIN, channels=2, index_interval=None):
+        self.path = path
+        self.fs = fs
+        self.start_time = start_time
+        self.patient_name = patient_name
+        self.patient_id = patient_id
+        self.dtype_code = DTYPE_CODES[dtype]
+        self.dtype = DTYPES[self.dtype_code]
+        self.gain = gain if dtype == "int16" else 1.0
+        self.channels = channels
+        self.samples = 0
+        self.blocks = []
+        # Una entrada de índice por segundo como máximo, para que el índice no crezca por bloque
+        self.index_interval = int(fs) if index_interval is None else index_interval
+        self._file = open(path, "wb")
+        self._write_header(index_offset=0, index_blocks=0)
+        self._file.seek(HEADER_SIZE)
+
+    def _write_header(self, index_offset, index_blocks):
+        header = HEADER.pack(MAGIC, VERSION, HEADER_SIZE, float(self.fs), self.gain,
+                             self.start_time.timestamp(), self.dtype_code, self.channels,
+                             self.samples, index_offset, index_blocks,
+                             _pad(self.patient_name, 128), _pad(self.patient_id, 32))
+        self._file.seek(0)
+        self._file.write(header.ljust(HEADER_SIZE, b"\x00"))
+
+    def append(self, block, timestamp=None):
+        """Agrega un bloque (n, canales) en voltios"""
+        block = np.asarray(block, dtype=np.float64).reshape(-1, self.channels)
+        if len(block) == 0:
+            return
+        if self.dtype_code == 0:
+            gaps = np.isnan(block)
+            block = np.clip(np.rint(np.nan_to_num(block) / self.gain), INT16_GAP + 1, 32767)
+            block[gaps] = INT16_GAP
+        offset = HEADER_SIZE + self.samples * self.channels * self.dtype.itemsize
+        if timestamp is None:
+            timestamp = self.start_time.timestamp() + self.samples / self.fs
+        if not self.blocks or self.samples - self.blocks[-1][0] >= self.index_interval:
+            self.blocks.append((self.samples, offset, timestamp))
+        self._file.write(block.astype(self.dtype).tobytes())
+        self.samples += len(block)
+
+    def flush(self):
+        self._file.flush()
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        """Escribe el índice de bloques y completa el encabezado"""
+        index_offset = HEADER_SIZE + self.samples * self.channels * self.dtype.itemsize
+        self._file.seek(index_offset)
+        self._file.truncate()
+        self._file.write(np.array(self.blocks, dtype=BLOCK_INDEX_DTYPE).tobytes())
+        self._write_header(index_offset, len(self.blocks))
+        self._file.close()
+
+
+class EcgBinReader:
+    """Lectura de archivos .ecgb mediante ``np.memmap`` (sin cargar el archivo)"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            raw = f.read(HEADER.size)
+        (magic, version, header_size, self.fs, self.gain, start, dtype_code, self.channels,
+         samples, index_offset, index_blocks, name, patient_id) = HEADER.unpack(raw)
+        if magic != MAGIC:
+            raise ValueError("No es un archivo de grabación ECG binario")
+        self.start_time = datetime.datetime.fromtimestamp(start)
+        self.dtype = DTYPES[dtype_code]
+        self.patient_name = name.rstrip(b"\x00").decode("utf-8", errors="replace")
+        self.patient_id = patient_id.rstrip(b"\x00").decode("utf-8", errors="replace")
+
+        frame_size = self.channels * self.dtype.itemsize
+        if index_offset == 0:
+            # Grabación interrumpida: el número de muestras se deduce del tamaño
+            samples = (os.path.getsize(path) - header_size) // frame_size
+        self.samples = samples
+        if samples:
+            self.data = np.memmap(path, dtype=self.dtype, mode="r", offset=header_size, shape=(samples, self.channels))
+        else:
+            self.data = np.zeros((0, self.channels), dtype=self.dtype)
+        if index_blocks:
+            self.block_index = np.memmap(path, dtype=BLOCK_INDEX_DTYPE, mode="r", offset=index_offset, shape=(index_blocks,))
+        else:
+            self.block_index = np.zeros(0, dtype=BLOCK_INDEX_DTYPE)
+
+    @property
+    def duration(self):
+        return self.samples / self.fs
+
+    def channel(self, name="filtered"):
+        """Vista sin copia de un canal (en cuentas si el archivo es int16)"""
+        return self.data[:, CHANNELS.index(name) if isinstance(name, str) else name]
+
+    def window(self, start_s, end_s, name="filtered"):
+        """Segmento [start_s, end_s) en voltios; solo se lee de disco ese tramo"""
+        start = max(0, int(start_s * self.fs))
+        end = min(self.samples, int(end_s * self.fs))
+        return self.to_volts(self.channel(name)[start:end])
+
+    def to_volts(self, counts):
+        """Convierte un bloque leído del archivo a voltios (los huecos int16 pasan a NaN)"""
+        if self.dtype != DTYPES[0]:
+            return counts
+        return np.where(counts == INT16_GAP, np.nan, counts * self.gain)
+
+    def signal(self, name="filtered"):
+        """Canal completo en voltios (vista de memoria si el archivo es float32)"""
+        return self.window(0, self.duration, name)
+
+
+class BinaryStreamingRecorder(StreamingRecorder):
+    """Guardado continuo en formato .ecgb con el mismo hilo escritor que el CSV"""
+
+    def __init__(self, *args, dtype="float32", **kwargs):
+        self.dtype = dtype
+        super().__init__(*args, **kwargs)
+
+    def _open(self):
+        self._file = EcgBinWriter(self.filename, self.fs, self.start_time, self.patient_name,
+                                  self.patient_id, dtype=self.dtype)
+
+    def _write_chunk(self, raw, filtered, timestamps):
+        # El índice de bloques guarda la hora de llegada real de cada bloque
+        self._file.append(np.column_stack((raw, filtered)), timestamps[0] if len(timestamps) else None)
+
+    def _close(self, end_time):
+        self._file.close()
+
+
+def csv_to_bin(csv_path, bin_path, dtype="float32", chunksize=1 << 18):
+    """Convierte una grabación CSV de la app a .ecgb leyendo por bloques"""
+    with open(csv_path, "rb") as f:
+        info = read_recording_header(f)
+    if info is None:
+        raise ValueError("El CSV no tiene el encabezado de grabación de la app")
+    writer = EcgBinWriter(bin_path, info["fs"], info["start_time"], info["patient_name"],
+                          info["patient_id"], dtype=dtype)
+    try:
+        reader = pd.read_csv(csv_path, skiprows=info["header_lines"] - 1, chunksize=chunksize,
+                             usecols=DATA_COLUMNS[2:], dtype=np.float64)
+        for chunk in reader:
+            writer.append(chunk.to_numpy())
+    finally:
+        writer.close()
+    copy_gap_index(csv_path, bin_path)
+    return bin_path
+
+
+def bin_to_csv(bin_path, csv_path, block_size=1 << 16):
+    """Exporta un .ecgb al formato CSV de la app"""
+    reader = EcgBinReader(bin_path)
+    end_time = reader.start_time + datetime.timedelta(seconds=reader.duration)
+    fs = int(reader.fs) if float(reader.fs).is_integer() else reader.fs
+    with open(csv_path, "wb") as f:
+        f.write(csv_line(["Guardado continuo de ECG"]))
+        f.write(csv_line([f"Paciente: {reader.patient_name}_({reader.patient_id})"]))
+        f.write(csv_line([f"Inicio: {reader.start_time.strftime(TIME_FORMAT)}"]))
+        f.write(end_field_lines(reader.start_time, end_time, reader.samples))
+        f.write(csv_line([f"Frecuencia de muestreo: {fs} Hz"]))
+        f.write(csv_line(DATA_COLUMNS))
+        for start in range(0, reader.samples, block_size):
+            block = reader.to_volts(reader.data[start:start + block_size].astype(np.float64))
+            f.write(format_rows(start, reader.fs, block[:, 0], block[:, 1]))
+    copy_gap_index(bin_path, csv_path)
+    return csv_path
+
+
+def copy_gap_index(source, destination):
+    """Copia el índice de huecos de una grabación a su versión convertida"""
+    if os.path.exists(gap_index_path(source)):
+        shutil.copyfile(gap_index_path(source), gap_index_path(destination))
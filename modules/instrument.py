@@ -0,0 +1,142 @@
+"""Medición de tiempos de las etapas críticas (adquisición, filtrado, graficado, carga).
+
+Cada etapa guarda sus últimas duraciones en un arreglo circular de NumPy;
+los percentiles e histogramas se calculan solo al consultarlos. Con el
+perfilador desactivado, ``stage`` devuelve un contexto vacío compartido y
+el costo es de una llamada a método.
+
+Uso::
+
+    from modules.instrument import profiler
+    with profiler.stage("filter"):
+        y = pipeline.process(x)
+"""
+import contextlib
+import json
+import threading
+import time
+import numpy as np
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+class StageTimer:
+    """Últimas ``capacity`` duraciones (en segundos) de una etapa"""
+
+    def __init__(self, name, capacity=4096):
+        self.name = name
+        self.durations = np.zeros(capacity, dtype=np.float64)
+        self.count = 0
+        self.total = 0.0
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.record(time.perf_counter() - self._start)
+        return False
+
+    def record(self, seconds):
+        self.durations[self.count % len(self.durations)] = seconds
+        self.count += 1
+        self.total += seconds
+
+    def recent(self):
+        return self.durations[:min(self.count, len(self.durations))]
+
+    def summary(self, percentiles=(50, 99)):
+        recent = self.recent()
+        result = {"count": self.count, "total_s": self.total}
+        if len(recent):
+            for p, value in zip(percentiles, np.percentile(recent, percentiles)):
+                result[f"p{p}_ms"] = float(value) * 1e3
+            result["max_ms"] = float(recent.max()) * 1e3
+        return result
+
+    def histogram(self, bins=None):
+        """Histograma logarítmico de 1 µs a 1 s"""
+        if bins is None:
+            bins = np.logspace(-6, 0, 25)
+        counts, edges = np.histogram(self.recent(), bins=bins)
+        return {"edges_s": edges.tolist(), "counts": counts.tolist()}
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+
+
+class Profiler:
+    """Conjunto de etapas medidas y valores instantáneos (muestras/s, fps, retraso...)"""
+
+    def __init__(self, enabled=False, capacity=4096):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.stages = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    def _timer(self, name):
+        timer = self.stages.get(name)
+        if timer is None:
+            with self._lock:
+                timer = self.stages.setdefault(name, StageTimer(name, self.capacity))
+        return timer
+
+    def stage(self, name):
+        """Contexto que mide una etapa (no reentrante por nombre)"""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._timer(name)
+
+    def record(self, name, seconds):
+        if self.enabled:
+            self._timer(name).record(seconds)
+
+    def gauge(self, name, value):
+        if self.enabled:
+            self.gauges[name] = value
+
+    def reset(self):
+        for timer in list(self.stages.values()):
+            timer.reset()
+        self.gauges.clear()
+
+    def summary(self):
+        return {name: timer.summary() for name, timer in list(self.stages.items())}
+
+    def overlay_text(self):
+        """Texto compacto para mostrar sobre la gráfica"""
+        lines = []
+        gauges = self.gauges
+        if gauges:
+            lines.append("  ".join(f"{name}: {value:,.0f}" if isinstance(value, (int, float)) else f"{name}: {value}"
+                                   for name, value in gauges.items()))
+        for name, stats in self.summary().items():
+            if "p50_ms" in stats:
+                lines.append(f"{name:<16s} p50 {stats['p50_ms']:7.3f} ms  p99 {stats['p99_ms']:7.3f} ms")
+        return "\n".join(lines)
+
+    def export(self, path):
+        """Guarda resumen, histogramas y duraciones recientes (JSON o CSV por extensión)"""
+        stages = list(self.stages.items())
+        if path.endswith(".csv"):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("stage,index,duration_s\n")
+                for name, timer in stages:
+                    f.writelines(f"{name},{i},{d!r}\n" for i, d in enumerate(timer.recent().tolist()))
+            return path
+        report = {
+            "exported": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "gauges": self.gauges,
+            "stages": {name: {**timer.summary(), "histogram": timer.histogram(),
+                              "recent_s": timer.recent().tolist()} for name, timer in stages},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=float)
+        return path
+
+
+# Perfilador compartido por la GUI, los hilos de adquisición y el cargador
+profiler = Profiler()
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from modules.ecgbin import EcgBinReader
+from modules.instrument import profiler
+from modules.recorder import read_recording_header
+
+RAW_COLUMN = "Raw signal"
+FILTERED_COLUMN = "Filtered signal"
+
+
+def sniff_csv(path):
+    """Detecta el encabezado de la app, la frecuencia de muestreo y las columnas.
+
+    Los CSV guardados por el monitor tienen 6 líneas de metadatos antes de la
+    fila de columnas; los CSV genéricos se leen desde la primera línea.
+    """
+    with open(path, "rb") as f:
+        info = read_recording_header(f)
+    if info is None:
+        info = {"header_lines": 1, "fs": None, "patient_name": "", "patient_id": "", "start_time": None}
+    columns = pd.read_csv(path, skiprows=info["header_lines"] - 1, nrows=0, encoding_errors="replace").columns
+    info["columns"] = [str(c) for c in columns]
+    # Desplazamiento en bytes donde empiezan los datos
+    with open(path, "rb") as f:
+        for _ in range(info["header_lines"]):
+            f.readline()
+        info["data_offset"] = f.tell()
+    return info
+
+
+def choose_column(columns, prefer_filtered=True):
+    """Elige la columna de señal: filtrada o cruda si existen, si no la primera"""
+    preferred = [FILTERED_COLUMN, RAW_COLUMN] if prefer_filtered else [RAW_COLUMN, FILTERED_COLUMN]
+    for name in preferred:
+        if name in columns:
+            return name
+    return columns[0]
+
+
+def quick_overview(path, info, column, points=2000):
+    """Vista general aproximada leyendo una línea en ``points`` posiciones del archivo.
+
+    Devuelve (número de fila estimado, valor) para graficar la forma de todo
+    el registro en milisegundos, antes del análisis completo.
+    """
+    index = info["columns"].index(column)
+    size = os.path.getsize(path)
+    start = info["data_offset"]
+    if size <= start or points <= 0:
+        return np.empty(0), np.empty(0)
+    positions = np.linspace(start, size - 1, points).astype(np.int64)
+    fractions = []
+    values = []
+    line_bytes = 0
+    with open(path, "rb") as f:
+        for pos in positions.tolist():
+            f.seek(pos)
+            if pos > start:
+                f.readline()  # Descartar la línea parcial
+            line = f.readline()
+            if not line:
+                continue
+            line_bytes += len(line)
+            fields = line.split(b",")
+            try:
+                values.append(float(fields[index]))
+            except (IndexError, ValueError):
+                continue
+            fractions.append((pos - start) / (size - start))
+    if not values:
+        return np.empty(0), np.empty(0)
+    estimated_rows = (size - start) / (line_bytes / len(values))
+    return np.asarray(fractions) * estimated_rows, np.asarray(values)
+
+
+class ChunkedCsvLoader(threading.Thread):
+    """Lee una columna de un CSV grande por bloques en un hilo de trabajo.
+
+    No toca la interfaz: la GUI consulta ``progress``, ``overview``,
+    ``result`` y ``error`` desde el hilo principal (por ejemplo con ``after``).
+    """
+
+    def __init__(self, path, column=None, prefer_filtered=True, chunksize=1 << 18, overview_points=2000):
+        super().__init__(daemon=True)
+        self.path = path
+        self.info = sniff_csv(path)
+        self.column = column or choose_column(self.info["columns"], prefer_filtered)
+        self.fs = self.info["fs"]
+        self.chunksize = chunksize
+        self.overview_points = overview_points
+        self.progress = 0.0
+        self.overview = None
+        self.result = None
+        self.error = None
+        self.done = False
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        try:
+            with profiler.stage("loader_overview"):
+                self.overview = quick_overview(self.path, self.info, self.column, self.overview_points)
+            self.result = self._read_column()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+
+    def _read_column(self):
+        size = max(1, os.path.getsize(self.path))
+        data = None
+        count = 0
+        with open(self.path, "rb") as f:
+            reader = pd.read_csv(f, skiprows=self.info["header_lines"] - 1, usecols=[self.column],
+                                 chunksize=self.chunksize, encoding_errors="replace")
+            started = time.perf_counter()
+            for chunk in reader:
+                if self._cancel.is_set():
+                    return None
+                values = pd.to_numeric(chunk[self.column], errors="coerce").to_numpy(dtype=np.float64)
+                if data is None:
+                    # Estimar el número de filas a partir de los bytes leídos en el primer bloque
+                    estimate = int(len(values) * size / max(1, f.tell())) + len(values)
+                    data = np.empty(max(estimate, len(values)), dtype=np.float64)
+                if count + len(values) > len(data):
+                    data = np.resize(data, max(2 * len(data), count + len(values)))
+                data[count:count + len(values)] = values
+                count += len(values)
+                self.progress = min(1.0, f.tell() / size)
+                # Lectura y conversión del bloque (el análisis de pandas ocurre al iterar)
+                now = time.perf_counter()
+                profiler.record("loader_chunk", now - started)
+                started = now
+        self.progress = 1.0
+        if data is None:
+            return np.empty(0)
+        return data[:count]
+
+
+def load_signal(path, prefer_filtered=True, default_fs=None):
+    """Lee la señal de una grabación (.csv o .ecgb) sin interfaz gráfica.
+
+    Devuelve (señal, fs, columna); ``default_fs`` se usa si el archivo no
+    indica la frecuencia de muestreo.
+    """
+    if path.endswith(".ecgb"):
+        reader = EcgBinReader(path)
+        column = "filtered" if prefer_filtered else "raw"
+        return np.asarray(reader.signal(column), dtype=np.float64), reader.fs, column
+    loader = ChunkedCsvLoader(path, prefer_filtered=prefer_filtered, overview_points=0)
+    loader.run()  # Lectura en el hilo actual
+    if loader.error is not None:
+        raise loader.error
+    return loader.result, loader.fs or default_fs, loader.column
@@ -0,0 +1,151 @@
+"""Adquisición simultánea de varios dispositivos en un solo proceso.
+
+Cada ``DeviceChannel`` tiene su propio hilo lector, buffer circular,
+filtros, detector de QRS y grabación. ``AcquisitionManager.poll`` procesa
+todos los canales desde el hilo de la GUI una vez por cuadro, de modo que
+un solo ciclo de graficado sirve a todos los dispositivos y el costo crece
+con las muestras recibidas, no con el número de redibujados.
+"""
+import datetime
+from modules.acquisition import RingBuffer, SerialReader
+from modules.dsp import FilterPipeline, GapTracker, StreamingQRSDetector
+from modules.recorder import StreamingRecorder
+from modules.render import SweepBuffer
+
+
+class DeviceChannel:
+    """Estado completo de un dispositivo del manejador"""
+
+    def __init__(self, device_id, source_factory, fs, display_seconds=4, ring_capacity=1 << 16):
+        self.device_id = device_id
+        self.source_factory = source_factory
+        self.fs = fs
+        self.ring = RingBuffer(capacity=ring_capacity)
+        self.gap_tracker = GapTracker()
+        self.reader = None
+        self.filter_pipeline = FilterPipeline(fs)
+        self.qrs_detector = StreamingQRSDetector(fs)
+        self.sweep = SweepBuffer(size=int(fs * display_seconds))
+        self.recorder = None
+        self.samples = 0
+        self.overruns = 0
+
+    @property
+    def running(self):
+        return self.reader is not None and self.reader.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self.ring.clear()
+        self.gap_tracker.reset()
+        self.reader = self.source_factory(self.ring)
+        self.reader.start()
+
+    def stop(self):
+        if self.reader is not None:
+            self.reader.stop()
+            self.reader = None
+
+    def reset(self):
+        """Reinicia filtros, detector y pantalla (por ejemplo al detener)"""
+        self.ring.clear()
+        self.filter_pipeline.reset()
+        self.qrs_detector.reset()
+        self.sweep.reset()
+
+    def process(self, max_samples=None):
+        """Procesa lo recibido desde el último cuadro; devuelve el número de muestras"""
+        chunk = self.ring.drain(max_samples)
+        n = len(chunk.samples)
+        self.overruns += chunk.overruns
+        if n == 0:
+            return 0
+        samples, timestamps = self.gap_tracker.check(chunk.samples, chunk.timestamps, chunk.sequence)
+        filtered = self.filter_pipeline.process(samples)
+        self.sweep.write(filtered)
+        if self.recorder is not None:
+            self.recorder.write(samples, filtered, timestamps)
+        self.qrs_detector.process(filtered)
+        self.samples += n
+        return n
+
+    def bpm(self):
+        return self.qrs_detector.bpm()
+
+    def start_recording(self, filename, patient_name, patient_id, recorder_class=StreamingRecorder):
+        if self.recorder is not None:
+            return self.recorder
+        self.recorder = recorder_class(filename, patient_name, patient_id, self.fs, datetime.datetime.now())
+        self.recorder.start()
+        return self.recorder
+
+    def stop_recording(self):
+        """Cierra la grabación; devuelve el número de muestras guardadas"""
+        if self.recorder is None:
+            return 0
+        recorder, self.recorder = self.recorder, None
+        return recorder.finish(datetime.datetime.now())
+
+    def stats(self):
+        link = self.reader.stats() if self.reader is not None else {}
+        return {"device_id": self.device_id, "running": self.running, "samples": self.samples,
+                "overruns": self.overruns, "bpm": self.bpm(), "recording": self.recorder is not None,
+                **link, **self.gap_tracker.stats()}
+
+
+class AcquisitionManager:
+    """Conjunto de dispositivos adquiridos en paralelo con un solo ciclo de procesamiento"""
+
+    def __init__(self, max_seconds_per_frame=1.0):
+        self.channels = {}
+        self.max_seconds_per_frame = max_seconds_per_frame
+        self.last_poll_samples = 0
+
+    def add_device(self, device_id, source_factory, fs, **options):
+        if device_id in self.channels:
+            self.remove_device(device_id)
+        channel = DeviceChannel(device_id, source_factory, fs, **options)
+        self.channels[device_id] = channel
+        return channel
+
+    def add_serial_device(self, device_id, port, fs, mode="stream", **options):
+        """Dispositivo en un puerto serie ya abierto"""
+        return self.add_device(device_id, lambda ring: SerialReader(port, ring, mode=mode), fs, **options)
+
+    def remove_device(self, device_id):
+        channel = self.channels.pop(device_id)
+        channel.stop_recording()
+        channel.stop()
+        return channel
+
+    def start_all(self):
+        for channel in self.channels.values():
+            channel.start()
+
+    def stop_all(self):
+        for channel in self.channels.values():
+            channel.stop()
+
+    def poll(self):
+        """Procesa todos los canales; devuelve los que recibieron muestras"""
+        updated = []
+        total = 0
+        for channel in self.channels.values():
+            n = channel.process(int(channel.fs * self.max_seconds_per_frame))
+            if n:
+                updated.append(channel)
+                total += n
+        self.last_poll_samples = total
+        return updated
+
+    def stop_recordings(self):
+        return {device_id: channel.stop_recording() for device_id, channel in self.channels.items()}
+
+    def close(self):
+        """Cierra grabaciones y detiene todos los lectores"""
+        for device_id in list(self.channels):
+            self.remove_device(device_id)
+
+    def stats(self):
+        return [channel.stats() for channel in self.channels.values()]
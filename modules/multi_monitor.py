@@ -0,0 +1,213 @@
+import customtkinter as ctk
+from CTkMessagebox import CTkMessagebox
+import datetime
+import itertools
+import serial
+import serial.tools.list_ports
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import matplotlib.animation as animation
+from modules.manager import AcquisitionManager
+from modules.render import FrameRateMeter
+from modules.sources import FakeSerialDevice, PacedSource, SyntheticStream
+
+
+class MultiMonitorGUI(ctk.CTkFrame):
+    """Monitor de varios dispositivos de una derivación en una sola ventana.
+
+    Todos los dispositivos comparten una figura y una sola animación con
+    blit: en cada cuadro se procesan los canales que recibieron muestras y
+    solo se redibujan sus líneas.
+    """
+
+    def __init__(self, root, fs=300, max_devices=8):
+        super().__init__(master=root, border_width=1, border_color="white", corner_radius=10)
+        self.pack(padx=10, pady=10, anchor="nw", fill="both", expand=True)
+
+        self.subtitle_font = ctk.CTkFont(family="Poppins Medium", size=18)
+        self.text_font = ctk.CTkFont(family="Poppins Medium", size=14)
+
+        self.fs = fs
+        self.max_devices = max_devices
+        self.manager = AcquisitionManager()
+        self.frame_meter = FrameRateMeter(target_fps=30)
+        self.ports = {}  # Puertos serie abiertos por dispositivo
+        self.fake_devices = {}  # Puertos virtuales simulados por dispositivo
+        self.plots = {}  # device_id -> (línea, texto de BPM)
+        self.next_device_id = 1
+        self.ani = None
+        self.recording = False
+
+        # ---------- Controles ----------
+        controls = ctk.CTkFrame(self, fg_color="transparent")
+        controls.pack(pady=10, padx=10, anchor="w")
+
+        self.acquisition_modes = {"Continuo": "stream", "Binario": "binary"}
+        self.simulated_devices = {"Simulador (ECG sintético)": "synthetic", "Puerto virtual (simulado)": "pty"}
+
+        self.port_combobox = ctk.CTkComboBox(controls, values=[], width=220, height=30, font=self.text_font)
+        self.port_combobox.pack(side="left", padx=5)
+        self.mode_combobox = ctk.CTkComboBox(controls, values=list(self.acquisition_modes), width=120, height=30, font=self.text_font)
+        self.mode_combobox.set("Binario")
+        self.mode_combobox.pack(side="left", padx=5)
+        ctk.CTkButton(controls, text="Actualizar", command=self.refresh_ports, width=80, height=30, font=self.text_font).pack(side="left", padx=5)
+        ctk.CTkButton(controls, text="Agregar dispositivo", command=self.add_device, width=80, height=30, font=self.text_font).pack(side="left", padx=5)
+        ctk.CTkButton(controls, text="Quitar último", command=self.remove_last_device, width=80, height=30, font=self.text_font).pack(side="left", padx=5)
+        ctk.CTkButton(controls, text="Iniciar", command=self.start, width=80, height=30, font=self.text_font).pack(side="left", padx=5)
+        ctk.CTkButton(controls, text="Detener", command=self.stop, width=80, height=30, font=self.text_font).pack(side="left", padx=5)
+        self.record_button = ctk.CTkButton(controls, text="Grabar todos", command=self.toggle_recording, width=80, height=30, font=self.text_font)
+        self.record_button.pack(side="left", padx=5)
+
+        self.stats_label = ctk.CTkLabel(self, text="Sin dispositivos", font=self.text_font)
+        self.stats_label.pack(padx=10, anchor="w")
+
+        # ---------- Gráfico compartido ----------
+        self.fig = plt.figure(figsize=(11, 7))
+        self.fig.patch.set_facecolor("#040b14")
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self)
+        self.canvas.get_tk_widget().pack(fill="both", expand=True, padx=10, pady=10)
+
+        self.refresh_ports()
+
+    def refresh_ports(self):
+        ports = [port.device for port in serial.tools.list_ports.comports()] + list(self.simulated_devices)
+        self.port_combobox.configure(values=ports)
+        self.port_combobox.set(ports[0])
+
+    def add_device(self):
+        if len(self.manager.channels) >= self.max_devices:
+            CTkMessagebox(title="Límite", message=f"Máximo {self.max_devices} dispositivos por estación.", icon="warning")
+            return
+        device_id = self.next_device_id
+        name = self.port_combobox.get()
+        kind = self.simulated_devices.get(name)
+        try:
+            if kind == "synthetic":
+                stream = SyntheticStream(self.fs, seed=device_id, hr=60 + 5 * device_id, pvc_rate=0.02)
+                self.manager.add_device(device_id, lambda ring, stream=stream: PacedSource(ring, stream, self.fs), self.fs)
+            else:
+                if kind == "pty":
+                    fake = FakeSerialDevice(SyntheticStream(self.fs, seed=device_id, hr=60 + 5 * device_id), fs=self.fs)
+                    fake.start()
+                    self.fake_devices[device_id] = fake
+                    name = fake.port_name
+                port = serial.Serial(port=name, baudrate=115200, timeout=0.1)
+                self.ports[device_id] = port
+                mode = self.acquisition_modes.get(self.mode_combobox.get(), "stream")
+                self.manager.add_serial_device(device_id, port, self.fs, mode=mode)
+        except Exception as e:
+            self.close_device_resources(device_id)
+            CTkMessagebox(title="Error", message=f"No se pudo agregar el dispositivo: {e}", icon="cancel")
+            return
+        self.next_device_id += 1
+        self.rebuild_plot()
+        if self.ani is not None:
+            self.manager.channels[device_id].start()
+
+    def remove_last_device(self):
+        if not self.manager.channels:
+            return
+        device_id = list(self.manager.channels)[-1]
+        self.manager.remove_device(device_id)
+        self.close_device_resources(device_id)
+        self.rebuild_plot()
+
+    def close_device_resources(self, device_id):
+        port = self.ports.pop(device_id, None)
+        if port is not None:
+            port.close()
+        fake = self.fake_devices.pop(device_id, None)
+        if fake is not None:
+            fake.stop()
+
+    def rebuild_plot(self):
+        """Una fila de ejes por dispositivo; se reinicia la animación con los nuevos artistas"""
+        running = self.ani is not None
+        self.stop_animation()
+        self.fig.clear()
+        self.plots = {}
+        channels = list(self.manager.channels.values())
+        for row, channel in enumerate(channels):
+            ax = self.fig.add_subplot(len(channels), 1, row + 1)
+            ax.set_facecolor("#040b14")
+            ax.set_xlim(0, channel.sweep.size - 1)
+            ax.set_ylim(-2.2, 2.2)
+            ax.set_xticks([])
+            ax.set_ylabel(f"Disp. {channel.device_id}", fontsize=10)
+            line, = ax.plot(channel.sweep.x, channel.sweep.data, color="limegreen", linewidth=1, animated=True)
+            text = ax.text(0.99, 0.9, "", transform=ax.transAxes, ha="right", va="top", color="white", animated=True)
+            self.plots[channel.device_id] = (line, text)
+        self.stats_label.configure(text=f"{len(channels)} dispositivo(s)" if channels else "Sin dispositivos")
+        self.canvas.draw()
+        if running and channels:
+            self.start_animation()
+
+    def start(self):
+        if not self.manager.channels:
+            CTkMessagebox(title="Error", message="Agregue al menos un dispositivo.", icon="cancel")
+            return
+        self.manager.start_all()
+        if self.ani is None:
+            self.start_animation()
+
+    def stop(self):
+        if self.recording:
+            self.toggle_recording()
+        self.stop_animation()
+        self.manager.stop_all()
+        for channel in self.manager.channels.values():
+            channel.reset()
+
+    def start_animation(self):
+        self.frame_meter.reset()
+        self.ani = animation.FuncAnimation(self.fig, self.update_plot, frames=itertools.count(), blit=True,
+                                           interval=self.frame_meter.frame_interval_ms, cache_frame_data=False)
+        self.canvas.draw()
+
+    def stop_animation(self):
+        if self.ani is not None:
+            self.ani.event_source.stop()
+            self.ani = None
+
+    def update_plot(self, frame):
+        """Procesa todos los canales y devuelve solo los artistas que cambiaron"""
+        updated = self.manager.poll()
+        artists = []
+        for channel in updated:
+            line, text = self.plots[channel.device_id]
+            line.set_ydata(channel.sweep.data)
+            bpm = channel.bpm()
+            text.set_text(f"{bpm:.0f} BPM" if bpm > 0 else "-- BPM")
+            artists.extend((line, text))
+
+        backlog = sum(channel.ring.available() for channel in self.manager.channels.values())
+        if self.frame_meter.tick(self.manager.last_poll_samples, backlog):
+            overruns = sum(channel.overruns for channel in self.manager.channels.values())
+            missing = sum(channel.gap_tracker.missing_samples for channel in self.manager.channels.values())
+            self.stats_label.configure(text=f"{len(self.manager.channels)} dispositivo(s)  |  "
+                                            f"{self.frame_meter.fps:.0f} fps  |  "
+                                            f"{self.frame_meter.samples_per_second:.0f} muestras/s  |  "
+                                            f"Desbordes: {overruns}  |  Huecos: {missing + overruns} muestras")
+        return artists
+
+    def toggle_recording(self):
+        if not self.recording:
+            stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+            for device_id, channel in self.manager.channels.items():
+                channel.start_recording(f"ECG_Dispositivo{device_id}_{stamp}.csv", f"Dispositivo {device_id}", str(device_id))
+            self.recording = True
+            self.record_button.configure(text="Detener grabación")
+        else:
+            saved = self.manager.stop_recordings()
+            self.recording = False
+            self.record_button.configure(text="Grabar todos")
+            CTkMessagebox(title="Guardado", message=f"Se guardaron {sum(saved.values())} muestras en {len(saved)} archivo(s).", icon="check")
+
+    def destroy(self):
+        """Cierra grabaciones, lectores y puertos al salir de la página"""
+        self.stop_animation()
+        for device_id in list(self.manager.channels):
+            self.manager.remove_device(device_id)
+            self.close_device_resources(device_id)
+        plt.close(self.fig)
+        super().destroy()
@@ -0,0 +1,199 @@
+import socket
+import struct
+import threading
+import time
+from collections import deque
+import numpy as np
+
+# ---------- Protocolo de transmisión (versión 2) ----------
+# Conexión: b'ECG ' + struct('<I4sII', device_id, b'ECG', fs, PROTOCOL_VERSION)
+# Después, mensajes con cabecera FRAME_HEADER = (tipo, secuencia, marca de tiempo, n):
+#   b'ECGD': n muestras int16 (mV) en little endian; GAP_VALUE marca una muestra perdida
+#   b'PATD': n bytes UTF-8 con los datos del paciente separados por '|'
+PROTOCOL_VERSION = 2
+HANDSHAKE = struct.Struct('<I4sII')
+FRAME_HEADER = struct.Struct('<4sIdH')
+ECG_FRAME = b'ECGD'
+PATIENT_FRAME = b'PATD'
+MAX_FRAME_SAMPLES = 0xFFFF
+GAP_VALUE = -32768
+
+
+def pack_ecg_frame(samples, sequence, timestamp, scale=1000):
+    """Empaqueta un bloque de muestras en voltios como trama int16 en mV"""
+    values = np.asarray(samples, dtype=np.float64) * scale
+    gaps = np.isnan(values)
+    values = np.clip(np.nan_to_num(values), GAP_VALUE + 1, 32767)
+    values[gaps] = GAP_VALUE
+    payload = values.astype('<i2').tobytes()
+    return FRAME_HEADER.pack(ECG_FRAME, sequence & 0xFFFFFFFF, timestamp, len(samples)) + payload
+
+
+def pack_patient_frame(patient_str, sequence, timestamp):
+    payload = patient_str.encode('utf-8')
+    return FRAME_HEADER.pack(PATIENT_FRAME, sequence & 0xFFFFFFFF, timestamp, len(payload)) + payload
+
+
+class EcgStreamClient(threading.Thread):
+    """Cliente persistente que envía la señal ECG por lotes en segundo plano.
+
+    La GUI solo agrega bloques con ``push``; este hilo los agrupa en una
+    trama cada ``frame_interval`` segundos, los guarda en una cola acotada
+    (se descartan las tramas más antiguas si se llena) y los envía por una
+    única conexión que se restablece con espera exponencial.
+    """
+
+    def __init__(self, host, port, device_id, fs, frame_interval=0.1, max_queue_frames=600,
+                 connect_timeout=2.0, max_backoff=10.0):
+        super().__init__(daemon=True)
+        self.host = host
+        self.port = int(port)
+        self.device_id = device_id
+        self.fs = fs
+        self.frame_interval = frame_interval
+        self.connect_timeout = connect_timeout
+        self.max_backoff = max_backoff
+
+        self.frames = deque(maxlen=max_queue_frames)
+        self.sequence = 0
+        self.sent_frames = 0
+        self.dropped_frames = 0
+        self.reconnects = 0
+        self.connected = False
+        self.last_error = None
+        self.patient_str = None
+
+        self._sock = None
+        self._pending = []
+        self._pending_timestamp = None
+        self._patient_pending = False
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._backoff = 0.5
+        self._next_retry = 0.0
+
+    @property
+    def queue_depth(self):
+        return len(self.frames)
+
+    def stats(self):
+        return {"connected": self.connected, "queue": self.queue_depth, "sent": self.sent_frames,
+                "dropped": self.dropped_frames, "reconnects": self.reconnects}
+
+    def push(self, samples, timestamp=None):
+        """Agrega un bloque de muestras filtradas (llamado desde la GUI)"""
+        if len(samples) == 0:
+            return
+        with self._lock:
+            if self._pending_timestamp is None:
+                self._pending_timestamp = time.time() if timestamp is None else timestamp
+            self._pending.append(np.asarray(samples, dtype=np.float64))
+
+    def send_patient(self, patient_str):
+        """Envía los datos del paciente; se reenvían en cada reconexión (nunca pasan por la cola de tramas)"""
+        with self._lock:
+            self.patient_str = patient_str
+            self._patient_pending = True
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self._pack_pending()
+            if not self.connected and time.monotonic() >= self._next_retry:
+                self._connect()
+            if self.connected:
+                self._send_patient()
+            if self.connected:
+                self._flush()
+            self._stop_event.wait(self.frame_interval)
+        self._pack_pending()
+        if self.connected:
+            self._flush()
+        self._close()
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+    def _next_sequence(self):
+        seq = self.sequence
+        self.sequence += 1
+        return seq
+
+    def _enqueue(self, frame):
+        if len(self.frames) == self.frames.maxlen:
+            self.dropped_frames += 1
+        self.frames.append(frame)
+
+    def _pack_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            timestamp, self._pending_timestamp = self._pending_timestamp, None
+        if not pending:
+            return
+        samples = np.concatenate(pending)
+        for start in range(0, len(samples), MAX_FRAME_SAMPLES):
+            block = samples[start:start + MAX_FRAME_SAMPLES]
+            frame_time = timestamp + start / self.fs
+            self._enqueue(pack_ecg_frame(block, self._next_sequence(), frame_time))
+
+    def _connect(self):
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.sendall(b'ECG ' + HANDSHAKE.pack(self.device_id, b'ECG', int(self.fs), PROTOCOL_VERSION))
+            # Cada conexión nueva empieza con los datos del paciente, si los hay; van fuera de la
+            # cola y antes de las tramas pendientes, así que no consumen número de secuencia
+            with self._lock:
+                patient_str, self._patient_pending = self.patient_str, False
+            if patient_str:
+                sock.sendall(pack_patient_frame(patient_str, self.sequence, time.time()))
+            self._sock = sock
+            self.connected = True
+            self._backoff = 0.5
+            print("✅ Conectado al servidor como cliente ECG")
+        except OSError as e:
+            self._schedule_retry(e)
+
+    def _send_patient(self):
+        """Envía los datos del paciente cambiados durante una conexión ya abierta"""
+        with self._lock:
+            if not self._patient_pending:
+                return
+            patient_str, self._patient_pending = self.patient_str, False
+        try:
+            self._sock.sendall(pack_patient_frame(patient_str, self.sequence, time.time()))
+        except OSError as e:
+            # Se reenvían al reconectar
+            self._close()
+            self.reconnects += 1
+            self._schedule_retry(e)
+
+    def _flush(self):
+        while self.frames:
+            frame = self.frames[0]
+            try:
+                self._sock.sendall(frame)
+            except OSError as e:
+                # La trama se conserva en la cola para reenviarla tras reconectar
+                self._close()
+                self.reconnects += 1
+                self._schedule_retry(e)
+                return
+            self.frames.popleft()
+            self.sent_frames += 1
+
+    def _schedule_retry(self, error):
+        self.last_error = error
+        print(f"❌ Error de conexión con servidor ECG: {error} (reintento en {self._backoff:.1f}s)")
+        self._next_retry = time.monotonic() + self._backoff
+        self._backoff = min(self._backoff * 2, self.max_backoff)
+
+    def _close(self):
+        self.connected = False
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
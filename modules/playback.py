@@ -0,0 +1,150 @@
+import time
+import numpy as np
+from modules.instrument import profiler
+
+
+class PlaybackEngine:
+    """Reproducción de registros largos desde el hilo principal de Tk.
+
+    Los cuadros se programan con ``after`` (nunca desde otro hilo), solo se
+    redibuja la línea con blit sobre un fondo guardado, y la posición avanza
+    según el tiempo real transcurrido multiplicado por ``speed``, de modo
+    que la reproducción sigue al reloj aunque algún cuadro se retrase.
+    """
+
+    def __init__(self, widget, canvas, ax, window_duration=5, fps=30):
+        self.widget = widget
+        self.canvas = canvas
+        self.ax = ax
+        self.window_duration = window_duration
+        self.frame_ms = int(1000 / fps)
+        self.speed = 1.0
+        self.signal = np.empty(0)
+        self.time_axis = np.empty(0)
+        self.fs = 1
+        self.position = 0.0  # Muestra inicial de la ventana (fraccional)
+        self.line = None
+        self.position_text = None
+        self.on_finished = None
+        self._after_id = None
+        self._background = None
+        self._last_time = None
+        self._draw_cid = self.canvas.mpl_connect("draw_event", self._on_draw)
+
+    @property
+    def running(self):
+        return self._after_id is not None
+
+    @property
+    def window_samples(self):
+        return int(self.window_duration * self.fs)
+
+    @property
+    def window_start(self):
+        """Inicio de la ventana mostrada, en segundos desde el inicio del registro"""
+        return int(self.position) / self.fs
+
+    def load(self, signal, fs, y_limits=None):
+        """Prepara una señal nueva; el eje de tiempo se calcula una sola vez"""
+        self.pause()
+        self.signal = signal
+        self.fs = fs
+        self.time_axis = np.arange(self.window_samples) / fs
+        self.position = 0.0
+        if y_limits is None:
+            y_limits = (np.nanmin(signal), np.nanmax(signal)) if len(signal) else (0, 1)
+        if not y_limits[1] > y_limits[0]:
+            # Señal plana: un margen fijo evita un eje y de alto cero
+            y_limits = (y_limits[0] - 0.5, y_limits[0] + 0.5)
+        self.y_limits = y_limits
+        self.line, = self.ax.plot([], [], lw=1)
+        self.position_text = self.ax.text(0.01, 0.95, "", transform=self.ax.transAxes, va="top")
+
+    def set_speed(self, speed):
+        self.speed = float(speed)
+
+    def start(self):
+        """Inicia o reanuda; nunca programa más de un ciclo a la vez. Devuelve si quedó reproduciendo"""
+        if self.running or self.line is None or len(self.signal) == 0:
+            return self.running
+        if len(self.signal) <= self.window_samples:
+            # Cabe en una sola ventana: se dibuja completa una vez, sin reproducción
+            self.position = 0.0
+            self.line.set_animated(False)
+            self.position_text.set_animated(False)
+            self.line.set_data(self.time_axis[:len(self.signal)], self.signal)
+            self.ax.set_xlim(0, self.window_duration)
+            self.ax.set_ylim(*self.y_limits)
+            self.canvas.draw_idle()
+            if self.on_finished is not None:
+                self.on_finished()
+            return False
+        # Durante la reproducción el eje x es relativo a la ventana para no
+        # redibujar las marcas en cada cuadro; la posición se muestra en el texto
+        self.line.set_animated(True)
+        self.position_text.set_animated(True)
+        self.ax.set_xlim(0, self.window_duration)
+        self.ax.set_ylim(*self.y_limits)
+        self.canvas.draw()  # Guarda el fondo en _on_draw
+        self._last_time = time.perf_counter()
+        self._after_id = self.widget.after(self.frame_ms, self._step)
+        return True
+
+    def pause(self):
+        """Detiene la reproducción y deja la ventana actual en tiempo absoluto"""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        if self.line is None:
+            return
+        # Sin animación para que los dibujos completos incluyan la línea
+        self.line.set_animated(False)
+        self.position_text.set_animated(False)
+        start = int(self.position)
+        window = self.signal[start:start + self.window_samples]
+        if len(window):
+            self.line.set_data(self.time_axis[:len(window)] + self.window_start, window)
+            self.ax.set_xlim(self.window_start, self.window_start + self.window_duration)
+            self.canvas.draw_idle()
+
+    def toggle(self):
+        if self.running:
+            self.pause()
+        else:
+            self.start()
+        return self.running
+
+    def seek(self, seconds):
+        self.position = max(0.0, min(seconds * self.fs, len(self.signal) - self.window_samples))
+
+    def _on_draw(self, event):
+        if self.running or (self.line is not None and self.line.get_animated()):
+            self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+
+    def _step(self):
+        now = time.perf_counter()
+        self.position += (now - self._last_time) * self.fs * self.speed
+        self._last_time = now
+
+        last_start = len(self.signal) - self.window_samples
+        finished = self.position >= last_start
+        if finished:
+            self.position = last_start
+        start = int(self.position)
+        self.line.set_data(self.time_axis, self.signal[start:start + self.window_samples])
+        self.position_text.set_text(f"t = {self.window_start:.1f} s  ({self.speed:g}×)")
+
+        if self._background is not None:
+            with profiler.stage("playback_blit"):
+                self.canvas.restore_region(self._background)
+                self.ax.draw_artist(self.line)
+                self.ax.draw_artist(self.position_text)
+                self.canvas.blit(self.ax.bbox)
+
+        if finished:
+            self._after_id = None
+            self.pause()
+            if self.on_finished is not None:
+                self.on_finished()
+            return
+        self._after_id = self.widget.after(self.frame_ms, self._step)
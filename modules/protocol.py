@@ -0,0 +1,206 @@
+import binascii
+import struct
+import numpy as np
+
+# ---------- Formato de trama binaria ----------
+# | A5 5A | seq (u8) | fmt (u8) | n (u16 LE) | carga útil | CRC16 (u16 LE) |
+#   fmt: nibble bajo = bytes por muestra (2 = int16, 3 = int24),
+#        nibble alto = canales - 1. La carga útil va intercalada por canal.
+#   El CRC es CRC-16/CCITT-FALSE sobre seq, fmt, n y la carga útil.
+SYNC_WORD = b"\xa5\x5a"
+HEADER = struct.Struct("<BBH")
+HEADER_SIZE = len(SYNC_WORD) + HEADER.size
+CRC_SIZE = 2
+MAX_SAMPLES_PER_FRAME = 1024
+
+# ADS1115 con GAIN_TWOTHIRDS: ±6.144 V en 16 bits
+DEFAULT_SCALE = 6.144 / 32768
+
+
+def crc16(data):
+    """CRC-16/CCITT-FALSE (implementado en C por binascii)"""
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def encode_frame(samples, sequence, width=2):
+    """Empaqueta muestras enteras (n,) o (n, canales) en una trama binaria"""
+    samples = np.asarray(samples, dtype=np.int32)
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    n, channels = samples.shape
+    if width == 2:
+        payload = samples.astype("<i2").tobytes()
+    elif width == 3:
+        raw = samples.astype("<i4").view(np.uint8).reshape(n, channels, 4)
+        payload = raw[:, :, :3].tobytes()
+    else:
+        raise ValueError("El ancho de muestra debe ser 2 o 3 bytes")
+    header = HEADER.pack(sequence & 0xFF, ((channels - 1) << 4) | width, n)
+    crc = crc16(header + payload)
+    return SYNC_WORD + header + payload + struct.pack("<H", crc)
+
+
+def decode_payload(payload, width, channels):
+    """Convierte bytes de carga útil en un arreglo (n, canales) de enteros"""
+    if width == 2:
+        values = np.frombuffer(payload, dtype="<i2").astype(np.int32)
+    else:
+        raw = np.frombuffer(payload, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        # Extensión de signo de 24 bits
+        values = np.where(values & 0x800000, values - 0x1000000, values)
+    return values.reshape(-1, channels)
+
+
+class AsciiDecoder:
+    """Decodificador del protocolo de texto (una muestra por línea)"""
+
+    def __init__(self, channels=1):
+        self.channels = channels
+        self.samples = 0
+        self.corrupt_lines = 0
+        self._pending = b""
+
+    def feed(self, data):
+        """Decodifica un bloque de bytes; devuelve un arreglo (n, canales)"""
+        lines = (self._pending + data).split(b"\n")
+        self._pending = lines.pop()
+        values = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = [float(v) for v in line.split(b",")]
+            except ValueError:
+                row = None
+            if row is None or len(row) != self.channels:
+                # Línea corrupta: se marca con NaN para conservar la posición en el tiempo
+                self.corrupt_lines += 1
+                row = [np.nan] * self.channels
+            values.append(row)
+        self.samples += len(values)
+        return np.asarray(values, dtype=np.float64).reshape(-1, self.channels)
+
+    def stats(self):
+        return {"samples": self.samples, "corrupt": self.corrupt_lines, "missing": self.corrupt_lines}
+
+
+class BinaryFrameDecoder:
+    """Decodificador de tramas binarias con sincronía, secuencia y CRC.
+
+    Las cabeceras se recorren trama por trama, pero las cargas útiles de
+    todo el bloque recibido se convierten con una sola llamada a
+    ``np.frombuffer`` por cada tanda de tramas del mismo formato. Las
+    tramas perdidas (saltos en la secuencia) se reemplazan por el mismo
+    número de muestras NaN y las tramas repetidas se descartan.
+    """
+
+    def __init__(self, scale=DEFAULT_SCALE):
+        self.scale = scale
+        self.frames = 0
+        self.samples = 0
+        self.dropped_frames = 0  # Huecos en la secuencia
+        self.duplicate_frames = 0  # Tramas repetidas (misma secuencia que la anterior)
+        self.missing_samples = 0  # Muestras NaN insertadas por tramas perdidas
+        self.corrupt_frames = 0  # CRC inválido o cabecera imposible
+        self.discarded_bytes = 0  # Bytes descartados al resincronizar
+        self.channels = 1
+        self.last_sequence = None
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """Decodifica un bloque de bytes; devuelve un arreglo (n, canales) en voltios"""
+        self._buffer += data
+        buf = self._buffer
+        pos = 0
+        runs = []  # (ancho, canales), cargas útiles y muestras perdidas antes de cada una, por formato
+        while True:
+            start = buf.find(SYNC_WORD, pos)
+            if start < 0:
+                # Conservar un posible primer byte de sincronía
+                keep = len(buf) - 1 if buf.endswith(SYNC_WORD[:1]) else len(buf)
+                self.discarded_bytes += keep - pos
+                pos = keep
+                break
+            self.discarded_bytes += start - pos
+            if len(buf) - start < HEADER_SIZE:
+                pos = start
+                break
+            seq, frame_fmt, n = HEADER.unpack_from(buf, start + len(SYNC_WORD))
+            width = frame_fmt & 0x0F
+            channels = (frame_fmt >> 4) + 1
+            if width not in (2, 3) or n == 0 or n > MAX_SAMPLES_PER_FRAME:
+                self.corrupt_frames += 1
+                pos = start + 1
+                continue
+            payload_size = n * channels * width
+            end = start + HEADER_SIZE + payload_size + CRC_SIZE
+            if len(buf) < end:
+                pos = start
+                break
+            body = bytes(buf[start + len(SYNC_WORD):end - CRC_SIZE])
+            (crc,) = struct.unpack_from("<H", buf, end - CRC_SIZE)
+            if crc16(body) != crc:
+                self.corrupt_frames += 1
+                pos = start + 1
+                continue
+
+            lost = self._track_sequence(seq)
+            pos = end
+            if lost is None:
+                self.duplicate_frames += 1
+                continue
+            # Un cambio de formato a mitad de bloque abre otra tanda
+            if not runs or runs[-1][0] != (width, channels):
+                runs.append(((width, channels), [], []))
+            runs[-1][1].append(body[HEADER.size:])
+            runs[-1][2].append(lost * n)
+            self.frames += 1
+        del buf[:pos]
+
+        if not runs:
+            return np.empty((0, self.channels), dtype=np.float64)
+        self.channels = runs[-1][0][1]
+        blocks = [self._decode_run(width, channels, payloads, missing)
+                  for (width, channels), payloads, missing in runs]
+        if len(blocks) == 1:
+            return blocks[0]
+        # Las tandas anteriores se ajustan al número de canales actual (columnas faltantes en NaN)
+        for i, block in enumerate(blocks):
+            if block.shape[1] > self.channels:
+                blocks[i] = block[:, :self.channels]
+            elif block.shape[1] < self.channels:
+                extra = np.full((len(block), self.channels - block.shape[1]), np.nan)
+                blocks[i] = np.hstack((block, extra))
+        return np.concatenate(blocks)
+
+    def _decode_run(self, width, channels, payloads, missing):
+        """Convierte las cargas útiles de un mismo formato e inserta NaN por las tramas perdidas"""
+        values = np.multiply(decode_payload(b"".join(payloads), width, channels), self.scale, dtype=np.float64)
+        self.samples += len(values)
+        if any(missing):
+            # Se supone que las tramas perdidas tenían el tamaño de la siguiente recibida
+            sizes = [len(p) // (width * channels) for p in payloads]
+            offsets = np.cumsum([0] + sizes[:-1])
+            positions = np.repeat(offsets, missing)
+            values = np.insert(values, positions, np.nan, axis=0)
+            self.missing_samples += len(positions)
+        return values
+
+    def _track_sequence(self, seq):
+        """Tramas perdidas antes de ``seq``; None si la trama está repetida"""
+        if self.last_sequence is None:
+            self.last_sequence = seq
+            return 0
+        if seq == self.last_sequence:
+            return None
+        gap = (seq - self.last_sequence - 1) & 0xFF
+        self.dropped_frames += gap
+        self.last_sequence = seq
+        return gap
+
+    def stats(self):
+        return {"samples": self.samples, "frames": self.frames, "dropped": self.dropped_frames,
+                "duplicates": self.duplicate_frames, "missing": self.missing_samples,
+                "corrupt": self.corrupt_frames, "discarded_bytes": self.discarded_bytes}
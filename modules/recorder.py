@@ -0,0 +1,275 @@
+import csv
+import datetime
+import glob
+import io
+import os
+import queue
+import threading
+import time
+import numpy as np
+from modules.dsp.gaps import Gap, GapTracker
+
+# Las líneas "Fin" y "Duracion" se escriben con ancho fijo para poder
+# completarlas en su lugar al terminar (o al recuperar tras un fallo)
+HEADER_FIELD_WIDTH = 72
+PENDING_END = "Fin: en curso"
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+DATA_COLUMNS = ["Sample", "Time", "Raw signal", "Filtered signal"]
+GAP_COLUMNS = ["start_sample", "length", "kind", "host_time"]
+GAP_INDEX_SUFFIX = ".gaps.csv"
+
+
+def csv_line(row):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    return buffer.getvalue().encode("utf-8")
+
+
+def format_rows(first_index, fs, raw, filtered):
+    """Da formato a un bloque completo de filas CSV"""
+    index = np.arange(first_index, first_index + len(raw))
+    rows = zip(index.tolist(), (index / fs).tolist(), raw.tolist(), filtered.tolist())
+    return "".join(f"{i},{t:.3f},{r!r},{f!r}\r\n" for i, t, r, f in rows).encode("utf-8")
+
+
+def gap_index_path(path):
+    """Archivo con el índice de huecos de una grabación"""
+    return path + GAP_INDEX_SUFFIX
+
+
+def write_gap_index(path, gaps):
+    """Guarda el índice de huecos (muestras perdidas marcadas con NaN) junto a la grabación"""
+    with open(gap_index_path(path), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(GAP_COLUMNS)
+        writer.writerows((gap.start, gap.length, gap.kind, f"{gap.timestamp:.6f}") for gap in gaps)
+
+
+def read_gap_index(path):
+    """Lista de ``Gap`` de una grabación; vacía si no tiene huecos registrados"""
+    try:
+        with open(gap_index_path(path), newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+    except FileNotFoundError:
+        return []
+    return [Gap(int(row["start_sample"]), int(row["length"]), row["kind"], float(row["host_time"])) for row in rows]
+
+
+class StreamingRecorder(threading.Thread):
+    """Guardado continuo que escribe a disco por bloques desde un hilo propio.
+
+    La GUI entrega bloques con ``write``; la memoria usada queda acotada por
+    la cola y el archivo siempre contiene todo lo escrito hasta el último
+    volcado, por lo que un fallo solo pierde el último segundo de datos.
+    Las muestras perdidas llegan como NaN y ocupan su lugar en el archivo;
+    sus tramos se registran en el índice de huecos (``gap_index_path``).
+    """
+
+    def __init__(self, filename, patient_name, patient_id, fs, start_time, flush_interval=1.0, max_queue_chunks=512):
+        super().__init__(daemon=True)
+        self.filename = filename
+        self.patient_name = patient_name
+        self.patient_id = patient_id
+        self.fs = fs
+        self.start_time = start_time
+        self.flush_interval = flush_interval
+        self.samples_written = 0
+        self.samples_received = 0  # Muestras entregadas por la GUI, escritas o descartadas
+        self.dropped_chunks = 0
+        self.dropped_samples = 0
+        self.error = None
+        self.gap_tracker = GapTracker(max_gaps=None)
+        self._gaps_saved = 0
+        self._queue = queue.Queue(maxsize=max_queue_chunks)
+        self._open()
+
+    def _open(self):
+        """Crea el archivo y escribe el encabezado"""
+        self._file = open(self.filename, "wb")
+        f = self._file
+        f.write(csv_line(["Guardado continuo de ECG"]))
+        f.write(csv_line([f"Paciente: {self.patient_name}_({self.patient_id})"]))
+        f.write(csv_line([f"Inicio: {self.start_time.strftime(TIME_FORMAT)}"]))
+        self._end_offset = f.tell()
+        f.write(csv_line([PENDING_END.ljust(HEADER_FIELD_WIDTH)]))
+        f.write(csv_line(["Duracion: en curso".ljust(HEADER_FIELD_WIDTH)]))
+        f.write(csv_line([f"Frecuencia de muestreo: {self.fs} Hz"]))
+        f.write(csv_line(DATA_COLUMNS))
+        f.flush()
+
+    def write(self, raw, filtered, timestamps=None):
+        """Encola un bloque de muestras con su hora de llegada (llamado desde la GUI).
+
+        Cada bloque lleva la posición de su primera muestra: si uno se
+        descarta, el escritor rellena su lugar con NaN y lo registra como
+        hueco "overrun", de modo que Sample y Time de lo que sigue no se corren.
+        """
+        if timestamps is None:
+            timestamps = time.time()
+        raw = np.asarray(raw, dtype=np.float64)
+        first = self.samples_received
+        self.samples_received += len(raw)
+        item = (raw, np.asarray(filtered, dtype=np.float64), np.broadcast_to(np.asarray(timestamps, dtype=np.float64), len(raw)), first)
+        # Sin hilo escritor nadie vacía la cola: el bloque se descarta en lugar de bloquear la GUI
+        if self.error is None and self.is_alive():
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                pass
+        self.dropped_chunks += 1
+        self.dropped_samples += len(raw)
+
+    def run(self):
+        last_flush = datetime.datetime.now()
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    item = None
+                if item is not None and item[0] is None:
+                    self._fill_dropped(item[3], time.time())
+                    break
+                if item is not None:
+                    raw, filtered, timestamps, first = item
+                    self._fill_dropped(first, timestamps[0])
+                    self.gap_tracker.check(raw, timestamps, np.arange(self.samples_written, self.samples_written + len(raw)))
+                    self._write_chunk(raw, filtered, timestamps)
+                    self.samples_written += len(raw)
+                now = datetime.datetime.now()
+                if (now - last_flush).total_seconds() >= self.flush_interval:
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    self._save_gaps()
+                    last_flush = now
+        except Exception as e:
+            self.error = e
+            print(f"Error escribiendo grabación: {e}")
+
+    def _fill_dropped(self, first, timestamp):
+        """Escribe como NaN los bloques descartados antes de la muestra ``first`` y los registra como hueco"""
+        length = first - self.samples_written
+        if length <= 0:
+            return
+        self.gap_tracker.mark_overrun(self.samples_written, length, timestamp)
+        filler = np.full(length, np.nan)
+        self._write_chunk(filler, filler, np.full(length, timestamp))
+        self.samples_written += length
+
+    def _write_chunk(self, raw, filtered, timestamps):
+        self._file.write(format_rows(self.samples_written, self.fs, raw, filtered))
+
+    def _save_gaps(self):
+        """Reescribe el índice de huecos si cambió (un hueco abierto puede seguir creciendo)"""
+        gaps = list(self.gap_tracker.gaps)
+        if gaps and (len(gaps) != self._gaps_saved or gaps[-1].start + gaps[-1].length >= self.samples_written):
+            write_gap_index(self.filename, gaps)
+            self._gaps_saved = len(gaps)
+
+    def _close(self, end_time):
+        self._file.flush()
+        write_end_fields(self._file, self._end_offset, self.start_time, end_time, self.samples_written)
+        self._file.close()
+
+    def finish(self, end_time):
+        """Vacía la cola, completa el encabezado y cierra el archivo"""
+        # Si el hilo escritor terminó por un error, la marca de fin no tendría quién la lea
+        while self.is_alive():
+            try:
+                # La marca de fin lleva el total recibido: los bloques descartados al final también quedan como hueco
+                self._queue.put((None, None, None, self.samples_received), timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        self.join()
+        self._close(end_time)
+        self._save_gaps()
+        return self.samples_written
+
+    @property
+    def gaps(self):
+        return list(self.gap_tracker.gaps)
+
+
+def end_field_lines(start_time, end_time, samples):
+    """Líneas "Fin" y "Duracion" del encabezado, con ancho fijo"""
+    duration_seconds = (end_time - start_time).total_seconds()
+    return (csv_line([f"Fin: {end_time.strftime(TIME_FORMAT)}".ljust(HEADER_FIELD_WIDTH)])
+            + csv_line([f"Duracion: {duration_seconds:.2f} segundos ({samples} muestras)".ljust(HEADER_FIELD_WIDTH)]))
+
+
+def write_end_fields(f, offset, start_time, end_time, samples):
+    f.seek(offset)
+    f.write(end_field_lines(start_time, end_time, samples))
+    f.flush()
+
+
+def read_recording_header(f):
+    """Lee el encabezado de metadatos de una grabación CSV de la app.
+
+    Devuelve un diccionario con paciente, CURP, inicio, fs y el número de
+    líneas de encabezado, o None si el archivo no tiene ese formato.
+    """
+    lines = [f.readline() for _ in range(7)]
+    lines = [line.decode("utf-8", errors="replace") if isinstance(line, bytes) else line for line in lines]
+    if not lines[0].startswith("Guardado continuo de ECG"):
+        return None
+    info = {"header_lines": 7, "patient_name": "", "patient_id": "", "start_time": None, "fs": None}
+    for line in lines[1:6]:
+        line = line.strip().strip('"').strip()
+        key, _, value = line.partition(": ")
+        value = value.strip()
+        if key == "Paciente":
+            name, _, patient_id = value.rpartition("_(")
+            info["patient_name"] = name
+            info["patient_id"] = patient_id.rstrip(")")
+        elif key == "Inicio":
+            info["start_time"] = datetime.datetime.strptime(value, TIME_FORMAT)
+        elif key == "Frecuencia de muestreo":
+            info["fs"] = float(value.split()[0])
+    return info
+
+
+def recover_recording(filename):
+    """Completa una grabación interrumpida; devuelve el número de muestras recuperadas o None"""
+    with open(filename, "r+b") as f:
+        header = [f.readline() for _ in range(7)]
+        if len(header) < 7 or not header[3].startswith(PENDING_END.encode("utf-8")):
+            return None
+        offset = sum(len(line) for line in header[:3])
+        start_time = datetime.datetime.strptime(header[2].decode("utf-8").strip().split(": ", 1)[1], TIME_FORMAT)
+        fs = float(header[5].decode("utf-8").split(":")[1].split()[0])
+
+        # Contar filas completas por bloques y descartar una posible última línea a medias
+        complete = sum(len(line) for line in header)
+        position = complete
+        samples = 0
+        while True:
+            block = f.read(1 << 20)
+            if not block:
+                break
+            samples += block.count(b"\n")
+            last_newline = block.rfind(b"\n")
+            if last_newline >= 0:
+                complete = position + last_newline + 1
+            position += len(block)
+        f.truncate(complete)
+
+        end_time = start_time + datetime.timedelta(seconds=samples / fs)
+        write_end_fields(f, offset, start_time, end_time, samples)
+    return samples
+
+
+def recover_incomplete_recordings(directory="."):
+    """Busca grabaciones interrumpidas en ``directory`` y las completa"""
+    recovered = {}
+    for filename in glob.glob(os.path.join(directory, "ECG_*.csv")):
+        try:
+            samples = recover_recording(filename)
+        except (OSError, ValueError, IndexError) as e:
+            print(f"No se pudo recuperar {filename}: {e}")
+            continue
+        if samples is not None:
+            recovered[filename] = samples
+    return recovered
@@ -0,0 +1,235 @@
+import time
+import numpy as np
+from matplotlib.collections import PolyCollection
+from matplotlib.patches import Rectangle
+from matplotlib.transforms import blended_transform_factory
+from modules.annotations import assign_lanes
+
+
+class FrameRateMeter:
+    """Mide los cuadros por segundo logrados y el retraso de adquisición.
+
+    Las estadísticas se recalculan una vez por ``report_interval`` segundos
+    para no reconfigurar etiquetas de Tk en cada cuadro.
+    """
+
+    def __init__(self, target_fps=30, report_interval=1.0):
+        self.target_fps = target_fps
+        self.report_interval = report_interval
+        self.fps = 0.0
+        self.samples_per_second = 0.0
+        self.backlog = 0
+        self.max_backlog = 0
+        self.reset()
+
+    @property
+    def frame_interval_ms(self):
+        return max(1, int(1000 / self.target_fps))
+
+    def reset(self):
+        self._window_start = time.perf_counter()
+        self._frames = 0
+        self._samples = 0
+        self.max_backlog = 0
+
+    def tick(self, samples, backlog):
+        """Registra un cuadro; devuelve True cuando hay estadísticas nuevas"""
+        self._frames += 1
+        self._samples += samples
+        self.backlog = backlog
+        self.max_backlog = max(self.max_backlog, backlog)
+        now = time.perf_counter()
+        elapsed = now - self._window_start
+        if elapsed < self.report_interval:
+            return False
+        self.fps = self._frames / elapsed
+        self.samples_per_second = self._samples / elapsed
+        self._window_start = now
+        self._frames = 0
+        self._samples = 0
+        return True
+
+
+class SweepBuffer:
+    """Buffer de barrido para el monitor con "barra de borrado".
+
+    Cada bloque se escribe con asignación por rebanadas (máximo dos por el
+    cruce del final) y el hueco por delante del cursor se limpia igual, sin
+    ciclos de Python por muestra.
+    """
+
+    def __init__(self, size=1000, gap=15):
+        self.size = int(size)
+        self.data = np.zeros(self.size, dtype=np.float64)
+        self.x = np.arange(self.size)
+        self.gap = gap
+        self.cursor = 0  # Próxima posición a escribir
+
+    @property
+    def clear_position(self):
+        """Primera posición de la ventana de limpieza"""
+        return (self.cursor + 1) % self.size
+
+    def reset(self):
+        self.data[:] = 0
+        self.cursor = 0
+
+    def _assign(self, start, values):
+        """Asigna ``values`` desde ``start`` dando la vuelta al final si hace falta"""
+        first = min(len(values), self.size - start)
+        self.data[start:start + first] = values[:first]
+        if first < len(values):
+            self.data[:len(values) - first] = values[first:]
+
+    def write(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if n == 0:
+            return
+        start = self.cursor
+        if n > self.size:
+            start = (self.cursor + n - self.size) % self.size
+            values = values[-self.size:]
+        self._assign(start, values)
+        self.cursor = (self.cursor + n) % self.size
+
+        # Limpiar las muestras que van por delante (efecto ventana)
+        gap = min(self.gap, self.size - 1)
+        if gap > 0:
+            first = min(gap, self.size - self.cursor)
+            self.data[self.cursor:self.cursor + first] = 0
+            self.data[:gap - first] = 0
+
+
+class MinMaxPyramid:
+    """Pirámide de mínimos/máximos para graficar registros largos.
+
+    El nivel ``k`` guarda el mínimo y el máximo de cada grupo de ``2**k``
+    muestras. Para cualquier rango visible se elige el nivel más grueso que
+    aún entrega cerca de ``max_points`` puntos, alternando mínimo y máximo
+    para que los picos QRS no desaparezcan al reducir.
+    """
+
+    def __init__(self, signal, min_level_size=512):
+        self.min_level_size = min_level_size
+        self.rebuild(signal)
+
+    def rebuild(self, signal):
+        """Reconstruye todos los niveles (vectorizado, O(n))"""
+        self.signal = np.asarray(signal)
+        self.mins = [self.signal]
+        self.maxs = [self.signal]
+        while len(self.mins[-1]) > self.min_level_size:
+            mn, mx = self._reduce(self.mins[-1], self.maxs[-1])
+            self.mins.append(mn)
+            self.maxs.append(mx)
+
+    @staticmethod
+    def _reduce(mn, mx):
+        if len(mn) % 2:
+            mn = np.append(mn, mn[-1])
+            mx = np.append(mx, mx[-1])
+        # fmin/fmax ignoran NaN (huecos marcados en la señal)
+        return np.fmin(mn[0::2], mn[1::2]), np.fmax(mx[0::2], mx[1::2])
+
+    def extent(self):
+        """Mínimo y máximo de toda la señal, leídos del nivel más grueso"""
+        if len(self.signal) == 0:
+            return 0.0, 1.0
+        return float(np.nanmin(self.mins[-1])), float(np.nanmax(self.maxs[-1]))
+
+    def query(self, start, end, max_points):
+        """Devuelve (índices de muestra, valores) con a lo sumo ~``max_points`` puntos"""
+        start = max(0, int(start))
+        end = min(len(self.signal), int(end))
+        n = end - start
+        if n <= max_points:
+            return np.arange(start, end), self.signal[start:end]
+        level = int(np.ceil(np.log2(2 * n / max_points)))
+        level = min(level, len(self.mins) - 1)
+        bucket = 1 << level
+        b0 = start // bucket
+        b1 = min(-(-end // bucket), len(self.mins[level]))
+        x = np.repeat(np.arange(b0, b1) * bucket + bucket // 2, 2)
+        y = np.empty(2 * (b1 - b0), dtype=np.float64)
+        y[0::2] = self.mins[level][b0:b1]
+        y[1::2] = self.maxs[level][b0:b1]
+        return x, y
+
+
+# Color de cada etiqueta al dibujar anotaciones
+ANNOTATION_COLORS = {"NSR": "tab:green", "AF": "tab:red", "AFL": "tab:purple", "APB": "tab:cyan", "PVC": "tab:orange",
+                     "Otro": "tab:gray", "??": "tab:olive"}
+
+
+class AnnotationLayer:
+    """Anotaciones visibles como una sola colección de rectángulos.
+
+    En cada cambio del eje x se consulta al índice de la ``AnnotationStore``
+    solo la ventana visible y se reemplazan los vértices de la colección, en
+    lugar de acumular un ``axvspan`` por anotación. Las anotaciones que se
+    solapan se reparten en carriles horizontales. La selección actual es un
+    único rectángulo que se mueve.
+    """
+
+    def __init__(self, canvas, store=None, alpha=0.3, max_lanes=4):
+        self.canvas = canvas
+        self.store = store
+        self.alpha = alpha
+        self.max_lanes = max_lanes
+        self.ax = None
+        self.collection = None
+        self.selection = None
+        self.hidden = False
+
+    def attach(self, ax):
+        """Agrega los artistas al eje (después de cada ``ax.clear()``)"""
+        self.ax = ax
+        # x en datos (segundos) e y en fracción del eje, como axvspan
+        transform = blended_transform_factory(ax.transData, ax.transAxes)
+        self.collection = PolyCollection([], transform=transform, alpha=self.alpha, linewidths=0)
+        ax.add_collection(self.collection, autolim=False)
+        self.selection = Rectangle((0, 0), 0, 1, transform=transform, color="orange", alpha=0.3, visible=False)
+        ax.add_patch(self.selection)
+        ax.callbacks.connect("xlim_changed", lambda axes: self.refresh())
+        self.refresh()
+
+    def set_store(self, store):
+        self.store = store
+        self.refresh()
+
+    def set_hidden(self, hidden):
+        """Oculta la capa (durante la reproducción el eje x es relativo a la ventana)"""
+        self.hidden = hidden
+        self.refresh()
+
+    def set_selection(self, start, end):
+        if self.selection is None:
+            return
+        if start is None or end is None or self.hidden:
+            self.selection.set_visible(False)
+            return
+        self.selection.set_x(min(start, end))
+        self.selection.set_width(abs(end - start))
+        self.selection.set_visible(True)
+
+    def refresh(self):
+        """Redibuja solo las anotaciones del rango visible"""
+        if self.collection is None:
+            return
+        if self.hidden or self.store is None:
+            self.collection.set_verts([])
+            if self.hidden:
+                self.selection.set_visible(False)
+            return
+        x0, x1 = sorted(self.ax.get_xlim())
+        visible = self.store.query(x0, x1)
+        starts = [a.start for a in visible]
+        ends = [a.end for a in visible]
+        lanes = assign_lanes(starts, ends, self.max_lanes)
+        count = int(lanes.max()) + 1 if len(lanes) else 1
+        height = 1.0 / count
+        verts = [[(s, lane * height), (e, lane * height), (e, (lane + 1) * height), (s, (lane + 1) * height)]
+                 for s, e, lane in zip(starts, ends, lanes.tolist())]
+        self.collection.set_verts(verts)
+        self.collection.set_facecolors([ANNOTATION_COLORS.get(a.label, "tab:gray") for a in visible])
@@ -0,0 +1,276 @@
+"""Fuentes de adquisición simuladas para pruebas de carga sin hardware.
+
+- ``SyntheticSource``: ECG sintético a cualquier fs.
+- ``ReplaySource``: reproduce una grabación .csv o .ecgb en tiempo real o acelerada.
+- ``FakeSerialDevice``: puerto serie virtual (pty) que habla el protocolo del
+  firmware, para ejercitar también ``SerialReader`` y los decodificadores.
+
+Prueba de carga sin GUI: python -m modules.sources --fs 2000 --mode binary --duration 30
+"""
+import argparse
+import errno
+import os
+import select
+import threading
+import time
+import numpy as np
+from modules.acquisition import AcquisitionSource, RingBuffer, SerialReader
+from modules.dsp import FilterPipeline, StreamingQRSDetector, synthetic_ecg
+from modules.loader import load_signal
+from modules.protocol import DEFAULT_SCALE, MAX_SAMPLES_PER_FRAME, encode_frame
+
+
+class SignalCursor:
+    """Entrega muestras consecutivas de una señal, opcionalmente en bucle"""
+
+    def __init__(self, signal, loop=True):
+        self.signal = signal
+        self.loop = loop
+        self.position = 0
+
+    def take(self, count):
+        """Hasta ``count`` muestras; None al terminar una señal sin bucle"""
+        if self.position >= len(self.signal):
+            if not self.loop or len(self.signal) == 0:
+                return None
+            self.position = 0
+        end = min(self.position + count, len(self.signal))
+        values = np.asarray(self.signal[self.position:end], dtype=np.float64)
+        self.position = end
+        return values
+
+
+class SyntheticStream:
+    """ECG sintético sin fin, generado por periodos con semillas consecutivas"""
+
+    def __init__(self, fs, period=60, seed=0, **ecg_options):
+        self.fs = fs
+        self.period = period
+        self.seed = seed
+        self.ecg_options = ecg_options
+        self._cursor = SignalCursor(np.empty(0), loop=False)
+
+    def take(self, count):
+        values = self._cursor.take(count)
+        if values is None:
+            ecg = synthetic_ecg(fs=self.fs, duration=self.period, seed=self.seed, **self.ecg_options)
+            self.seed += 1
+            self._cursor = SignalCursor(ecg.signal, loop=False)
+            values = self._cursor.take(count)
+        return values
+
+
+class PacedSource(AcquisitionSource):
+    """Publica muestras de ``stream`` al ritmo del reloj multiplicado por ``speed``"""
+
+    def __init__(self, ring, stream, fs, speed=1.0, chunk_duration=0.02):
+        super().__init__(ring)
+        self.stream = stream
+        self.fs = fs
+        self.speed = speed
+        self.chunk_duration = chunk_duration
+        self.finished = False
+
+    def run(self):
+        try:
+            started = time.perf_counter()
+            emitted = 0
+            while not self._stop_event.is_set():
+                due = int((time.perf_counter() - started) * self.fs * self.speed)
+                while emitted < due:
+                    values = self.stream.take(due - emitted)
+                    if values is None:
+                        self.finished = True
+                        return
+                    self.publish(values)
+                    emitted += len(values)
+                self._stop_event.wait(self.chunk_duration)
+        except Exception as e:
+            self.error = e
+            print(f"⚠️ Error en la fuente simulada: {e}")
+
+
+class SyntheticSource(PacedSource):
+    """Fuente de ECG sintético (ver ``modules.dsp.synthetic``)"""
+
+    def __init__(self, ring, fs=250, speed=1.0, chunk_duration=0.02, seed=0, **ecg_options):
+        super().__init__(ring, SyntheticStream(fs, seed=seed, **ecg_options), fs, speed, chunk_duration)
+
+
+class ReplaySource(PacedSource):
+    """Reproduce una grabación .csv o .ecgb a ``speed`` veces el tiempo real"""
+
+    def __init__(self, ring, path, speed=1.0, loop=False, prefer_filtered=False, default_fs=250, chunk_duration=0.02):
+        signal, fs, self.column = load_signal(path, prefer_filtered=prefer_filtered, default_fs=default_fs)
+        super().__init__(ring, SignalCursor(signal, loop=loop), fs, speed, chunk_duration)
+        self.path = path
+
+
+class FakeSerialDevice(threading.Thread):
+    """Dispositivo serie simulado sobre un pseudo-terminal.
+
+    Responde a los comandos del firmware (``stream``, ``binary``, ``stop`` y
+    ``raw``) y transmite ``stream`` al ritmo de ``fs``. El lado esclavo
+    (``port_name``) se abre con ``serial.Serial`` como un puerto real. Si
+    nadie lee, los datos que no caben en la cola de salida se descartan,
+    igual que en un UART.
+    """
+
+    def __init__(self, stream=None, fs=250, width=2, chunk_duration=0.01, max_pending=1 << 16):
+        super().__init__(daemon=True)
+        # pty solo existe en sistemas POSIX (Linux, macOS, CI)
+        import pty
+        import tty
+        self.stream = stream if stream is not None else SyntheticStream(fs)
+        self.fs = fs
+        self.width = width
+        self.chunk_duration = chunk_duration
+        self.max_pending = max_pending
+        self.mode = None
+        self.sequence = 0
+        self.samples_sent = 0
+        self.samples_dropped = 0
+        self._pending = bytearray()
+        self._commands = b""
+        self._stop_event = threading.Event()
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        os.set_blocking(self.master, False)
+        self.port_name = os.ttyname(self.slave)
+
+    def _encode(self, values):
+        if self.mode == "binary":
+            counts = np.clip(np.rint(values / DEFAULT_SCALE), -(1 << (8 * self.width - 1)), (1 << (8 * self.width - 1)) - 1)
+            frames = []
+            for start in range(0, len(counts), MAX_SAMPLES_PER_FRAME):
+                frames.append(encode_frame(counts[start:start + MAX_SAMPLES_PER_FRAME], self.sequence, self.width))
+                self.sequence += 1
+            return b"".join(frames)
+        return "".join(f"{v:.6f}\n" for v in values.tolist()).encode("ascii")
+
+    def _handle_commands(self, data):
+        self._commands += data
+        while True:
+            if self._commands.startswith(b"raw"):
+                # Protocolo por solicitud: una muestra por comando
+                self._commands = self._commands[3:]
+                values = self.stream.take(1)
+                if values is not None:
+                    self._pending += f"{values[0]:.6f}\n".encode("ascii")
+                continue
+            line, sep, rest = self._commands.partition(b"\n")
+            if not sep:
+                break
+            self._commands = rest
+            command = line.strip()
+            if command in (b"stream", b"binary"):
+                self.mode = command.decode()
+                self._pending.clear()
+                self._mode_started = time.perf_counter()
+                self._emitted = 0
+            elif command == b"stop":
+                self.mode = None
+
+    def _flush(self):
+        while self._pending:
+            try:
+                written = os.write(self.master, self._pending)
+            except BlockingIOError:
+                return
+            del self._pending[:written]
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select([self.master], [], [], self.chunk_duration)
+                if readable:
+                    try:
+                        data = os.read(self.master, 4096)
+                    except OSError as e:
+                        # EIO: el lado esclavo aún no está abierto o se cerró
+                        if e.errno != errno.EIO:
+                            raise
+                        data = b""
+                    if data:
+                        self._handle_commands(data)
+                if self.mode is not None:
+                    due = int((time.perf_counter() - self._mode_started) * self.fs)
+                    count = due - self._emitted
+                    if count > 0:
+                        values = self.stream.take(count)
+                        if values is None:
+                            self.mode = None
+                        else:
+                            self._emitted += count
+                            if len(self._pending) > self.max_pending:
+                                self.samples_dropped += len(values)
+                            else:
+                                self._pending += self._encode(values)
+                                self.samples_sent += len(values)
+                self._flush()
+        finally:
+            os.close(self.master)
+            os.close(self.slave)
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+
+def stress_test(fs=1000, duration=10.0, mode="binary", frame_interval=1 / 30):
+    """Corre el camino completo del monitor (pty → lector → filtros → QRS) sin GUI.
+
+    Consume el buffer circular cada ``frame_interval`` segundos como lo hace
+    la animación y devuelve las estadísticas de pérdidas y rendimiento.
+    """
+    import serial
+    device = FakeSerialDevice(SyntheticStream(fs, pvc_rate=0.02), fs=fs)
+    device.start()
+    port = serial.Serial(device.port_name, timeout=0.1)
+    ring = RingBuffer()
+    reader = SerialReader(port, ring, mode=mode)
+    pipeline = FilterPipeline(fs)
+    detector = StreamingQRSDetector(fs)
+    received = 0
+    beats = 0
+    busy = 0.0
+    reader.start()
+    started = time.perf_counter()
+    try:
+        while time.perf_counter() - started < duration:
+            time.sleep(frame_interval)
+            t0 = time.perf_counter()
+            chunk = ring.drain()
+            if len(chunk.samples):
+                beats += len(detector.process(pipeline.process(chunk.samples)))
+                received += len(chunk.samples)
+            busy += time.perf_counter() - t0
+    finally:
+        reader.stop()
+        port.close()
+        device.stop()
+    elapsed = time.perf_counter() - started
+    return {"fs": fs, "mode": mode, "seconds": elapsed, "samples_sent": device.samples_sent,
+            "samples_received": received, "samples_per_second": received / elapsed,
+            "device_dropped": device.samples_dropped, "ring_overruns": ring.overruns,
+            "decoder": reader.stats(), "beats": beats, "consumer_busy": busy / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga con un dispositivo serie simulado")
+    parser.add_argument("--fs", type=float, default=1000)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--mode", default="binary", choices=["stream", "binary"])
+    args = parser.parse_args()
+
+    stats = stress_test(args.fs, args.duration, args.mode)
+    for key, value in stats.items():
+        print(f"{key:18s} {value}")
+    lost = stats["samples_sent"] - stats["samples_received"]
+    if lost > args.fs * 0.5 or stats["ring_overruns"] or stats["decoder"].get("corrupt"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()